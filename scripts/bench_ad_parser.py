@@ -0,0 +1,85 @@
+"""emansion.parser.extract_ad_info のマイクロベンチマーク
+
+PAYLOAD_CORPUS に記録済みの ajaxJson レスポンス（*.json を置いたディレクトリ、1行1レスポンスの
+.jsonl、または HTTP_RECORD_PATH で記録したアーカイブ *.jsonl.gz）を指定すると、それを繰り返し
+解析して件数/秒を表示する。
+指定がなければ実データに近い形の合成レスポンスを BENCH_PAYLOADS 件作って使う。
+"""
+import json
+import os
+import random
+import time
+from emansion.parser import extract_ad_info
+from http_archive import entry_body, load_archive
+
+
+def load_corpus(path):
+    payloads = []
+    if path.endswith('.gz'):
+        for entry in load_archive(path).values():
+            if entry['status'] == 200 and '/ajaxJson/' in entry['path']:
+                payloads.append(json.loads(entry_body(entry)))
+    elif os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith('.json'):
+                with open(os.path.join(path, name), encoding='utf-8') as f:
+                    payloads.append(json.load(f))
+    else:
+        with open(path, encoding='utf-8') as f:
+            payloads = [json.loads(line) for line in f if line.strip()]
+    return payloads
+
+
+def synthetic_corpus(count, seed=0):
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        result = {'entry': [{'entry_id': 600000 + i}]}
+        if rng.random() < 0.4:
+            result['p'] = {'dtlurl': f'https://www.example.co.jp/mansion/{i}/', 'sold_flag': rng.choice(['0', '1'])}
+        if rng.random() < 0.4:
+            result['l'] = {'project_cd': f'{1000000 + i}', 'sold_flag': rng.choice(['0', '1'])}
+        y_key = rng.choice(['ynew', 'a', None, None])
+        if y_key:
+            result[y_key] = {
+                'dtlurl': f'https://realestate.yahoo.co.jp/new/mansion/dtl/{i:08d}/',
+                'sold_flag': rng.choice([0, 1])
+            }
+        payloads.append({'result': result})
+    return payloads
+
+
+def main():
+    corpus_path = os.environ.get('PAYLOAD_CORPUS')
+    rounds = int(os.environ.get('BENCH_ROUNDS', '5'))
+    if corpus_path:
+        payloads = load_corpus(corpus_path)
+        print(f"Loaded {len(payloads)} payloads from {corpus_path}")
+    else:
+        payloads = synthetic_corpus(int(os.environ.get('BENCH_PAYLOADS', '5000')))
+        print(f"Generated {len(payloads)} synthetic payloads")
+    if not payloads:
+        print("No payloads to benchmark")
+        return
+
+    # ウォームアップ + 抽出結果の内訳
+    results = [extract_ad_info(data) for data in payloads]
+    print(f"P: {sum(1 for r in results if r['p_dtlurl'])} / "
+          f"L: {sum(1 for r in results if r['l_url'])} / "
+          f"Y: {sum(1 for r in results if r['y_dtlurl'])}")
+
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for data in payloads:
+            extract_ad_info(data)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"\n=== extract_ad_info ===")
+    print(f"Best of {rounds} rounds: {best * 1000:.1f} ms for {len(payloads)} payloads")
+    print(f"{len(payloads) / best:,.0f} payloads/sec ({best / len(payloads) * 1e6:.2f} µs/payload)")
+
+
+if __name__ == '__main__':
+    main()
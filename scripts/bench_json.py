@@ -0,0 +1,74 @@
+"""ajaxSearch / ajaxJson のレスポンスのデコード速度を標準の json と orjson で比べるベンチマーク
+
+PAYLOAD_CORPUS（bench_ad_parser と同じ形式）を指定すると記録済みのレスポンスを、
+指定がなければ実際のレスポンスと同程度の大きさの合成レスポンスを使う。
+どちらも response.content と同じく bytes のまま渡してデコードする。
+"""
+import json
+import os
+import random
+import time
+from bench_ad_parser import load_corpus, synthetic_corpus
+from json_codec import get_decoder, orjson
+
+
+def synthetic_search_response(index, rng):
+    return {
+        'building': [
+            {
+                'buildingid': str(100000 + index * 10 + j),
+                'name': f'サンプルマンション{index}-{j}',
+                'address': '東京都港区' + 'ー' * rng.randint(5, 20)
+            }
+            for j in range(rng.randint(0, 10))
+        ]
+    }
+
+
+def bench(decode, bodies, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for body in bodies:
+            decode(body)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    corpus_path = os.environ.get('PAYLOAD_CORPUS')
+    rounds = int(os.environ.get('BENCH_ROUNDS', '5'))
+    count = int(os.environ.get('BENCH_PAYLOADS', '5000'))
+    if corpus_path:
+        payloads = load_corpus(corpus_path)
+        print(f"Loaded {len(payloads)} payloads from {corpus_path}")
+    else:
+        rng = random.Random(0)
+        payloads = synthetic_corpus(count)
+        # 物件の説明文などを足して実際の ajaxJson と同程度の大きさにする
+        for payload in payloads:
+            payload['result']['detail'] = {'comment': 'マンションの説明' * rng.randint(50, 200)}
+        payloads += [synthetic_search_response(i, rng) for i in range(count)]
+        print(f"Generated {len(payloads)} synthetic payloads")
+    bodies = [json.dumps(payload, ensure_ascii=False).encode('utf-8') for payload in payloads]
+    total_bytes = sum(len(body) for body in bodies)
+    print(f"Average body size: {total_bytes / len(bodies) / 1024:.1f} KiB")
+
+    decoders = [('json (stdlib)', get_decoder('stdlib'))]
+    if orjson is not None:
+        decoders.append(('orjson', get_decoder('orjson')))
+    else:
+        print("orjson is not installed; only the stdlib decoder is measured")
+
+    print(f"\n=== JSON decode (best of {rounds} rounds) ===")
+    baseline = None
+    for name, decode in decoders:
+        elapsed = bench(decode, bodies, rounds)
+        baseline = baseline or elapsed
+        print(f"{name:14s} {elapsed * 1000:8.1f} ms  {len(bodies) / elapsed:>10,.0f} docs/sec  "
+              f"{total_bytes / elapsed / 1024 / 1024:7.1f} MiB/s  x{baseline / elapsed:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from datetime import datetime
+
+DEFAULT_INDEX_PATH = '.cache/building_index.sqlite3'
+DEFAULT_NEGATIVE_TTL_HOURS = 24
+DEFAULT_NEGATIVE_MAX_TTL_DAYS = 30
+
+_WHITESPACE_RE = re.compile(r'\s+')
+# 長音記号として使われがちな記号（NFKC 後に残るもの）
+_LONG_VOWEL_RE = re.compile(r'(?<=[ァ-ヺ])[-‐‑‒–—―−ｰ]')
+# 名前の揺れとして無視する区切り記号
+_SEPARATORS = str.maketrans('', '', '・·･')
+
+
+def normalize_name(name):
+    """物件名をインデックスのキーに正規化する
+
+    全角/半角（NFKC）、空白、ひらがな/カタカナ、長音記号・中黒の揺れを吸収する。
+    """
+    if not name:
+        return ''
+    key = unicodedata.normalize('NFKC', name).lower()
+    key = _WHITESPACE_RE.sub('', key)
+    key = key.translate(_SEPARATORS)
+    # ひらがな → カタカナ
+    key = ''.join(chr(ord(c) + 0x60) if 'ぁ' <= c <= 'ゖ' else c for c in key)
+    key = _LONG_VOWEL_RE.sub('ー', key)
+    return key
+
+
+class BuildingIndex:
+    """正規化した物件名 → Building ID と検索候補を保存するローカル SQLite インデックス
+
+    検索しても見つからなかった物件名はネガティブキャッシュに入れ、再確認までの間隔を
+    ttl, 2*ttl, 4*ttl ...（max_ttl まで）と伸ばしていく。
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, negative_ttl_hours=DEFAULT_NEGATIVE_TTL_HOURS,
+                 negative_max_ttl_days=DEFAULT_NEGATIVE_MAX_TTL_DAYS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS buildings ('
+            ' name_key TEXT PRIMARY KEY,'
+            ' name TEXT NOT NULL,'
+            ' building_id TEXT NOT NULL,'
+            ' candidates TEXT,'
+            ' source TEXT NOT NULL,'
+            ' updated_at TEXT NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS negative_results ('
+            ' name_key TEXT PRIMARY KEY,'
+            ' name TEXT NOT NULL,'
+            ' miss_count INTEGER NOT NULL,'
+            ' first_missed_at REAL NOT NULL,'
+            ' next_check_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.negative_ttl = negative_ttl_hours * 3600
+        self.negative_max_ttl = negative_max_ttl_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.forgotten = 0
+        self.negative_skips = 0
+        self.negative_recorded = 0
+
+    def get(self, name):
+        """インデックス済みの Building ID を返す（なければ None）"""
+        key = normalize_name(name)
+        if not key:
+            return None
+        with self._lock:
+            row = self._conn.execute('SELECT building_id FROM buildings WHERE name_key = ?', (key,)).fetchone()
+            if row:
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def seed(self, property_building_map, property_names=()):
+        """シートの B列/L列 の対応を取り込む
+
+        シートの値を正とし、検索で登録した物件名も source='sheet' にして Building ID を上書きする
+        （Building ID が変わったときは、前の検索候補は捨てる）。property_names のうち
+        property_building_map にない物件名（L列が空の行）はインデックスから消すので、
+        L列のセルを空にすると次の実行で検索し直す。
+        """
+        now = datetime.now().isoformat(timespec='seconds')
+        rows = [
+            (normalize_name(name), name, str(building_id), now)
+            for name, building_id in property_building_map.items()
+            if normalize_name(name) and building_id
+        ]
+        seeded = {row[0] for row in rows}
+        cleared = {normalize_name(name) for name in property_names} - seeded - {''}
+        with self._lock:
+            self._conn.executemany(
+                'INSERT INTO buildings (name_key, name, building_id, source, updated_at)'
+                " VALUES (?, ?, ?, 'sheet', ?)"
+                ' ON CONFLICT(name_key) DO UPDATE SET'
+                '  name = excluded.name, building_id = excluded.building_id, source = excluded.source,'
+                '  candidates = CASE WHEN buildings.building_id = excluded.building_id THEN buildings.candidates END,'
+                '  updated_at = excluded.updated_at',
+                rows
+            )
+            self._forget(cleared)
+            self._conn.commit()
+
+    def forget(self, names):
+        """物件名のインデックス登録を消す（次に引いたときは検索し直す）"""
+        keys = {normalize_name(name) for name in names} - {''}
+        with self._lock:
+            self._forget(keys)
+            self._conn.commit()
+
+    def _forget(self, keys):
+        before = self._conn.total_changes
+        self._conn.executemany('DELETE FROM buildings WHERE name_key = ?', [(key,) for key in keys])
+        self.forgotten += self._conn.total_changes - before
+
+    def record(self, name, candidates):
+        """ajaxSearch の結果（候補一覧）を保存する。先頭候補を Building ID とする"""
+        key = normalize_name(name)
+        if not key or not candidates:
+            return
+        building_id = str(candidates[0]['buildingid'])
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO buildings (name_key, name, building_id, candidates, source, updated_at)'
+                " VALUES (?, ?, ?, ?, 'search', ?)",
+                (key, name, building_id, json.dumps(candidates, ensure_ascii=False), now)
+            )
+            self._conn.execute('DELETE FROM negative_results WHERE name_key = ?', (key,))
+            self._conn.commit()
+            self.recorded += 1
+
+    def is_negative_cached(self, name):
+        """見つからなかった物件名で、まだ再確認の時期でなければ True"""
+        key = normalize_name(name)
+        if not key:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT next_check_at FROM negative_results WHERE name_key = ?', (key,)
+            ).fetchone()
+            if row and row[0] > time.time():
+                self.negative_skips += 1
+                return True
+            return False
+
+    def record_miss(self, name):
+        """検索結果が 0 件だった物件名を記録し、次回の再確認時刻を指数的に延ばす"""
+        key = normalize_name(name)
+        if not key:
+            return
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT miss_count, first_missed_at FROM negative_results WHERE name_key = ?', (key,)
+            ).fetchone()
+            miss_count, first_missed_at = (row[0] + 1, row[1]) if row else (1, now)
+            ttl = min(self.negative_ttl * 2 ** (miss_count - 1), self.negative_max_ttl)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO negative_results (name_key, name, miss_count, first_missed_at, next_check_at)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (key, name, miss_count, first_missed_at, now + ttl)
+            )
+            self._conn.commit()
+            self.negative_recorded += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def print_stats(self):
+        print(f"\n=== Building IDインデックス ===")
+        print(f"インデックスヒット: {self.hits} 件")
+        print(f"インデックス未登録: {self.misses} 件")
+        print(f"新規登録: {self.recorded} 件")
+        print(f"L列が空のため消した登録: {self.forgotten} 件")
+        print(f"ネガティブキャッシュでスキップした検索: {self.negative_skips} 件")
+        print(f"ネガティブキャッシュ登録: {self.negative_recorded} 件")
@@ -0,0 +1,136 @@
+"""実行ごとの物件単位の変化（チェンジフィード）を JSONL で書き出す
+
+シートを読んだときの url_map / status_map / date_map / 物件名→Building ID の対応（変更前）と、
+これから書き込む C列・L列・M～S列の値（変更後）を Building ID ごとに比べ、変わったところだけを
+1行1イベントで CHANGE_FEED_PATH に追記する。下流ではシート全体を読み直さずにイベントだけを処理できる。
+
+イベントの type:
+  building_id_resolved  物件名の Building ID が新しく決まった・変わった
+  ad_appeared           P / L / Y の広告 URL が新しく入った
+  url_changed           広告 URL が別の URL に変わった
+  sold_out              sold_flag が '1'（完売）になった
+  back_on_sale          sold_flag が '1' から '0'（掲載中）に戻った
+  sold_flag_changed     それ以外の sold_flag の変化
+  sale_date_recorded    初めて掲載中になり S 列に日付が入った
+  thread_url_changed    C列のスレURLが変わった
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+# M～S列の中の (サイト, URL の列位置, sold_flag の列位置, url_map / status_map のキー)
+AD_SITES = (
+    ('p', 0, 1, 'p_dtlurl', 'p_sold_flag'),
+    ('l', 2, 3, 'l_url', 'l_sold_flag'),
+    ('y', 4, 5, 'y_dtlurl', 'y_sold_flag'),
+)
+
+
+def _cell(row, i):
+    return row[i] if len(row) > i and row[i] else ''
+
+
+def building_transitions(building_id, previous_urls, previous_status, previous_date, c_row, m_row):
+    """1物件分の変化を [(type, site, before, after), ...] で返す"""
+    transitions = []
+    for site, url_col, flag_col, url_key, flag_key in AD_SITES:
+        before_url, after_url = previous_urls.get(url_key, ''), _cell(m_row, url_col)
+        before_flag, after_flag = previous_status.get(flag_key, ''), _cell(m_row, flag_col)
+        if after_url and not before_url:
+            transitions.append(('ad_appeared', site, '', after_url))
+            continue
+        if after_url != before_url:
+            transitions.append(('url_changed', site, before_url, after_url))
+        if after_flag != before_flag:
+            if after_flag == '1':
+                kind = 'sold_out'
+            elif before_flag == '1' and after_flag == '0':
+                kind = 'back_on_sale'
+            else:
+                kind = 'sold_flag_changed'
+            transitions.append((kind, site, before_flag, after_flag))
+    after_date = _cell(m_row, 6)
+    if after_date and not previous_date:
+        transitions.append(('sale_date_recorded', None, '', after_date))
+    before_thread, after_thread = previous_status.get('thread_url', ''), _cell(c_row, 0)
+    if after_thread != before_thread:
+        transitions.append(('thread_url_changed', None, before_thread, after_thread))
+    return transitions
+
+
+class ChangeFeed:
+    """書き込んだ行と変更前の対応表を比べてイベントを作り、JSONL ファイルに追記する
+
+    同じ Building ID が複数行にあっても1回の実行で1回だけ比べる（パイプラインのチャンクをまたいでも）。
+    path が空ならイベントの集計だけを行い、ファイルには書かない。
+    """
+
+    def __init__(self, path, today_str):
+        self.path = path
+        self.today_str = today_str
+        self.run_at = datetime.now(timezone.utc).isoformat()
+        self._seen_ids = set()
+        self._seen_names = set()
+        self.counts = {}
+
+    def collect(self, property_names, lookups, c_rows, l_rows, m_rows, property_building_map, date_map, url_map, status_map):
+        """行ごとの lookups と書き込む値（ヘッダー行なし、property_names と同じ並び）からイベントを作る
+
+        lookups が None の行（取得していない行）は比べない。
+        """
+        names_by_id = {}
+        for property_name, lookup, l_row in zip(property_names, lookups, l_rows):
+            building_id = _cell(l_row, 0)
+            if lookup is not None and building_id:
+                names = names_by_id.setdefault(building_id, [])
+                if property_name not in names:
+                    names.append(property_name)
+
+        events = []
+        for property_name, lookup, c_row, l_row, m_row in zip(property_names, lookups, c_rows, l_rows, m_rows):
+            building_id = _cell(l_row, 0)
+            if lookup is None or not building_id:
+                continue
+            previous_id = property_building_map.get(property_name, '')
+            if previous_id != building_id and property_name not in self._seen_names:
+                self._seen_names.add(property_name)
+                events.append(self._event('building_id_resolved', building_id, [property_name], None, previous_id, building_id))
+            if building_id in self._seen_ids:
+                continue
+            self._seen_ids.add(building_id)
+            for kind, site, before, after in building_transitions(
+                    building_id, url_map.get(building_id, {}), status_map.get(building_id, {}),
+                    date_map.get(building_id, ''), c_row, m_row):
+                events.append(self._event(kind, building_id, names_by_id[building_id], site, before, after))
+        return events
+
+    def _event(self, kind, building_id, property_names, site, before, after):
+        event = {'run_at': self.run_at, 'date': self.today_str, 'type': kind, 'building_id': building_id,
+                 'property_names': property_names}
+        if site:
+            event['site'] = site
+        event['before'] = before
+        event['after'] = after
+        return event
+
+    def append(self, events):
+        """書き込みに成功した分のイベントを数え、path があればファイルに追記する"""
+        for event in events:
+            self.counts[event['type']] = self.counts.get(event['type'], 0) + 1
+        if not self.path or not events:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+    def print_stats(self):
+        print(f"\n=== チェンジフィード ===")
+        if not self.counts:
+            print(f"変化なし")
+            return
+        print(', '.join(f"{kind} {n} 件" for kind, n in sorted(self.counts.items())))
+        if self.path:
+            print(f"追記先: {self.path}")
@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+import time
+
+DEFAULT_CHECKPOINT_PATH = '.cache/checkpoint.jsonl'
+DEFAULT_WINDOW_HOURS = 12
+
+KIND_SEARCH = 'search'
+KIND_AD_INFO = 'ad_info'
+
+
+class RunJournal:
+    """検索結果・広告情報を1件ずつ追記するローカルのジャーナル
+
+    resume=True のときは window_hours 以内に書かれたエントリを読み込み、途中で止まった
+    実行の続きから再開できるようにする。正常終了したら clear() で空にする。
+    """
+
+    def __init__(self, path=DEFAULT_CHECKPOINT_PATH, resume=False, window_hours=DEFAULT_WINDOW_HOURS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._entries = {KIND_SEARCH: {}, KIND_AD_INFO: {}}
+        self._lock = threading.Lock()
+        self.resumed = 0
+        self.recorded = 0
+
+        if resume and os.path.exists(path):
+            since = time.time() - window_hours * 3600
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 書き込み途中で止まった最終行は読み飛ばす
+                        continue
+                    if entry.get('t', 0) >= since and entry.get('kind') in self._entries:
+                        self._entries[entry['kind']][entry['key']] = entry['value']
+            print(f"Resumed {len(self._entries[KIND_SEARCH])} searches and "
+                  f"{len(self._entries[KIND_AD_INFO])} ad infos from {path}")
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+
+    def get(self, kind, key):
+        """ジャーナル済みなら (True, 値)、なければ (False, None)"""
+        with self._lock:
+            if key in self._entries[kind]:
+                self.resumed += 1
+                return True, self._entries[kind][key]
+            return False, None
+
+    def record(self, kind, key, value):
+        entry = {'t': time.time(), 'kind': kind, 'key': key, 'value': value}
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._entries[kind][key] = value
+            self._file.write(line)
+            self._file.flush()
+            self.recorded += 1
+
+    def clear(self):
+        """実行が最後まで完了したのでジャーナルを空にする"""
+        with self._lock:
+            self._file.close()
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._entries = {KIND_SEARCH: {}, KIND_AD_INFO: {}}
+
+    def close(self):
+        with self._lock:
+            self._file.close()
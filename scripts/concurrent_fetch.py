@@ -0,0 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+def run_concurrently(fn, items, concurrency):
+    """fn(item) を最大 concurrency 並列で実行し、items と同じ順序で結果を返す
+
+    fn はブロッキング関数（requests を使う search_building_id / fetch_ad_info など）を想定し、
+    スレッドプール上で実行する。送信ペースは http_client の共有レートリミッターが制御する。
+    concurrency が 1 以下ならスレッドを使わず順に呼ぶ。
+    """
+    items = list(items)
+    concurrency = int(concurrency)
+    if concurrency <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        return list(executor.map(fn, items))
@@ -0,0 +1,13 @@
+"""e-mansion の広告情報を取得して新着物件シートに書き込むための共有パッケージ
+
+  client        物件名検索・ajaxJson の取得（http_client の接続プール・リトライ・レート制御を使う）
+  parser        ajaxJson から広告情報（ad_info）を取り出す
+  sheets        Sheets API のサービス・読み書きと新着物件シートの列構成
+  orchestrator  検索・取得・書き込みの流れ（fetch_mansion_links.py の各モード）
+
+scripts/ 直下のスクリプトから `from emansion import client` のように使う。
+パッケージ内のモジュールも http_client・metrics などの scripts/ 直下のモジュールや
+パッケージ内の他のモジュール（`from emansion.parser import ...`）を絶対 import するので、
+scripts/ が sys.path に入っている必要がある（`python scripts/xxx.py` で実行すれば入る。
+テストでは tests/conftest.py が追加する）。
+"""
@@ -0,0 +1,86 @@
+"""e-mansion の API クライアント（物件名検索・ajaxJson の取得）
+
+通信は http_client（接続プール・リトライ・レート制御・サーキットブレーカー）を通す。
+"""
+from urllib.parse import quote
+import http_client
+from json_codec import response_json
+from metrics import get_metrics
+from emansion.parser import parse_ad_info
+
+
+def search_building_candidates(property_name):
+    """ajaxSearch の候補一覧を返す（通信エラー時は None）"""
+    metrics = get_metrics()
+    try:
+        search_url = f"{http_client.BASE_URL}/bbs/estate/ajaxSearch/?q={quote(property_name)}"
+        with metrics.timer('search'):
+            response = http_client.get(search_url, timeout=10)
+            response.raise_for_status()
+            data = response_json(response)
+        return data.get('building') or []
+    except Exception as e:
+        metrics.error('search', e)
+        print(f"  Error: {e}")
+        return None
+
+
+def search_building_id(property_name, index=None):
+    """物件名を検索して先頭の Building ID を返す
+
+    index（BuildingIndex）を渡すと、候補をインデックスに保存し、最近見つからなかった物件名は再検索しない。
+    """
+    if not property_name:
+        return None
+    # 最近検索して見つからなかった物件名は再検索しない
+    if index is not None and index.is_negative_cached(property_name):
+        return None
+    candidates = search_building_candidates(property_name)
+    if candidates is None:
+        return None
+    if not candidates:
+        if index is not None:
+            index.record_miss(property_name)
+        return None
+    if index is not None:
+        index.record(property_name, candidates)
+    return candidates[0]['buildingid']
+
+
+def building_json_url(building_id):
+    return f"{http_client.BASE_URL}/bbs/yre/building/{building_id}/ajaxJson/"
+
+
+def fetch_building_json(building_id):
+    """ajaxJson のレスポンスをデコードしたまま返す（広告情報の抽出前の確認用）"""
+    response = http_client.get(building_json_url(building_id), timeout=10)
+    response.raise_for_status()
+    return response_json(response)
+
+
+def fetch_ad_info(building_id, http_cache=None):
+    """Ajax JSON から広告情報を取得"""
+    metrics = get_metrics()
+    try:
+        json_url = building_json_url(building_id)
+        with metrics.timer('ajax_json'):
+            if http_cache is not None:
+                return http_cache.fetch(http_client.get, json_url, parse_ad_info)
+            response = http_client.get(json_url, timeout=10)
+            response.raise_for_status()
+            return parse_ad_info(response)
+    except Exception as e:
+        metrics.error('ajax_json', e)
+        print(f"  Error fetching ad info: {e}")
+        return None
+
+
+def fetch_ad_info_incremental(building_id, freshness, http_cache):
+    """再取得の時期でなければ前回の広告情報を再利用し、そうでなければ取得して記録する"""
+    ad_info = freshness.reusable_ad_info(building_id)
+    if ad_info is not None:
+        return ad_info
+    ad_info = fetch_ad_info(building_id, http_cache)
+    if ad_info is not None:
+        freshness.record(building_id, ad_info)
+    return ad_info
@@ -0,0 +1,670 @@
+"""検索・広告情報の取得からシートへの書き込みまでの流れ（一括・パイプライン・時間予算・常駐の各モード）
+
+fetch_mansion_links.py は設定を読んでここの関数を呼ぶだけにし、取得の高速化（重複排除・並列化・
+キャッシュ・ジャーナル）はここで一度だけ実装する。
+"""
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+import http_client
+from building_index import normalize_name
+from change_feed import ChangeFeed
+from checkpoint import KIND_SEARCH, KIND_AD_INFO
+from concurrent_fetch import run_concurrently
+from freshness import classify_ad_info, STATUS_ON_SALE
+from metrics import get_metrics, hit_ratio
+from pipeline import run_pipeline
+from scheduler import RefreshScheduler, RequestBudget, row_priority, PRIORITY_NEW_ROW, PRIORITY_ON_SALE, PRIORITY_SOLD_OUT, PRIORITY_LABELS
+from emansion import sheets
+from emansion.client import search_building_id, search_building_candidates, fetch_ad_info, fetch_ad_info_incremental
+from emansion.sheets import C_HEADER, L_HEADER, M_HEADER, load_sheet_state, plan_changes, apply_changes, write_changes
+
+DEFAULT_WATCH_REQUESTS_PER_HOUR = 600
+DEFAULT_WATCH_ON_SALE_MINUTES = 60
+DEFAULT_WATCH_RETRY_MINUTES = 30
+DEFAULT_WATCH_FLUSH_SECONDS = 300
+DEFAULT_WATCH_FLUSH_ROWS = 200
+
+
+def journaled_fetchers(index, freshness, http_cache, journal):
+    """ジャーナルを通す検索関数・広告情報取得関数の組 (search, fetch) を返す
+
+    結果は1件ずつジャーナルに記録し、ジャーナル済みのものは再取得しない。
+    """
+    def search(property_name):
+        key = normalize_name(property_name)
+        found, building_id = journal.get(KIND_SEARCH, key)
+        if not found:
+            building_id = search_building_id(property_name, index)
+            if building_id:
+                journal.record(KIND_SEARCH, key, building_id)
+        return building_id
+
+    def fetch(building_id):
+        found, ad_info = journal.get(KIND_AD_INFO, building_id)
+        if not found:
+            ad_info = fetch_ad_info_incremental(building_id, freshness, http_cache)
+            if ad_info is not None:
+                journal.record(KIND_AD_INFO, building_id, ad_info)
+        return ad_info
+
+    return search, fetch
+
+
+def fetch_lookups(property_names, known_ids, index, freshness, http_cache, journal, concurrency, chunk_size=0, on_progress=None):
+    """検索・広告情報取得を行い、行順の [(building_id, ad_info)] を返す
+
+    同じ物件名（正規化後）は1回だけ検索し、同じ Building ID は1回だけ取得して、
+    結果を該当するすべての行に配る。concurrency が 2 以上なら並列実行する。
+    結果は1件ずつジャーナルに記録し、ジャーナル済みのものは再取得しない。
+    chunk_size を指定すると広告情報を chunk_size 件ごとに取得し、そのたびに
+    on_progress(lookups) を呼ぶ（未取得の行は None）。
+    """
+    total = len(property_names)
+    building_ids = [known_ids.get(name) for name in property_names]
+    search, fetch = journaled_fetchers(index, freshness, http_cache, journal)
+
+    # 1. Building IDが未知の物件名を、正規化した名前ごとに1回だけ検索
+    search_rows = [i for i, building_id in enumerate(building_ids) if not building_id and property_names[i]]
+    names_by_key = {}
+    for i in search_rows:
+        names_by_key.setdefault(normalize_name(property_names[i]), property_names[i])
+    with get_metrics().phase('search'):
+        found_ids = run_concurrently(search, list(names_by_key.values()), concurrency)
+    found_by_key = dict(zip(names_by_key.keys(), found_ids))
+    for i in search_rows:
+        building_ids[i] = found_by_key[normalize_name(property_names[i])]
+
+    searched = set(search_rows)
+    for i, (property_name, building_id) in enumerate(zip(property_names, building_ids), 1):
+        if not building_id:
+            print(f"[{i}/{total}] {property_name} -> Not found")
+        elif i - 1 in searched:
+            print(f"[{i}/{total}] {property_name} -> ID: {building_id}")
+        else:
+            print(f"[{i}/{total}] {property_name} -> ID: {building_id} (cached)")
+
+    # 2. Building IDが判明した行の広告情報を、Building IDごとに1回だけ取得
+    fetch_rows = [i for i, building_id in enumerate(building_ids) if building_id]
+    unique_ids = list(dict.fromkeys(str(building_ids[i]) for i in fetch_rows))
+    ad_info_by_id = {}
+
+    def current_lookups():
+        lookups = [(None, None)] * total
+        for i in fetch_rows:
+            building_id = str(building_ids[i])
+            lookups[i] = (building_ids[i], ad_info_by_id[building_id]) if building_id in ad_info_by_id else None
+        return lookups
+
+    step = chunk_size or len(unique_ids) or 1
+    for start in range(0, len(unique_ids), step):
+        chunk = unique_ids[start:start + step]
+        with get_metrics().phase('ajax_json'):
+            ad_info_by_id.update(zip(chunk, run_concurrently(fetch, chunk, concurrency)))
+        if on_progress and start + step < len(unique_ids):
+            on_progress(current_lookups())
+
+    print(f"\n=== 重複排除 ===")
+    print(f"検索: {len(search_rows)} 行 → {len(names_by_key)} 件 (重複ヒット {len(search_rows) - len(names_by_key)} 件)")
+    print(f"広告情報取得: {len(fetch_rows)} 行 → {len(unique_ids)} 件 (重複ヒット {len(fetch_rows) - len(unique_ids)} 件)")
+    return current_lookups()
+
+
+def build_row(building_id, ad_info, date_map, url_map, status_map, today_str):
+    """1行分の (C列, L列, M～S列) の値を作る"""
+    if not building_id:
+        # Building IDが見つからなかった場合は広告情報 + 日付を空にする
+        return [''], [''], ['', '', '', '', '', '', '']
+
+    # Building IDから既存の日付、URLを取得
+    current_date = date_map.get(str(building_id), '')
+    existing_urls = url_map.get(str(building_id), {'p_dtlurl': '', 'l_url': '', 'y_dtlurl': ''})
+
+    if not ad_info:
+        # 広告情報が取れなかった場合（通信エラー等）は既存のURL・sold_flag・スレURLを保持する
+        existing_status = status_map.get(str(building_id), {})
+        m_row = [
+            existing_urls['p_dtlurl'],
+            existing_status.get('p_sold_flag', ''),
+            existing_urls['l_url'],
+            existing_status.get('l_sold_flag', ''),
+            existing_urls['y_dtlurl'],
+            existing_status.get('y_sold_flag', ''),
+            current_date
+        ]
+        return [existing_status.get('thread_url', '')], [str(building_id)], m_row
+
+    # C列のスレURL（APIから取得したentry_idを使用）
+    entry_id = ad_info.get('entry_id', '')
+    thread_url = f"https://m.e-mansion.co.jp/thread/{entry_id}/" if entry_id else ''
+    
+    p_flag = ad_info.get('p_sold_flag', '')
+    l_flag = ad_info.get('l_sold_flag', '')
+    y_flag = ad_info.get('y_sold_flag', '')
+    
+    # URLの決定: 新しいURLがあればそれを使用、なければ既存のURLを保持
+    p_url = ad_info.get('p_dtlurl', '') or existing_urls['p_dtlurl']
+    l_url = ad_info.get('l_url', '') or existing_urls['l_url']
+    y_url = ad_info.get('y_dtlurl', '') or existing_urls['y_dtlurl']
+    
+    # 掲載中判定: URLがあり、sold_flagが '0' (掲載中) の場合
+    is_on_sale = False
+    if p_url and p_flag == '0':
+        is_on_sale = True
+    if l_url and l_flag == '0':
+        is_on_sale = True
+    if y_url and y_flag == '0':
+        is_on_sale = True
+    
+    # 日付の決定: 既存の日付を保持、初めて掲載開始されたら今日の日付
+    date_to_write = current_date
+    if not date_to_write and is_on_sale:
+        date_to_write = today_str
+
+    m_row = [
+        p_url,
+        p_flag,
+        l_url,
+        l_flag,
+        y_url,
+        y_flag,
+        date_to_write
+    ]
+    return [thread_url], [str(building_id)], m_row
+
+
+def build_columns(lookups, date_map, url_map, status_map, today_str, sheet_values):
+    """C列・L列・M～S列の書き込みデータ（ヘッダー行付き）を作る
+
+    lookups が None の行（まだ取得していない行）はシートの現在の値をそのまま使う。
+    """
+    # C列用データ（スレURL）
+    c_data = [list(C_HEADER)]
+
+    # L列用データ（Building ID）
+    l_data = [list(L_HEADER)]
+
+    # M～S列用データ（広告情報 + 日付）
+    # M列: p_dtlurl, N列: p_sold_flag, O列: l_url, P列: l_sold_flag, Q列: y_dtlurl, R列: y_sold_flag, S列: first_sold_out_date
+    m_data = [list(M_HEADER)]
+
+    for i, lookup in enumerate(lookups, 1):
+        if lookup is None:
+            c_row, l_row, m_row = [
+                list(values[i]) if i < len(values) else []
+                for values in (sheet_values['C'], sheet_values['L'], sheet_values['M'])
+            ]
+        else:
+            c_row, l_row, m_row = build_row(lookup[0], lookup[1], date_map, url_map, status_map, today_str)
+        c_data.append(c_row)
+        l_data.append(l_row)
+        m_data.append(m_row)
+    return c_data, l_data, m_data
+
+
+def stream_lookups(service, spreadsheet_id, property_names, known_ids, index, freshness, http_cache, journal, concurrency,
+                   date_map, url_map, status_map, today_str, sheet_values, chunk_rows, queue_chunks, history=None,
+                   on_written=None):
+    """行を chunk_rows 行ずつ「検索 → 広告情報取得 → シートへの差分書き込み」と流すパイプライン
+
+    検索はメインスレッド、広告情報取得と書き込みはそれぞれ別スレッドで行い、段の間を
+    queue_chunks 件の有界キューでつなぐ。あるチャンクの Building ID が決まったらすぐ取得に回り、
+    その間に次のチャンクの検索と前のチャンクの書き込みが進む（検索と取得のリクエストは
+    同時に出るが、送信ペースは共有レートリミッターが抑える）。
+    書き込み用に組み立てた行はチャンクごとに捨てるが、メモリ使用量は一定にはならない。
+    シート全体の読み込み結果（sheet_values や url_map など）は最初から持っており、
+    重複排除用の検索結果・広告情報も物件数に比例して実行の最後まで増えていく。
+    すべてのチャンクを書き込めたら True を返す。history を渡すとチャンクごとに広告情報の履歴を記録し、
+    on_written を渡すとチャンクを書き込めるたびに on_written(start, lookups, c_rows, l_rows, m_rows) を呼ぶ。
+    """
+    total = len(property_names)
+    search, fetch = journaled_fetchers(index, freshness, http_cache, journal)
+    found_by_key = {}
+    ad_info_by_id = {}
+    counts = dict.fromkeys(
+        ['search_rows', 'searches', 'fetch_rows', 'fetches', 'thread_url', 'p', 'l', 'y',
+         'written', 'unchanged', 'ranges', 'failed_chunks'], 0
+    )
+
+    def search_chunk(start):
+        rows = range(start, min(start + chunk_rows, total))
+        building_ids = {i: known_ids.get(property_names[i]) for i in rows}
+
+        # Building IDが未知の物件名を、正規化した名前ごとに1回だけ検索（前のチャンクの結果も使う）
+        search_rows = [i for i in rows if not building_ids[i] and property_names[i]]
+        names_by_key = {}
+        for i in search_rows:
+            key = normalize_name(property_names[i])
+            if key not in found_by_key:
+                names_by_key.setdefault(key, property_names[i])
+        found_by_key.update(zip(names_by_key.keys(), run_concurrently(search, list(names_by_key.values()), concurrency)))
+        searched = set(search_rows)
+        for i in rows:
+            if i in searched:
+                building_ids[i] = found_by_key[normalize_name(property_names[i])]
+            if not building_ids[i]:
+                print(f"[{i + 1}/{total}] {property_names[i]} -> Not found")
+            elif i in searched:
+                print(f"[{i + 1}/{total}] {property_names[i]} -> ID: {building_ids[i]}")
+            else:
+                print(f"[{i + 1}/{total}] {property_names[i]} -> ID: {building_ids[i]} (cached)")
+        counts['search_rows'] += len(search_rows)
+        counts['searches'] += len(names_by_key)
+        return start, rows, building_ids
+
+    def fetch_chunk(item):
+        start, rows, building_ids = item
+        # Building IDが判明した行の広告情報を、Building IDごとに1回だけ取得（前のチャンクの結果も使う）
+        fetch_rows = [i for i in rows if building_ids[i]]
+        unique_ids = list(dict.fromkeys(
+            str(building_ids[i]) for i in fetch_rows if str(building_ids[i]) not in ad_info_by_id
+        ))
+        ad_info_by_id.update(zip(unique_ids, run_concurrently(fetch, unique_ids, concurrency)))
+
+        counts['fetch_rows'] += len(fetch_rows)
+        counts['fetches'] += len(unique_ids)
+        lookups = [
+            (building_ids[i], ad_info_by_id[str(building_ids[i])]) if building_ids[i] else (None, None)
+            for i in rows
+        ]
+        record_history(history, lookups)
+        return start, lookups
+
+    def write(item):
+        start, lookups = item
+        rows = [build_row(building_id, ad_info, date_map, url_map, status_map, today_str)
+                for building_id, ad_info in lookups]
+        c_rows = [row[0] for row in rows]
+        l_rows = [row[1] for row in rows]
+        m_rows = [row[2] for row in rows]
+        counts['thread_url'] += sum(1 for row in c_rows if row[0])
+        counts['p'] += sum(1 for row in m_rows if row[0])
+        counts['l'] += sum(1 for row in m_rows if row[2])
+        counts['y'] += sum(1 for row in m_rows if row[4])
+
+        # データ行 i はシートの i + 2 行目（1行目はヘッダー）
+        data_rows = (c_rows, l_rows, m_rows)
+        start_index = start + 1
+        if start == 0:
+            c_rows, l_rows, m_rows = [list(C_HEADER)] + c_rows, [list(L_HEADER)] + l_rows, [list(M_HEADER)] + m_rows
+            start_index = 0
+        writes, written_cells, unchanged_cells = plan_changes(c_rows, l_rows, m_rows, sheet_values, start_index)
+        if writes:
+            try:
+                sheets.batch_update(service, spreadsheet_id, writes)
+            except Exception as e:
+                print(f"Error writing rows {start + 2}-{start + len(lookups) + 1}: {e}")
+                counts['failed_chunks'] += 1
+                return
+        apply_changes(sheet_values, c_rows, l_rows, m_rows, start_index)
+        counts['written'] += written_cells
+        counts['unchanged'] += unchanged_cells
+        counts['ranges'] += len(writes)
+        if on_written:
+            on_written(start, lookups, *data_rows)
+        print(f"  [書き込み] {start + 2}～{start + len(lookups) + 1} 行目: {written_cells} セル ({len(writes)} 範囲)")
+
+    run_pipeline(range(0, total, chunk_rows), [search_chunk, fetch_chunk], write, queue_size=queue_chunks)
+
+    print(f"\n=== 重複排除 ===")
+    print(f"検索: {counts['search_rows']} 行 → {counts['searches']} 件 (重複ヒット {counts['search_rows'] - counts['searches']} 件)")
+    print(f"広告情報取得: {counts['fetch_rows']} 行 → {counts['fetches']} 件 (重複ヒット {counts['fetch_rows'] - counts['fetches']} 件)")
+    print(f"\n=== 広告データ統計 ===")
+    print(f"スレURL: {counts['thread_url']} 件")
+    print(f"純広告（P）: {counts['p']} 件")
+    print(f"L広告（L）: {counts['l']} 件")
+    print(f"Yahoo広告（Y）: {counts['y']} 件")
+    print(f"\n=== 書き込み結果 ===")
+    print(f"書き込んだセル: {counts['written']} / 変更なし: {counts['unchanged']} ({counts['ranges']} 範囲)")
+    if counts['failed_chunks']:
+        print(f"書き込みに失敗したチャンク: {counts['failed_chunks']} 件")
+    return counts['failed_chunks'] == 0
+
+
+def sheet_ad_status(building_id, url_map, status_map):
+    """シートの M～S 列に入っている広告情報を classify_ad_info に渡せる形で返す（なければ None）"""
+    building_id = str(building_id)
+    if building_id not in url_map:
+        return None
+    urls = url_map[building_id]
+    flags = status_map.get(building_id, {})
+    return {
+        'p_dtlurl': urls['p_dtlurl'], 'p_sold_flag': flags.get('p_sold_flag', ''),
+        'l_url': urls['l_url'], 'l_sold_flag': flags.get('l_sold_flag', ''),
+        'y_dtlurl': urls['y_dtlurl'], 'y_sold_flag': flags.get('y_sold_flag', '')
+    }
+
+
+def run_watch(service, spreadsheet_id, input_range, state, index, freshness, http_cache, history=None, change_feed_path=''):
+    """常駐して、優先度と鮮度の順に物件を取得し続け、変更をまとめてシートに書き込む
+
+    新しい行・掲載中の物件を先に、完売・広告なしの物件は FreshnessStore の間隔で再取得する。
+    掲載中の物件は WATCH_ON_SALE_MINUTES ごとに取り直す。取得は WATCH_REQUESTS_PER_HOUR 件/時まで。
+    取得結果は WATCH_FLUSH_ROWS 件たまるか WATCH_FLUSH_SECONDS 秒ごとに、シートを読み直してから
+    物件名で行を突き合わせて差分だけ書き込む（その間に追加された行もスケジュールに加える）。
+    SIGTERM / Ctrl+C か WATCH_MAX_HOURS の経過で、残りを書き込んでから終了する。
+    書き込むたびに、その時点のシートと比べた変化を change_feed_path に追記する。
+    """
+    budget = RequestBudget(int(os.environ.get('WATCH_REQUESTS_PER_HOUR', DEFAULT_WATCH_REQUESTS_PER_HOUR)))
+    on_sale_interval = float(os.environ.get('WATCH_ON_SALE_MINUTES', DEFAULT_WATCH_ON_SALE_MINUTES)) * 60
+    retry_interval = float(os.environ.get('WATCH_RETRY_MINUTES', DEFAULT_WATCH_RETRY_MINUTES)) * 60
+    flush_seconds = float(os.environ.get('WATCH_FLUSH_SECONDS', DEFAULT_WATCH_FLUSH_SECONDS))
+    flush_rows = int(os.environ.get('WATCH_FLUSH_ROWS', DEFAULT_WATCH_FLUSH_ROWS))
+    max_hours = float(os.environ.get('WATCH_MAX_HOURS', '0'))
+    deadline = time.time() + max_hours * 3600 if max_hours else None
+
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+
+    scheduler = RefreshScheduler()
+    results = {}       # {物件名: (building_id, ad_info)} - まだシートに書き込んでいない取得結果
+    names_by_id = {}   # {building_id: {物件名, ...}}
+    counts = dict.fromkeys(['searches', 'fetches', 'errors', 'flushes', 'written', 'events'], 0)
+
+    def sync(state):
+        """シートの行のうち、まだスケジュールにない物件を登録する"""
+        now = time.time()
+        added = 0
+        for property_name in state['property_names']:
+            if not property_name:
+                continue
+            sheet_id = state['property_building_map'].get(property_name)
+            building_id = sheet_id or index.get(property_name)
+            if not building_id:
+                if ('search', property_name) not in scheduler:
+                    scheduler.schedule(('search', property_name), now, PRIORITY_NEW_ROW)
+                    added += 1
+                continue
+            building_id = str(building_id)
+            names_by_id.setdefault(building_id, set()).add(property_name)
+            if ('fetch', building_id) in scheduler:
+                continue
+            freshness_state = freshness.get_state(building_id)
+            priority = row_priority(sheet_id, sheet_ad_status(building_id, state['url_map'], state['status_map']), freshness_state)
+            if freshness_state is None or priority == PRIORITY_NEW_ROW:
+                due_at, last_fetched_at = now, 0.0
+            elif priority == PRIORITY_ON_SALE:
+                due_at, last_fetched_at = freshness_state['last_fetched_at'] + on_sale_interval, freshness_state['last_fetched_at']
+            else:
+                due_at, last_fetched_at = freshness_state['next_refresh_at'], freshness_state['last_fetched_at']
+            scheduler.schedule(('fetch', building_id), due_at, priority, last_fetched_at)
+            added += 1
+        if added:
+            print(f"  [watch] {added} 件をスケジュールに追加 (計 {len(scheduler)} 件)")
+
+    def flush():
+        """シートを読み直し、取得結果を物件名で行に当てはめて差分を書き込む"""
+        fresh = load_sheet_state(service, spreadsheet_id, input_range)
+        if fresh is None:
+            return
+        if results:
+            lookups = [results.get(name) for name in fresh['property_names']]
+            today_str = datetime.now().strftime('%Y/%m/%d')
+            columns = build_columns(lookups, fresh['date_map'], fresh['url_map'], fresh['status_map'], today_str, fresh['sheet_values'])
+            feed = ChangeFeed(change_feed_path, today_str)
+            events = feed.collect(fresh['property_names'], lookups, *(column[1:] for column in columns),
+                                  fresh['property_building_map'], fresh['date_map'], fresh['url_map'], fresh['status_map'])
+            if write_changes(service, spreadsheet_id, *columns, fresh['sheet_values']):
+                feed.append(events)
+                counts['flushes'] += 1
+                counts['written'] += len(results)
+                counts['events'] += len(events)
+                results.clear()
+        sync(fresh)
+
+    def process(key):
+        """1件を処理し、e-mansion にリクエストを送ったら True を返す"""
+        kind, value = key
+        now = time.time()
+        if kind == 'search':
+            if index.is_negative_cached(value):
+                # 最近見つからなかった物件名はリクエストを送らず、ネガティブキャッシュの期限後に検索し直す
+                results[value] = (None, None)
+                scheduler.schedule(key, now + index.negative_ttl, PRIORITY_NEW_ROW)
+                return False
+            counts['searches'] += 1
+            candidates = search_building_candidates(value)
+            if candidates is None:
+                # 通信エラー・5xx は「見つからない」と区別し、行を空にせず retry_interval 後に検索し直す
+                counts['errors'] += 1
+                scheduler.schedule(key, now + retry_interval, PRIORITY_NEW_ROW)
+                return True
+            if not candidates:
+                index.record_miss(value)
+                results[value] = (None, None)
+                scheduler.schedule(key, now + index.negative_ttl, PRIORITY_NEW_ROW)
+                return True
+            index.record(value, candidates)
+            building_id = str(candidates[0]['buildingid'])
+            names_by_id.setdefault(building_id, set()).add(value)
+            scheduler.schedule(('fetch', building_id), now, PRIORITY_NEW_ROW)
+            return True
+
+        counts['fetches'] += 1
+        ad_info = fetch_ad_info(value, http_cache)
+        if ad_info is None:
+            counts['errors'] += 1
+            scheduler.schedule(key, now + retry_interval, PRIORITY_ON_SALE)
+            return True
+        freshness.record(value, ad_info)
+        if history is not None:
+            history.record(value, ad_info)
+        for property_name in names_by_id.get(value, ()):
+            results[property_name] = (value, ad_info)
+        if classify_ad_info(ad_info) == STATUS_ON_SALE:
+            scheduler.schedule(key, now + on_sale_interval, PRIORITY_ON_SALE, now)
+        else:
+            scheduler.schedule(key, freshness.get_state(value)['next_refresh_at'], PRIORITY_SOLD_OUT, now)
+        return True
+
+    sync(state)
+    print(f"\n=== 常駐モード開始（{budget.requests_per_hour} 件/時, 掲載中は {on_sale_interval / 60:.0f} 分ごと） ===")
+    last_flush = time.time()
+    while not stop.is_set():
+        now = time.time()
+        if deadline and now >= deadline:
+            break
+        if len(results) >= flush_rows or now - last_flush >= flush_seconds:
+            flush()
+            last_flush = time.time()
+            continue
+        # 予算の枠が空くまで・次の予定まで待つ（書き込みの時刻と終了時刻を過ぎては待たない）
+        waits = [last_flush + flush_seconds - now]
+        if deadline:
+            waits.append(deadline - now)
+        budget_wait = budget.wait_seconds(now)
+        key = None if budget_wait else scheduler.pop_due(now)
+        if key is None:
+            if budget_wait:
+                waits.append(budget_wait)
+            elif scheduler.next_due(now) is not None:
+                waits.append(scheduler.next_due(now) - now)
+            wait = max(0.1, min(waits))
+            if budget_wait:
+                budget.waited_seconds += wait
+            stop.wait(wait)
+            continue
+        print(f"  [watch] {key[0]} {key[1]}")
+        # ネガティブキャッシュで済んだ分は送っていないので予算に数えない
+        if process(key):
+            budget.spend(now=now)
+
+    print(f"\n=== 常駐モード終了 ===")
+    flush()
+    print(f"検索: {counts['searches']} 件 / 広告情報取得: {counts['fetches']} 件 (失敗 {counts['errors']} 件)")
+    print(f"書き込み: {counts['flushes']} 回, {counts['written']} 物件名分 (変化 {counts['events']} 件)")
+    print(f"予算待ち: {budget.waited_seconds:.0f} 秒")
+    waiting = scheduler.count_by_priority()
+    print(f"スケジュール中: " + ', '.join(f"{PRIORITY_LABELS[p]} {waiting[p]} 件" for p in sorted(waiting)))
+    return not results
+
+
+def prioritized_rows(property_names, property_building_map, known_ids, url_map, status_map, freshness):
+    """取得する価値の高い順に並べた行番号（0 始まり）と、各行の優先度を返す
+
+    優先度は scheduler.row_priority（新しい行 → 掲載中 → 状態不明 → 完売・広告なし）、
+    同じ優先度の中では前回の取得が古い順、その中はシートの行順。
+    """
+    priorities = []
+    sort_keys = []
+    for i, property_name in enumerate(property_names):
+        building_id = known_ids.get(property_name)
+        freshness_state = freshness.get_state(building_id) if building_id else None
+        sheet_status = sheet_ad_status(building_id, url_map, status_map) if building_id else None
+        priority = row_priority(property_building_map.get(property_name), sheet_status, freshness_state)
+        priorities.append(priority)
+        sort_keys.append((priority, freshness_state['last_fetched_at'] if freshness_state else 0.0, i))
+    return [key[2] for key in sorted(sort_keys)], priorities
+
+
+def fetch_lookups_within_budget(property_names, property_building_map, known_ids, url_map, status_map,
+                                index, freshness, http_cache, journal, concurrency, deadline):
+    """価値の高い行から順に取得し、deadline（UNIX 時刻）を過ぎたら打ち切る
+
+    戻り値は行順の lookups。時間内に届かなかった行は None（シートの現在の値をそのまま残す）。
+    concurrency 行ずつまとめて取得し、そのたびに残り時間を確認する。
+    """
+    total = len(property_names)
+    order, priorities = prioritized_rows(property_names, property_building_map, known_ids, url_map, status_map, freshness)
+    search, fetch = journaled_fetchers(index, freshness, http_cache, journal)
+    found_by_key = {}
+    ad_info_by_id = {}
+    lookups = [None] * total
+    step = max(1, concurrency)
+    reached = 0
+
+    for start in range(0, total, step):
+        if time.time() >= deadline:
+            break
+        batch = order[start:start + step]
+        names_by_key = {}
+        for i in batch:
+            property_name = property_names[i]
+            if property_name and not known_ids.get(property_name):
+                key = normalize_name(property_name)
+                if key not in found_by_key:
+                    names_by_key.setdefault(key, property_name)
+        with get_metrics().phase('search'):
+            found_by_key.update(zip(names_by_key.keys(), run_concurrently(search, list(names_by_key.values()), concurrency)))
+
+        building_ids = {}
+        for i in batch:
+            property_name = property_names[i]
+            if property_name:
+                building_ids[i] = known_ids.get(property_name) or found_by_key[normalize_name(property_name)]
+        unique_ids = list(dict.fromkeys(str(b) for b in building_ids.values() if b and str(b) not in ad_info_by_id))
+        with get_metrics().phase('ajax_json'):
+            ad_info_by_id.update(zip(unique_ids, run_concurrently(fetch, unique_ids, concurrency)))
+
+        for i in batch:
+            building_id = building_ids.get(i)
+            if not building_id:
+                lookups[i] = (None, None)
+                print(f"[{i + 1}/{total}] {property_names[i]} -> Not found")
+            else:
+                lookups[i] = (building_id, ad_info_by_id[str(building_id)])
+                print(f"[{i + 1}/{total}] {property_names[i]} -> ID: {building_id} ({PRIORITY_LABELS[priorities[i]]})")
+        reached += len(batch)
+
+    print(f"\n=== 時間予算 ===")
+    print(f"処理した行: {reached} / {total}")
+    skipped = {}
+    for i in order[reached:]:
+        skipped[priorities[i]] = skipped.get(priorities[i], 0) + 1
+    if skipped:
+        print(f"時間切れで未処理（シートの値を残す）: " + ', '.join(
+            f"{PRIORITY_LABELS[p]} {skipped[p]} 行" for p in sorted(skipped)))
+    get_metrics().count('time_budget.rows_skipped', total - reached)
+    return lookups, reached == total
+
+
+def record_history(history, lookups):
+    """取得できた (building_id, ad_info) を今日の観測として履歴に追記する（未処理の行 None は飛ばす）"""
+    if history is None:
+        return
+    history.record_many(lookup for lookup in lookups if lookup is not None)
+
+
+def print_ad_stats(c_data, m_data):
+    """各広告タイプのカウント（URLが存在するものをカウント）"""
+    thread_url_count = sum(1 for row in c_data[1:] if row and row[0])
+    p_count = sum(1 for row in m_data[1:] if row and row[0])
+    l_count = sum(1 for row in m_data[1:] if len(row) > 2 and row[2])
+    y_count = sum(1 for row in m_data[1:] if len(row) > 4 and row[4])
+
+    print(f"\n=== 広告データ統計 ===")
+    print(f"スレURL: {thread_url_count} 件")
+    print(f"純広告（P）: {p_count} 件")
+    print(f"L広告（L）: {l_count} 件")
+    print(f"Yahoo広告（Y）: {y_count} 件")
+
+
+def close_stores(index, freshness, http_cache, history):
+    """接続とローカルのストアの統計を表示・記録して閉じる"""
+    metrics = get_metrics()
+    metrics.section('connections', http_client.connection_stats())
+    metrics.section('caches', {
+        'building_index': {
+            'hits': index.hits, 'misses': index.misses, 'hit_ratio': hit_ratio(index.hits, index.hits + index.misses),
+            'negative_skips': index.negative_skips
+        },
+        'freshness': {
+            'reused': freshness.reused, 'fetched': freshness.fetched,
+            'reuse_ratio': hit_ratio(freshness.reused, freshness.reused + freshness.fetched)
+        },
+        'http_cache': {
+            'hits': http_cache.hits, 'revalidated': http_cache.revalidated, 'misses': http_cache.misses,
+            'hit_ratio': hit_ratio(http_cache.hits + http_cache.revalidated,
+                                   http_cache.hits + http_cache.revalidated + http_cache.misses)
+        }
+    })
+    http_client.print_connection_stats()
+    http_client.close()
+    index.print_stats()
+    index.close()
+    freshness.print_stats()
+    freshness.close()
+    http_cache.print_stats()
+    http_cache.close()
+    if history is not None:
+        history.print_stats()
+        history.close()
+
+
+def publish_changes(feed, state, lookups, c_rows, l_rows, m_rows, start=0, header=True):
+    """書き込んだ行（header=True ならヘッダー行付き）とシートを読んだ時点の値を比べ、変化をチェンジフィードに追記する"""
+    if header:
+        c_rows, l_rows, m_rows = c_rows[1:], l_rows[1:], m_rows[1:]
+    events = feed.collect(
+        state['property_names'][start:start + len(lookups)], lookups, c_rows, l_rows, m_rows,
+        state['property_building_map'], state['date_map'], state['url_map'], state['status_map']
+    )
+    feed.append(events)
+
+
+def write_run_report(completed, journal=None, feed=None):
+    """実行計測の要約を表示し、RUN_REPORT_PATH があれば JSON レポートを書き出す"""
+    metrics = get_metrics()
+    run = {'completed': completed, 'pipeline': os.environ.get('PIPELINE', '') == '1'}
+    if journal is not None:
+        run['journal'] = {'resumed': journal.resumed, 'recorded': journal.recorded}
+    metrics.section('run', run)
+    if feed is not None:
+        feed.print_stats()
+        metrics.section('change_feed', feed.counts)
+    metrics.print_summary()
+    metrics.write_report(os.environ.get('RUN_REPORT_PATH', ''))
+
+
+def finish(journal, completed, feed=None):
+    """書き込みまで終わっていればジャーナルを消す（失敗時は次回の再開用に残す）"""
+    write_run_report(completed, journal, feed)
+    if not completed:
+        journal.close()
+        return
+    journal.clear()
+    journal.close()
+    print("\n=== Process completed! ===")
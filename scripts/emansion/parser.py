@@ -0,0 +1,143 @@
+"""ajaxJson のレスポンスから広告情報（ad_info）を取り出す宣言的なエクストラクタ
+
+どのパスからどのフィールドを取るかは AD_GROUPS に表として書き、compile_extractor() で
+一度だけ関数に組み立ててから、各レスポンスに適用する。
+"""
+from json_codec import response_json
+from metrics import get_metrics
+
+# 抽出ロジックを変えたら上げる（HTTPキャッシュの解析結果を無効にするため）
+PARSER_VERSION = 1
+
+L_URL_TEMPLATE = (
+    "https://www.homes.co.jp/mansion/b-{}/?cmp_id=001_08359_0009551273&utm_campaign=alliance_sumulab"
+    "&utm_content=001_08359_0009551273&utm_medium=cpa&utm_source=sumulab&utm_term="
+)
+YAHOO_NEW_PREFIX = 'https://realestate.yahoo.co.jp/new/mansion/dtl/'
+YAHOO_OLD_PREFIX = 'http://new.realestate.yahoo.co.jp/mansion/'
+YAHOO_TRACKING_PARAM = 'sc_out=mikle_mansion_official'
+
+AD_INFO_FIELDS = ('entry_id', 'p_dtlurl', 'p_sold_flag', 'l_url', 'l_sold_flag', 'y_dtlurl', 'y_sold_flag')
+# シートの M～R 列に並べる順
+AD_ROW_FIELDS = ('p_dtlurl', 'p_sold_flag', 'l_url', 'l_sold_flag', 'y_dtlurl', 'y_sold_flag')
+
+
+def _str_or_empty(value):
+    """None・0・'' はすべて空文字にする"""
+    return str(value or '')
+
+
+def _str_if_present(value):
+    """None のときだけ空文字にする（0 は '0'）"""
+    return '' if value is None else str(value)
+
+
+def _homes_url(project_cd):
+    return L_URL_TEMPLATE.format(project_cd) if project_cd else ''
+
+
+def _yahoo_url(dtlurl):
+    """Yahoo不動産のURL（新旧両形式）だけを通し、新形式にはトラッキングパラメータを付ける"""
+    if not isinstance(dtlurl, str):
+        return ''
+    if dtlurl.startswith(YAHOO_NEW_PREFIX):
+        # パラメータ二重付加しないようにガード
+        if YAHOO_TRACKING_PARAM not in dtlurl:
+            dtlurl += ('&' if '?' in dtlurl else '?') + YAHOO_TRACKING_PARAM
+        return dtlurl
+    if dtlurl.startswith(YAHOO_OLD_PREFIX):
+        return dtlurl
+    return ''
+
+
+# 各グループは sources（result からのパス候補）を先頭から順に見て、条件を満たした最初の
+# ソースから fields を取り出す。
+#   require: このキーの値が空でないソースだけを採用する（なければ空でない dict なら採用）
+#   guard:   変換後にこのフィールドが空ならグループ全体を捨てる
+AD_GROUPS = (
+    # スレッドの entry_id - result.entry[0]
+    {
+        'sources': (('entry', 0),),
+        'fields': {'entry_id': ('entry_id', _str_if_present)},
+    },
+    # 純広告（P） - result.p
+    {
+        'sources': (('p',),),
+        'fields': {'p_dtlurl': ('dtlurl', _str_or_empty), 'p_sold_flag': ('sold_flag', _str_or_empty)},
+    },
+    # L広告（L） - result.l（URL は project_cd から組み立てる）
+    {
+        'sources': (('l',),),
+        'fields': {'l_url': ('project_cd', _homes_url), 'l_sold_flag': ('sold_flag', _str_or_empty)},
+    },
+    # Y広告（Y） - result.ynew → result.a → result 直下 の順に、dtlurl があるものを採用
+    {
+        'sources': (('ynew',), ('a',), ()),
+        'require': 'dtlurl',
+        'fields': {'y_dtlurl': ('dtlurl', _yahoo_url), 'y_sold_flag': ('sold_flag', _str_if_present)},
+        'guard': 'y_dtlurl',
+    },
+)
+
+
+def _compile_path(path):
+    def resolve(node):
+        for step in path:
+            if isinstance(step, int):
+                if not isinstance(node, list) or len(node) <= step:
+                    return None
+            elif not isinstance(node, dict) or step not in node:
+                return None
+            node = node[step]
+        return node
+    return resolve
+
+
+def _compile_group(group):
+    resolvers = [_compile_path(path) for path in group['sources']]
+    fields = tuple((name, key, transform) for name, (key, transform) in group['fields'].items())
+    require = group.get('require')
+    guard = group.get('guard')
+
+    def extract(result, ad_info):
+        for resolve in resolvers:
+            source = resolve(result)
+            if not isinstance(source, dict) or not source:
+                continue
+            if require and not source.get(require):
+                continue
+            values = {name: transform(source.get(key)) for name, key, transform in fields}
+            if guard and not values[guard]:
+                return
+            ad_info.update(values)
+            return
+    return extract
+
+
+def compile_extractor(groups=AD_GROUPS):
+    """AD_GROUPS の表から ajaxJson のレスポンス（dict）→ ad_info の関数を組み立てる"""
+    extractors = tuple(_compile_group(group) for group in groups)
+    empty = dict.fromkeys(AD_INFO_FIELDS, '')
+
+    def extract_ad_info(data):
+        ad_info = dict(empty)
+        result = data.get('result') if isinstance(data, dict) else None
+        if isinstance(result, dict):
+            for extract in extractors:
+                extract(result, ad_info)
+        return ad_info
+    return extract_ad_info
+
+
+extract_ad_info = compile_extractor()
+
+
+def parse_ad_info(response):
+    """ajaxJson のレスポンスをデコードして広告情報を取り出す"""
+    with get_metrics().timer('parse'):
+        return extract_ad_info(response_json(response))
+
+
+def ad_info_row(ad_info):
+    """広告情報を M～R 列の1行（p_dtlurl, p_sold_flag, l_url, l_sold_flag, y_dtlurl, y_sold_flag）にする"""
+    return [ad_info.get(field, '') for field in AD_ROW_FIELDS]
@@ -0,0 +1,266 @@
+"""Google Sheets の読み書き（サービスの作成・batchGet / batchUpdate・新着物件シートの列構成と差分書き込み）"""
+import json
+import os
+import threading
+import startup_profile
+from metrics import get_metrics
+from write_planner import plan_writes
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+# 新着物件シートの書き込み列（C列: スレURL, L列: Building ID, M～S列: 広告情報 + 日付）のヘッダー
+C_HEADER = ['スレURL']
+L_HEADER = ['Building ID']
+M_HEADER = ['p_dtlurl', 'p_sold_flag', 'l_url', 'l_sold_flag', 'y_dtlurl', 'y_sold_flag', 'first_sold_out_date']
+
+_credentials = None
+_service = None
+_service_lock = threading.Lock()
+
+
+def _load_credentials():
+    """GOOGLE_SHEETS_CREDENTIALS のサービスアカウント認証情報（プロセス内で1回だけ作る）"""
+    global _credentials
+    if _credentials is None:
+        from google.oauth2.service_account import Credentials
+        credentials_dict = json.loads(os.environ.get('GOOGLE_SHEETS_CREDENTIALS'))
+        _credentials = Credentials.from_service_account_info(credentials_dict, scopes=SCOPES)
+    return _credentials
+
+
+def _build_google_service():
+    # googleapiclient の読み込みは重いので、本物の API を使うときだけここで読み込む
+    from googleapiclient.discovery import build
+    startup_profile.mark('googleapiclient 読み込み')
+    credentials = _load_credentials()
+    # ライブラリ同梱の discovery document を使い、取得やファイルキャッシュを行わない
+    return build('sheets', 'v4', credentials=credentials, static_discovery=True, cache_discovery=False)
+
+
+def get_sheets_service():
+    """SHEETS_BACKEND に応じた Sheets API のサービスを返す（プロセス内で使い回す）
+
+    google（既定）は GOOGLE_SHEETS_CREDENTIALS のサービスアカウントで本物の API に、
+    emulator はローカルのエミュレーター（sheets_emulator.py）につなぐ。
+    """
+    global _service
+    with _service_lock:
+        if _service is not None:
+            return _service
+        backend = os.environ.get('SHEETS_BACKEND', 'google')
+        if backend == 'emulator':
+            import sheets_emulator
+            _service = sheets_emulator.service_from_env()
+        elif backend == 'google':
+            _service = _build_google_service()
+        else:
+            raise ValueError(f"Unknown SHEETS_BACKEND: {backend}")
+        startup_profile.mark('Sheets サービス作成')
+        return _service
+
+
+def batch_get(service, spreadsheet_id, ranges):
+    """複数範囲を1回の batchGet で読み込み、ranges と同じ順序で values のリストを返す"""
+    unique_ranges = list(dict.fromkeys(ranges))
+    startup_profile.mark_once('最初の Sheets リクエスト')
+    metrics = get_metrics()
+    try:
+        with metrics.timer('sheet_read'):
+            result = service.spreadsheets().values().batchGet(
+                spreadsheetId=spreadsheet_id,
+                ranges=unique_ranges
+            ).execute()
+    except Exception as e:
+        metrics.error('sheet_read', e)
+        raise
+    values_by_range = {
+        requested: value_range.get('values', [])
+        for requested, value_range in zip(unique_ranges, result.get('valueRanges', []))
+    }
+    return [values_by_range.get(r, []) for r in ranges]
+
+
+def batch_update(service, spreadsheet_id, data):
+    """[(range, values), ...] を1回の batchUpdate でまとめて書き込む"""
+    body = {
+        'valueInputOption': 'RAW',
+        'data': [{'range': r, 'values': values} for r, values in data]
+    }
+    metrics = get_metrics()
+    try:
+        with metrics.timer('sheet_write'):
+            result = service.spreadsheets().values().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body=body
+            ).execute()
+    except Exception as e:
+        metrics.error('sheet_write', e)
+        raise
+    metrics.count('sheet_write.cells', sum(len(row) for _, values in data for row in values))
+    return result
+
+
+def read_column(service, spreadsheet_id, cell_range):
+    """1列分の範囲を読み、行ごとの先頭セルの値（空行は ''）のリストを返す"""
+    return [row[0] if row else '' for row in batch_get(service, spreadsheet_id, [cell_range])[0]]
+
+
+def fetch_property_names(service, spreadsheet_id, input_range):
+    """物件名の列を読む。空行も '' として残すので、戻り値の i 番目はシートの同じ行に対応する"""
+    try:
+        return read_column(service, spreadsheet_id, input_range)
+    except Exception as e:
+        print(f"Error fetching property names: {e}")
+        return []
+
+
+def read_building_ids(service, spreadsheet_id):
+    """L列（Building ID）の既存データをデータ行の順に読む（空行は ''）"""
+    return [value.strip() for value in read_column(service, spreadsheet_id, '新着物件!L2:L')]
+
+
+def update_values(service, spreadsheet_id, cell_range, values):
+    """cell_range を左上として values を書き込む（values.update）"""
+    metrics = get_metrics()
+    try:
+        with metrics.timer('sheet_write'):
+            result = service.spreadsheets().values().update(
+                spreadsheetId=spreadsheet_id, range=cell_range, valueInputOption='RAW', body={'values': values}
+            ).execute()
+    except Exception as e:
+        metrics.error('sheet_write', e)
+        raise
+    metrics.count('sheet_write.cells', sum(len(row) for row in values))
+    return result
+
+
+def load_sheet_state(service, spreadsheet_id, input_range):
+    """物件名と、C列・L列・M～S列の既存データから作る Building ID ごとの対応表を読み込む
+
+    読み込みに失敗したら None を返す。
+    """
+    # 物件名とC列・L列・M～S列・B列の既存データを1回の batchGet で取得
+    # C/L/M～S列は書き込み差分の計算にも使うのでヘッダー行から読む
+    c_column_range = '新着物件!C1:C'  # スレURL
+    l_column_range = '新着物件!L1:L'  # Building ID
+    ms_column_range = '新着物件!M1:S'  # M～S列の全データ (p_dtlurl, p_sold_flag, l_url, l_sold_flag, y_dtlurl, y_sold_flag, first_sold_out_date)
+    b_column_range = '新着物件!B2:B'  # 物件名
+
+    try:
+        with get_metrics().phase('sheet_read'):
+            input_values, sheet_c_values, sheet_l_values, sheet_ms_values, existing_b_values = batch_get(
+                service, spreadsheet_id, [input_range, c_column_range, l_column_range, ms_column_range, b_column_range]
+            )
+    except Exception as e:
+        print(f"Error fetching sheet data: {e}")
+        return None
+    startup_profile.mark('シート読み込み完了')
+    existing_l_values = sheet_l_values[1:]
+    existing_ms_values = sheet_ms_values[1:]
+
+    property_names = [row[0] if row else '' for row in input_values]
+    print(f"Found {len(property_names)} properties to process\n")
+    get_metrics().count('rows', len(property_names))
+
+    date_map = {}  # {building_id: date}
+    url_map = {}   # {building_id: {'p_dtlurl': '', 'l_url': '', 'y_dtlurl': ''}}
+    status_map = {}  # {building_id: {'thread_url': '', 'p_sold_flag': '', 'l_sold_flag': '', 'y_sold_flag': ''}}
+    property_building_map = {}  # {property_name: building_id} - 物件名とBuilding IDの対応
+    
+    try:
+        # Building IDと日付、URL、物件名をマッピング
+        max_rows = max(len(existing_l_values), len(existing_ms_values), len(existing_b_values))
+        for i in range(max_rows):
+            building_id = existing_l_values[i][0].strip() if i < len(existing_l_values) and existing_l_values[i] else ''
+            property_name = existing_b_values[i][0].strip() if i < len(existing_b_values) and existing_b_values[i] else ''
+
+            # M～S列のデータを取得 (7列: p_dtlurl, p_sold_flag, l_url, l_sold_flag, y_dtlurl, y_sold_flag, first_sold_out_date)
+            ms_row = existing_ms_values[i] if i < len(existing_ms_values) else []
+            p_url = ms_row[0].strip() if len(ms_row) > 0 and ms_row[0] else ''
+            l_url = ms_row[2].strip() if len(ms_row) > 2 and ms_row[2] else ''
+            y_url = ms_row[4].strip() if len(ms_row) > 4 and ms_row[4] else ''
+            date_value = ms_row[6].strip() if len(ms_row) > 6 and ms_row[6] else ''
+            c_row = sheet_c_values[i + 1] if i + 1 < len(sheet_c_values) else []
+
+            if building_id:
+                if date_value:
+                    date_map[building_id] = date_value
+                url_map[building_id] = {
+                    'p_dtlurl': p_url,
+                    'l_url': l_url,
+                    'y_dtlurl': y_url
+                }
+                status_map[building_id] = {
+                    'thread_url': c_row[0].strip() if c_row and c_row[0] else '',
+                    'p_sold_flag': ms_row[1].strip() if len(ms_row) > 1 and ms_row[1] else '',
+                    'l_sold_flag': ms_row[3].strip() if len(ms_row) > 3 and ms_row[3] else '',
+                    'y_sold_flag': ms_row[5].strip() if len(ms_row) > 5 and ms_row[5] else ''
+                }
+                # 物件名とBuilding IDの対応を記録
+                if property_name:
+                    property_building_map[property_name] = building_id
+
+        print(f"Created date mapping for {len(date_map)} Building IDs")
+        print(f"Created URL mapping for {len(url_map)} Building IDs")
+        print(f"Created property-building mapping for {len(property_building_map)} properties")
+    except Exception as e:
+        print(f"Error fetching existing data: {e}")
+        pass
+
+    return {
+        'property_names': property_names,
+        'property_building_map': property_building_map,
+        'date_map': date_map,
+        'url_map': url_map,
+        'status_map': status_map,
+        'sheet_values': {'C': sheet_c_values, 'L': sheet_l_values, 'M': sheet_ms_values}
+    }
+
+
+def plan_changes(c_data, l_data, m_data, sheet_values, start_index=0):
+    """既存の値と比べて変更のあったセルの書き込み範囲を作る
+
+    c_data 等の先頭はシートの (start_index + 1) 行目に当たる。
+    戻り値は ([(range, values), ...], 書き込むセル数, 変更なしのセル数)。
+    """
+    writes = []
+    written_cells = 0
+    unchanged_cells = 0
+    for start_column, new_rows, width in [('C', c_data, 1), ('L', l_data, 1), ('M', m_data, 7)]:
+        old_rows = sheet_values[start_column][start_index:start_index + len(new_rows)]
+        column_writes, column_written, column_unchanged = plan_writes(
+            '新着物件', start_column, start_index + 1, new_rows, old_rows, width
+        )
+        writes.extend(column_writes)
+        written_cells += column_written
+        unchanged_cells += column_unchanged
+    return writes, written_cells, unchanged_cells
+
+
+def apply_changes(sheet_values, c_data, l_data, m_data, start_index=0):
+    """書き込んだ値で sheet_values の該当行を置き換える"""
+    for column, new_rows in [('C', c_data), ('L', l_data), ('M', m_data)]:
+        values = sheet_values[column]
+        if len(values) < start_index:
+            values.extend([] for _ in range(start_index - len(values)))
+        values[start_index:start_index + len(new_rows)] = [list(row) for row in new_rows]
+
+
+def write_changes(service, spreadsheet_id, c_data, l_data, m_data, sheet_values):
+    """既存の値と比べて変更のあったセルだけを1回の batchUpdate でまとめて書き込む
+
+    書き込みに成功したら sheet_values を書き込んだ値に更新し、True を返す。
+    """
+    writes, written_cells, unchanged_cells = plan_changes(c_data, l_data, m_data, sheet_values)
+
+    print(f"\n=== 書き込み結果 ===")
+    print(f"書き込むセル: {written_cells} / 変更なし: {unchanged_cells} ({len(writes)} 範囲)")
+    if writes:
+        try:
+            result = batch_update(service, spreadsheet_id, writes)
+            print(f"Total updated cells: {result.get('totalUpdatedCells')}")
+        except Exception as e:
+            print(f"Error writing C, L, M:S columns: {e}")
+            return False
+    apply_changes(sheet_values, c_data, l_data, m_data)
+    return True
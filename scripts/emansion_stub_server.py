@@ -0,0 +1,188 @@
+"""e-mansion の代わりに記録済みの応答を返すローカルサーバー（オフラインでのベンチマーク・負荷試験用）
+
+HTTP_RECORD_PATH で記録したアーカイブ（http_archive.py）を STUB_ARCHIVE_PATH で読み込み、
+同じパスへのリクエストに記録した応答を返す。スクリプト側は EMANSION_BASE_URL をこのサーバーに向ける。
+
+  STUB_ARCHIVE_PATH=.cache/emansion.jsonl.gz python scripts/emansion_stub_server.py
+  EMANSION_BASE_URL=http://127.0.0.1:8765 python scripts/fetch_mansion_links.py
+
+環境変数:
+  STUB_HOST / STUB_PORT       待ち受けるアドレス（127.0.0.1:8765）
+  STUB_LATENCY_MS             応答までの平均遅延（ミリ秒）
+  STUB_LATENCY_JITTER_MS      遅延のばらつき（± ミリ秒）
+  STUB_ERROR_RATE             503 を返す割合（0〜1）
+  STUB_FORBIDDEN_RATE         403 を返す割合（0〜1）
+  STUB_SYNTHETIC              1 ならアーカイブにないパスにも合成した応答を返す（なければ 404）
+  STUB_SEED                   遅延・エラー注入の乱数シード
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from http_archive import entry_body, load_archive
+
+SEARCH_PATH = '/bbs/estate/ajaxSearch/'
+
+
+def synthetic_response(path):
+    """アーカイブにないパスに対して、パスから決まる合成応答（status, body）を返す"""
+    parts = urlsplit(path)
+    if parts.path == SEARCH_PATH:
+        name = parse_qs(parts.query).get('q', [''])[0]
+        rng = random.Random(zlib.crc32(name.encode('utf-8')))
+        # 1割程度は見つからない物件にする
+        buildings = [] if not name or rng.random() < 0.1 else [
+            {'buildingid': str(100000 + zlib.crc32(name.encode('utf-8')) % 900000), 'name': name}
+        ]
+        return 200, {'building': buildings}
+    segments = parts.path.strip('/').split('/')
+    if len(segments) == 5 and segments[:3] == ['bbs', 'yre', 'building'] and segments[4] == 'ajaxJson':
+        building_id = segments[3]
+        rng = random.Random(building_id)
+        result = {'entry': [{'entry_id': zlib.crc32(building_id.encode('ascii', 'replace')) % 1000000}]}
+        if rng.random() < 0.4:
+            result['p'] = {'dtlurl': f'https://www.example.co.jp/mansion/{building_id}/',
+                           'sold_flag': rng.choice(['0', '1'])}
+        if rng.random() < 0.4:
+            result['l'] = {'project_cd': f'{building_id}01', 'sold_flag': rng.choice(['0', '1'])}
+        if rng.random() < 0.4:
+            result['ynew'] = {'dtlurl': f'https://realestate.yahoo.co.jp/new/mansion/dtl/{building_id}/',
+                              'sold_flag': rng.choice([0, 1])}
+        return 200, {'result': result}
+    return 404, None
+
+
+class StubState:
+    """アーカイブと注入設定、応答の集計"""
+
+    def __init__(self, entries, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, forbidden_rate=0.0,
+                 synthetic=False, seed=None):
+        self.entries = entries
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.forbidden_rate = forbidden_rate
+        self.synthetic = synthetic
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, status):
+        with self._lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+    def draw(self):
+        """このリクエストの遅延（秒）と注入するステータス（なければ None）を決める"""
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            roll = self._rng.random()
+        if roll < self.forbidden_rate:
+            return delay, 403
+        if roll < self.forbidden_rate + self.error_rate:
+            return delay, 503
+        return delay, None
+
+    def lookup(self, path):
+        """(status, headers, body) を返す"""
+        entry = self.entries.get(path)
+        if entry is not None:
+            return entry['status'], dict(entry.get('headers', {})), entry_body(entry)
+        if not self.synthetic:
+            return 404, {}, b''
+        status, data = synthetic_response(path)
+        if data is None:
+            return status, {}, b''
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json; charset=UTF-8',
+            'ETag': '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+        }
+        return status, headers, body
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def do_GET(self):
+        delay, injected = self.state.draw()
+        if delay:
+            time.sleep(delay)
+        if injected is not None:
+            self._send(injected, {'Content-Type': 'text/plain'}, b'injected error')
+            return
+        status, headers, body = self.state.lookup(self.path)
+        etag = headers.get('ETag')
+        if status == 200 and etag and self.headers.get('If-None-Match') == etag:
+            self._send(304, {'ETag': etag}, b'')
+            return
+        self._send(status, headers, body)
+
+    def _send(self, status, headers, body):
+        self.state.count(status)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # リクエストごとのログは出さない（負荷試験で大量に出るため）
+        pass
+
+
+def make_server(state, host='127.0.0.1', port=8765):
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(state, host='127.0.0.1', port=0):
+    """バックグラウンドスレッドでサーバーを起動し、(server, base_url) を返す（port=0 は空きポート）"""
+    server = make_server(state, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def state_from_env():
+    archive_path = os.environ.get('STUB_ARCHIVE_PATH')
+    seed = os.environ.get('STUB_SEED')
+    return StubState(
+        load_archive(archive_path),
+        latency_ms=float(os.environ.get('STUB_LATENCY_MS', '0')),
+        jitter_ms=float(os.environ.get('STUB_LATENCY_JITTER_MS', '0')),
+        error_rate=float(os.environ.get('STUB_ERROR_RATE', '0')),
+        forbidden_rate=float(os.environ.get('STUB_FORBIDDEN_RATE', '0')),
+        synthetic=os.environ.get('STUB_SYNTHETIC', '') == '1',
+        seed=int(seed) if seed else None
+    )
+
+
+def main():
+    state = state_from_env()
+    host = os.environ.get('STUB_HOST', '127.0.0.1')
+    port = int(os.environ.get('STUB_PORT', '8765'))
+    server = make_server(state, host, port)
+    print(f"Serving {len(state.entries)} archived responses on http://{host}:{port}"
+          f"{' (synthetic fallback)' if state.synthetic else ''}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n=== Stub server stats ===")
+        for status in sorted(state.counts):
+            print(f"HTTP {status}: {state.counts[status]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,378 +1,236 @@
 import os
-import json
-import requests
+import sys
 import time
-from urllib.parse import quote
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+import startup_profile
+from metrics import get_metrics
 from datetime import datetime
+from building_index import BuildingIndex, DEFAULT_INDEX_PATH, DEFAULT_NEGATIVE_TTL_HOURS, DEFAULT_NEGATIVE_MAX_TTL_DAYS
+from shard import SHARD_BY_BUILDING, DEFAULT_SHARD_DIR, select_rows, shard_path, write_shard_results, load_shard_results, merged_lookups
+from checkpoint import RunJournal, DEFAULT_CHECKPOINT_PATH, DEFAULT_WINDOW_HOURS
+from http_cache import HttpCache, DEFAULT_HTTP_CACHE_PATH
+from freshness import FreshnessStore, DEFAULT_FRESHNESS_PATH, DEFAULT_BASE_INTERVAL_DAYS, DEFAULT_MAX_INTERVAL_DAYS
+from change_feed import ChangeFeed
+from history_store import HistoryStore, DEFAULT_HISTORY_PATH
+from emansion.parser import PARSER_VERSION
+from emansion.sheets import get_sheets_service, load_sheet_state, write_changes
+from emansion.orchestrator import (
+    fetch_lookups, build_columns, stream_lookups, run_watch, fetch_lookups_within_budget,
+    record_history, publish_changes, print_ad_stats, close_stores, write_run_report, finish
+)
+
+DEFAULT_PIPELINE_CHUNK_ROWS = 500
+DEFAULT_PIPELINE_QUEUE_CHUNKS = 2
+DEFAULT_TIME_BUDGET_RESERVE_SECONDS = 30
+
+
+def time_budget_seconds():
+    """--time-budget=秒（または環境変数 TIME_BUDGET_SECONDS）。指定がなければ None"""
+    for i, arg in enumerate(sys.argv[1:], 1):
+        if arg.startswith('--time-budget='):
+            return float(arg.split('=', 1)[1])
+        if arg == '--time-budget' and i + 1 < len(sys.argv):
+            return float(sys.argv[i + 1])
+    value = os.environ.get('TIME_BUDGET_SECONDS', '')
+    return float(value) if value else None
 
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
-
-def get_sheets_service():
-    credentials_json = os.environ.get('GOOGLE_SHEETS_CREDENTIALS')
-    credentials_dict = json.loads(credentials_json)
-    credentials = Credentials.from_service_account_info(credentials_dict, scopes=SCOPES)
-    return build('sheets', 'v4', credentials=credentials)
-
-def fetch_property_names(service, spreadsheet_id, input_range):
-    try:
-        result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=input_range).execute()
-        values = result.get('values', [])
-        return [row[0] if row else '' for row in values]
-    except Exception as e:
-        print(f"Error fetching property names: {e}")
-        return []
-
-def search_building_id(property_name):
-    try:
-        if not property_name:
-            return None
-        search_url = f"https://www.e-mansion.co.jp/bbs/estate/ajaxSearch/?q={quote(property_name)}"
-        time.sleep(1)
-        response = requests.get(search_url, timeout=10, headers=HEADERS)
-        response.raise_for_status()
-        data = response.json()
-        if data.get('building') and len(data['building']) > 0:
-            return data['building'][0]['buildingid']
-        return None
-    except Exception as e:
-        print(f"  Error: {e}")
-        return None
-
-def fetch_ad_info(building_id):
-    """Ajax JSON から広告情報を取得"""
+def main():
+    # どのモード・どこで return しても（シートの読み込みに失敗しても）起動プロファイルを表示する
     try:
-        json_url = f"https://www.e-mansion.co.jp/bbs/yre/building/{building_id}/ajaxJson/"
-        time.sleep(1)
-        response = requests.get(json_url, timeout=10, headers=HEADERS)
-        response.raise_for_status()
-        data = response.json()
-        
-        ad_info = {
-            'entry_id': '',
-            'p_dtlurl': '',
-            'p_sold_flag': '',
-            'l_url': '',
-            'l_sold_flag': '',
-            'y_dtlurl': '',
-            'y_sold_flag': ''
-        }
-        
-        if 'result' in data and data['result'] is not None:
-            result_data = data['result']
-            
-            # entry_id を取得
-            if 'entry' in result_data and isinstance(result_data['entry'], list) and len(result_data['entry']) > 0:
-                entry_id = result_data['entry'][0].get('entry_id')
-                if entry_id is not None:
-                    ad_info['entry_id'] = str(entry_id)
-            
-            # 純広告（P） - result.p キー
-            if 'p' in result_data and isinstance(result_data['p'], dict) and result_data['p']:
-                p = result_data['p']
-                ad_info['p_dtlurl'] = str(p.get('dtlurl') or '')
-                ad_info['p_sold_flag'] = str(p.get('sold_flag') or '')
-            
-            # L広告（L） - result.l キー
-            if 'l' in result_data and isinstance(result_data['l'], dict) and result_data['l']:
-                l = result_data['l']
-                project_cd = l.get('project_cd', '')
-                if project_cd:
-                    ad_info['l_url'] = f"https://www.homes.co.jp/mansion/b-{project_cd}/?cmp_id=001_08359_0009551273&utm_campaign=alliance_sumulab&utm_content=001_08359_0009551273&utm_medium=cpa&utm_source=sumulab&utm_term="
-                ad_info['l_sold_flag'] = str(l.get('sold_flag') or '')
-            
-            
-            # Y広告の処理（dtlurlとsold_flagをペアで取得）
-            y_dtlurl = ''
-            y_sold_flag = ''
-            
-            # 1. ynew キーを確認
-            if 'ynew' in result_data and isinstance(result_data['ynew'], dict):
-                dtlurl = result_data['ynew'].get('dtlurl', '')
-                if dtlurl:
-                    y_dtlurl = dtlurl
-                    sold_flag = result_data['ynew'].get('sold_flag')
-                    if sold_flag is not None:
-                        y_sold_flag = str(sold_flag)
-            
-            # 2. a キーを確認（ynewで取得できなかった場合のみ）
-            if not y_dtlurl and 'a' in result_data and isinstance(result_data['a'], dict):
-                dtlurl = result_data['a'].get('dtlurl', '')
-                if dtlurl:
-                    y_dtlurl = dtlurl
-                    sold_flag = result_data['a'].get('sold_flag')
-                    if sold_flag is not None:
-                        y_sold_flag = str(sold_flag)
-            
-            # 3. result 直下を確認（ynewとaで取得できなかった場合のみ）
-            if not y_dtlurl and 'dtlurl' in result_data:
-                dtlurl = result_data.get('dtlurl', '')
-                if dtlurl:
-                    y_dtlurl = dtlurl
-                    sold_flag = result_data.get('sold_flag')
-                    if sold_flag is not None:
-                        y_sold_flag = str(sold_flag)
-            
-            # Yahoo不動産のURLかどうかを判定（新旧両形式をサポート）
-            if y_dtlurl:
-                is_yahoo_url = (
-                    y_dtlurl.startswith('https://realestate.yahoo.co.jp/new/mansion/dtl/') or
-                    y_dtlurl.startswith('http://new.realestate.yahoo.co.jp/mansion/')
-                )
-                
-                if is_yahoo_url:
-                    # 新形式のYahoo不動産URLの場合のみパラメータを追加
-                    if y_dtlurl.startswith('https://realestate.yahoo.co.jp/new/mansion/dtl/'):
-                        # パラメータ二重付加しないようにガード
-                        if 'sc_out=mikle_mansion_official' not in y_dtlurl:
-                            if '?' in y_dtlurl:
-                                y_dtlurl += '&sc_out=mikle_mansion_official'
-                            else:
-                                y_dtlurl += '?sc_out=mikle_mansion_official'
-                    
-                    # URLとsold_flagをペアで設定
-                    ad_info['y_dtlurl'] = y_dtlurl
-                    if y_sold_flag:
-                        ad_info['y_sold_flag'] = y_sold_flag
-
-
-
-
+        run()
+    finally:
+        startup_profile.print_report()
 
 
-
-
-        
-        return ad_info
-    except Exception as e:
-        print(f"  Error fetching ad info: {e}")
-        return None
-
-def main():
+def run():
+    started_at = time.time()
     spreadsheet_id = os.environ.get('SPREADSHEET_ID')
     input_range = os.environ.get('INPUT_RANGE', '新着物件!B2:B')
+    # 1 のときは1件ずつ処理、2以上で並列取得エンジンを使用
+    concurrency = int(os.environ.get('CONCURRENCY', '1'))
     
     if not spreadsheet_id:
         raise ValueError("SPREADSHEET_ID is not set")
     
+    startup_profile.mark('モジュール読み込み')
     service = get_sheets_service()
-    property_names = fetch_property_names(service, spreadsheet_id, input_range)
-    print(f"Found {len(property_names)} properties to process\n")
-    
-    # L列とM～S列、B列の既存データを取得
-    l_column_range = '新着物件!L2:L'  # Building ID
-    ms_column_range = '新着物件!M2:S'  # M～S列の全データ (p_dtlurl, p_sold_flag, l_url, l_sold_flag, y_dtlurl, y_sold_flag, first_sold_out_date)
-    b_column_range = '新着物件!B2:B'  # 物件名
-
-    date_map = {}  # {building_id: date}
-    url_map = {}   # {building_id: {'p_dtlurl': '', 'l_url': '', 'y_dtlurl': ''}}
-    property_building_map = {}  # {property_name: building_id} - 物件名とBuilding IDの対応
-    
-    try:
-        result_l = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=l_column_range).execute()
-        existing_l_values = result_l.get('values', [])
-        
-        result_ms = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=ms_column_range).execute()
-        existing_ms_values = result_ms.get('values', [])
-        
-        result_b = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=b_column_range).execute()
-        existing_b_values = result_b.get('values', [])
-        
-        # Building IDと日付、URL、物件名をマッピング
-        max_rows = max(len(existing_l_values), len(existing_ms_values), len(existing_b_values))
-        for i in range(max_rows):
-            building_id = existing_l_values[i][0].strip() if i < len(existing_l_values) and existing_l_values[i] else ''
-            property_name = existing_b_values[i][0].strip() if i < len(existing_b_values) and existing_b_values[i] else ''
-
-            # M～S列のデータを取得 (7列: p_dtlurl, p_sold_flag, l_url, l_sold_flag, y_dtlurl, y_sold_flag, first_sold_out_date)
-            ms_row = existing_ms_values[i] if i < len(existing_ms_values) else []
-            p_url = ms_row[0].strip() if len(ms_row) > 0 and ms_row[0] else ''
-            l_url = ms_row[2].strip() if len(ms_row) > 2 and ms_row[2] else ''
-            y_url = ms_row[4].strip() if len(ms_row) > 4 and ms_row[4] else ''
-            date_value = ms_row[6].strip() if len(ms_row) > 6 and ms_row[6] else ''
-
-            if building_id:
-                if date_value:
-                    date_map[building_id] = date_value
-                url_map[building_id] = {
-                    'p_dtlurl': p_url,
-                    'l_url': l_url,
-                    'y_dtlurl': y_url
-                }
-                # 物件名とBuilding IDの対応を記録
-                if property_name:
-                    property_building_map[property_name] = building_id
-
-        print(f"Created date mapping for {len(date_map)} Building IDs")
-        print(f"Created URL mapping for {len(url_map)} Building IDs")
-        print(f"Created property-building mapping for {len(property_building_map)} properties")
-    except Exception as e:
-        print(f"Error fetching existing data: {e}")
-        pass
-
-    # C列用データ（スレURL）
-    c_data = [['スレURL']]
-
-    # L列用データ（Building ID）
-    l_data = [['Building ID']]
+    state = load_sheet_state(service, spreadsheet_id, input_range)
+    if state is None:
+        write_run_report(False)
+        return
+    property_names = state['property_names']
+    property_building_map = state['property_building_map']
+    date_map, url_map, status_map = state['date_map'], state['url_map'], state['status_map']
+    sheet_values = state['sheet_values']
 
-    # M～S列用データ（広告情報 + 日付）
-    # M列: p_dtlurl, N列: p_sold_flag, O列: l_url, P列: l_sold_flag, Q列: y_dtlurl, R列: y_sold_flag, S列: first_sold_out_date
-    m_data = [['p_dtlurl', 'p_sold_flag', 'l_url', 'l_sold_flag', 'y_dtlurl', 'y_sold_flag', 'first_sold_out_date']]
-    
     today_str = datetime.now().strftime('%Y/%m/%d')
+    # CHANGE_FEED_PATH を指定すると、書き込んだ変化を物件単位のイベントとして JSONL に追記する
+    feed = ChangeFeed(os.environ.get('CHANGE_FEED_PATH', ''), today_str)
+    shard_dir = os.environ.get('SHARD_DIR', DEFAULT_SHARD_DIR)
+    shard_count = int(os.environ.get('SHARD_COUNT', '1'))
+    # 実行ごとの広告情報を追記し、掲載・完売の推移を後から引けるようにする（HISTORY_DB_PATH を空にすると記録しない）
+    history_path = os.environ.get('HISTORY_DB_PATH', DEFAULT_HISTORY_PATH)
+
+    if os.environ.get('SHARD_MERGE', '') == '1':
+        # 各シャードの結果を集めて C列・L列・M～S列にまとめて書き込む（取得は行わない）
+        results, shard_indexes, merged_count = load_shard_results(shard_dir)
+        lookups, mismatched = merged_lookups(property_names, results)
+        print(f"=== シャードのマージ ===")
+        print(f"読み込んだシャード: {len(shard_indexes)} / {merged_count or 0}")
+        missing = sorted(set(range(merged_count or 0)) - shard_indexes)
+        if missing:
+            print(f"結果のないシャード: {', '.join(map(str, missing))}（該当行はシートの値を残す）")
+        print(f"結果のある行: {sum(1 for lookup in lookups if lookup is not None)} / {len(property_names)}")
+        if mismatched:
+            print(f"物件名が一致せず反映しなかった行: {mismatched}")
+        c_data, l_data, m_data = build_columns(lookups, date_map, url_map, status_map, today_str, sheet_values)
+        print_ad_stats(c_data, m_data)
+        # 履歴はシャードでは記録せず、ここで全シャード分をまとめて1つのストアに記録する
+        if history_path:
+            history = HistoryStore(history_path)
+            record_history(history, lookups)
+            history.print_stats()
+            history.close()
+        # シャードで消したインデックスの登録はマージ前のキャッシュから戻ってくるので、
+        # L列が空のまま見つからなかった物件名はマージしたインデックスからも消す
+        unresolved = [
+            name for name, lookup in zip(property_names, lookups)
+            if name and name not in property_building_map and lookup is not None and not lookup[0]
+        ]
+        if unresolved:
+            index = BuildingIndex(os.environ.get('BUILDING_INDEX_PATH', DEFAULT_INDEX_PATH))
+            index.forget(unresolved)
+            print(f"インデックスから消した物件名: {index.forgotten} 件")
+            index.close()
+        with get_metrics().phase('write'):
+            completed = write_changes(service, spreadsheet_id, c_data, l_data, m_data, sheet_values)
+        if completed:
+            publish_changes(feed, state, lookups, c_data, l_data, m_data)
+        write_run_report(completed, feed=feed)
+        return
 
-    for i, property_name in enumerate(property_names, 1):
-        print(f"[{i}/{len(property_names)}] {property_name}", end=" -> ")
-        
-        # 既存のBuilding IDがあればそれを使用、なければ検索
-        building_id = property_building_map.get(property_name)
-        if building_id:
-            print(f"ID: {building_id} (cached)")
-        else:
-            building_id = search_building_id(property_name)
+    # シートにない物件名はローカルのBuilding IDインデックスから補完
+    index = BuildingIndex(
+        os.environ.get('BUILDING_INDEX_PATH', DEFAULT_INDEX_PATH),
+        negative_ttl_hours=float(os.environ.get('NEGATIVE_CACHE_TTL_HOURS', DEFAULT_NEGATIVE_TTL_HOURS)),
+        negative_max_ttl_days=float(os.environ.get('NEGATIVE_CACHE_MAX_TTL_DAYS', DEFAULT_NEGATIVE_MAX_TTL_DAYS))
+    )
+    index.seed(property_building_map, property_names)
+    known_ids = dict(property_building_map)
+    for property_name in property_names:
+        if property_name and property_name not in known_ids:
+            building_id = index.get(property_name)
+            if building_id:
+                known_ids[property_name] = building_id
+
+    # 差分更新モードでは完売・広告なしの物件の再取得間隔を伸ばし、前回の値を引き継ぐ
+    freshness = FreshnessStore(
+        os.environ.get('FRESHNESS_DB_PATH', DEFAULT_FRESHNESS_PATH),
+        enabled=os.environ.get('INCREMENTAL', '') == '1',
+        base_interval_days=float(os.environ.get('INCREMENTAL_BASE_INTERVAL_DAYS', DEFAULT_BASE_INTERVAL_DAYS)),
+        max_interval_days=float(os.environ.get('INCREMENTAL_MAX_INTERVAL_DAYS', DEFAULT_MAX_INTERVAL_DAYS))
+    )
+
+    # ajaxJson の応答は検証子と本文ハッシュでキャッシュし、変化がなければ解析を省く
+    http_cache = HttpCache(os.environ.get('HTTP_CACHE_PATH', DEFAULT_HTTP_CACHE_PATH), parser_version=PARSER_VERSION)
+
+    # シャードの取得結果の履歴はマージのときに記録する
+    history = HistoryStore(history_path) if history_path and shard_count <= 1 else None
+
+    if os.environ.get('WATCH', '') == '1':
+        # 常駐モード（1日1回の全件取得の代わりに、優先度順に取得し続ける）
+        completed = run_watch(service, spreadsheet_id, input_range, state, index, freshness, http_cache, history,
+                              os.environ.get('CHANGE_FEED_PATH', ''))
+        close_stores(index, freshness, http_cache, history)
+        write_run_report(completed)
+        return
 
-        if building_id:
-            ad_info = fetch_ad_info(building_id)
-            
-            # Building IDから既存の日付、URLを取得
-            current_date = date_map.get(str(building_id), '')
-            existing_urls = url_map.get(str(building_id), {'p_dtlurl': '', 'l_url': '', 'y_dtlurl': ''})
+    # 途中で止まっても再開できるよう、取得結果を1件ずつジャーナルに記録する
+    journal = RunJournal(
+        os.environ.get('CHECKPOINT_PATH', DEFAULT_CHECKPOINT_PATH),
+        resume=os.environ.get('RESUME', '') == '1',
+        window_hours=float(os.environ.get('CHECKPOINT_WINDOW_HOURS', DEFAULT_WINDOW_HOURS))
+    )
+
+    if shard_count > 1:
+        # SHARD_INDEX 番目のシャードの行だけを取得し、結果をシャードファイルに書き出す
+        shard_index = int(os.environ.get('SHARD_INDEX', '0'))
+        if not 0 <= shard_index < shard_count:
+            raise ValueError(f"SHARD_INDEX must be in 0..{shard_count - 1}")
+        rows = select_rows(property_names, property_building_map, shard_index, shard_count,
+                           os.environ.get('SHARD_BY', SHARD_BY_BUILDING))
+        print(f"Shard {shard_index + 1}/{shard_count}: {len(rows)} / {len(property_names)} rows\n")
+        lookups = fetch_lookups([property_names[i] for i in rows], known_ids, index, freshness, http_cache, journal, concurrency)
+        path = shard_path(shard_dir, shard_index, shard_count)
+        write_shard_results(path, shard_index, shard_count, len(property_names), [
+            (row, property_names[row], building_id, ad_info) for row, (building_id, ad_info) in zip(rows, lookups)
+        ])
+        print(f"\nWrote {len(rows)} rows to {path}")
+        close_stores(index, freshness, http_cache, history)
+        finish(journal, True)
+        return
 
-            if ad_info:
-                # L列に追加
-                l_data.append([str(building_id)])
+    if os.environ.get('PIPELINE', '') == '1':
+        # PIPELINE_CHUNK_ROWS 行ずつ検索・取得・書き込みを重ねて流す
+        with get_metrics().phase('pipeline'):
+            completed = stream_lookups(
+                service, spreadsheet_id, property_names, known_ids, index, freshness, http_cache, journal, concurrency,
+                date_map, url_map, status_map, today_str, sheet_values,
+                chunk_rows=max(1, int(os.environ.get('PIPELINE_CHUNK_ROWS', DEFAULT_PIPELINE_CHUNK_ROWS))),
+                queue_chunks=int(os.environ.get('PIPELINE_QUEUE_CHUNKS', DEFAULT_PIPELINE_QUEUE_CHUNKS)),
+                history=history,
+                on_written=lambda start, lookups, *rows: publish_changes(feed, state, lookups, *rows, start=start, header=False)
+            )
+        close_stores(index, freshness, http_cache, history)
+        finish(journal, completed, feed)
+        return
 
-                # C列にスレURLを追加（APIから取得したentry_idを使用）
-                entry_id = ad_info.get('entry_id', '')
-                thread_url = f"https://m.e-mansion.co.jp/thread/{entry_id}/" if entry_id else ''
-                c_data.append([thread_url])
-                
-                p_flag = ad_info.get('p_sold_flag', '')
-                l_flag = ad_info.get('l_sold_flag', '')
-                y_flag = ad_info.get('y_sold_flag', '')
-                
-                # URLの決定: 新しいURLがあればそれを使用、なければ既存のURLを保持
-                p_url = ad_info.get('p_dtlurl', '') or existing_urls['p_dtlurl']
-                l_url = ad_info.get('l_url', '') or existing_urls['l_url']
-                y_url = ad_info.get('y_dtlurl', '') or existing_urls['y_dtlurl']
-                
-                # 掲載中判定: URLがあり、sold_flagが '0' (掲載中) の場合
-                is_on_sale = False
-                if p_url and p_flag == '0':
-                    is_on_sale = True
-                if l_url and l_flag == '0':
-                    is_on_sale = True
-                if y_url and y_flag == '0':
-                    is_on_sale = True
-                
-                # 日付の決定: 既存の日付を保持、初めて掲載開始されたら今日の日付
-                date_to_write = current_date
-                if not date_to_write and is_on_sale:
-                    date_to_write = today_str
+    time_budget = time_budget_seconds()
+    if time_budget is not None:
+        # 制限時間内に、新しい行 → 掲載中 → 状態不明 → 完売の順で取得する（書き込みの時間は残しておく）
+        reserve = float(os.environ.get('TIME_BUDGET_RESERVE_SECONDS', DEFAULT_TIME_BUDGET_RESERVE_SECONDS))
+        deadline = started_at + max(0.0, time_budget - reserve)
+        lookups, reached_all = fetch_lookups_within_budget(
+            property_names, property_building_map, known_ids, url_map, status_map,
+            index, freshness, http_cache, journal, concurrency, deadline
+        )
+        record_history(history, lookups)
+        c_data, l_data, m_data = build_columns(lookups, date_map, url_map, status_map, today_str, sheet_values)
+        print_ad_stats(c_data, m_data)
+        close_stores(index, freshness, http_cache, history)
+        with get_metrics().phase('write'):
+            completed = write_changes(service, spreadsheet_id, c_data, l_data, m_data, sheet_values)
+        if completed:
+            publish_changes(feed, state, lookups, c_data, l_data, m_data)
+        # 未処理の行が残ったときはジャーナルを残し、次回 RESUME=1 で取得済みの分を再利用する
+        finish(journal, completed and reached_all, feed)
+        return
 
-                # M～S列に追加
-                m_row = [
-                    p_url,
-                    p_flag,
-                    l_url,
-                    l_flag,
-                    y_url,
-                    y_flag,
-                    date_to_write
-                ]
-                m_data.append(m_row)
-            else:
-                # 広告情報が取れなかった場合でも既存のURLを保持
-                l_data.append([str(building_id)])
-                m_data.append([
-                    existing_urls['p_dtlurl'],
-                    '',
-                    existing_urls['l_url'],
-                    '',
-                    existing_urls['y_dtlurl'],
-                    '',
-                    current_date
-                ])
-                # C列にスレURLを追加（entry_idが取得できないので空）
-                c_data.append([''])
-        else:
-            # Building IDが見つからなかった場合
-            print(f"Not found")
-            c_data.append([''])
-            l_data.append([''])
-            m_data.append(['', '', '', '', '', '', ''])  # 広告情報 + 日付を空にする
+    # FLUSH_EVERY を指定すると、その件数の広告情報を取得するごとに取得済みの行をシートへ書き込む
+    def flush_progress(partial_lookups):
+        columns = build_columns(partial_lookups, date_map, url_map, status_map, today_str, sheet_values)
+        write_changes(service, spreadsheet_id, *columns, sheet_values)
+
+    # 各行の (building_id, ad_info) を取得
+    lookups = fetch_lookups(
+        property_names, known_ids, index, freshness, http_cache, journal, concurrency,
+        chunk_size=int(os.environ.get('FLUSH_EVERY', '0')),
+        on_progress=flush_progress
+    )
+    record_history(history, lookups)
+    c_data, l_data, m_data = build_columns(lookups, date_map, url_map, status_map, today_str, sheet_values)
     
     print(f"\nTotal C data rows: {len(c_data)}")
     print(f"Total L data rows: {len(l_data)}")
     print(f"Total M data rows: {len(m_data)}")
+    print_ad_stats(c_data, m_data)
+    close_stores(index, freshness, http_cache, history)
+    with get_metrics().phase('write'):
+        completed = write_changes(service, spreadsheet_id, c_data, l_data, m_data, sheet_values)
+    if completed:
+        publish_changes(feed, state, lookups, c_data, l_data, m_data)
+    finish(journal, completed, feed)
 
-    # 各広告タイプのカウント（URLが存在するものをカウント）
-    thread_url_count = sum(1 for row in c_data[1:] if row[0])
-    p_count = sum(1 for row in m_data[1:] if row[0])
-    l_count = sum(1 for row in m_data[1:] if row[2])
-    y_count = sum(1 for row in m_data[1:] if row[4])
-
-    print(f"\n=== 広告データ統計 ===")
-    print(f"スレURL: {thread_url_count} 件")
-    print(f"純広告（P）: {p_count} 件")
-    print(f"L広告（L）: {l_count} 件")
-    print(f"Yahoo広告（Y）: {y_count} 件")
-    
-    # C列に書き込み（スレURL）
-    try:
-        body = {'values': c_data}
-        result_c = service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range='新着物件!C1:C',
-            valueInputOption='RAW',
-            body=body
-        ).execute()
-        print(f"\n=== C列書き込み結果 ===")
-        print(f"Updated rows: {result_c.get('updatedRows')}")
-        print(f"Updated range: {result_c.get('updatedRange')}")
-    except Exception as e:
-        print(f"Error writing C column: {e}")
-        return
-
-    # L列に書き込み
-    try:
-        body = {'values': l_data}
-        result_l = service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range='新着物件!L1:L',
-            valueInputOption='RAW',
-            body=body
-        ).execute()
-        print(f"\n=== L列書き込み結果 ===")
-        print(f"Updated rows: {result_l.get('updatedRows')}")
-        print(f"Updated range: {result_l.get('updatedRange')}")
-    except Exception as e:
-        print(f"Error writing L column: {e}")
-        return
-    
-    # M～S列に書き込み
-    try:
-        body = {'values': m_data}
-        result_m = service.spreadsheets().values().update(
-            spreadsheetId=spreadsheet_id,
-            range='新着物件!M1:S',
-            valueInputOption='RAW',
-            body=body
-        ).execute()
-        print(f"\n=== M～S列書き込み結果 ===")
-        print(f"Updated rows: {result_m.get('updatedRows')}")
-        print(f"Updated range: {result_m.get('updatedRange')}")
-    except Exception as e:
-        print(f"Error writing M:S columns: {e}")
-        return
-    
-    print("\n=== Process completed! ===")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,127 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_FRESHNESS_PATH = '.cache/freshness.sqlite3'
+DEFAULT_BASE_INTERVAL_DAYS = 1
+DEFAULT_MAX_INTERVAL_DAYS = 14
+MAX_BACKOFF_EXPONENT = 32
+
+STATUS_ON_SALE = 'on_sale'
+STATUS_SOLD_OUT = 'sold_out'
+STATUS_NO_AD = 'no_ad'
+
+
+def classify_ad_info(ad_info):
+    """広告情報から掲載状態（掲載中 / 完売 / 広告なし）を判定する"""
+    pairs = [
+        (ad_info.get('p_dtlurl'), ad_info.get('p_sold_flag')),
+        (ad_info.get('l_url'), ad_info.get('l_sold_flag')),
+        (ad_info.get('y_dtlurl'), ad_info.get('y_sold_flag'))
+    ]
+    if any(url and flag == '0' for url, flag in pairs):
+        return STATUS_ON_SALE
+    if any(url for url, _ in pairs):
+        return STATUS_SOLD_OUT
+    return STATUS_NO_AD
+
+
+class FreshnessStore:
+    """Building ID ごとの最終取得時刻・状態・前回の広告情報を保存する
+
+    掲載中の物件は毎回取得し、完売・広告なしの物件は内容が変わらない回数に応じて
+    base_interval, 2*base_interval, 4*base_interval ...（max_interval まで）と取得間隔を伸ばす。
+    enabled=False のときは記録だけ行い、取得のスキップはしない。
+    """
+
+    def __init__(self, path=DEFAULT_FRESHNESS_PATH, enabled=False,
+                 base_interval_days=DEFAULT_BASE_INTERVAL_DAYS, max_interval_days=DEFAULT_MAX_INTERVAL_DAYS):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.enabled = enabled
+        self.base_interval = base_interval_days * 86400
+        self.max_interval = max_interval_days * 86400
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS freshness ('
+            ' building_id TEXT PRIMARY KEY,'
+            ' status TEXT NOT NULL,'
+            ' ad_info TEXT NOT NULL,'
+            ' unchanged_count INTEGER NOT NULL,'
+            ' last_fetched_at REAL NOT NULL,'
+            ' last_changed_at REAL NOT NULL,'
+            ' next_refresh_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.fetched = 0
+        self.reused = 0
+
+    def reusable_ad_info(self, building_id):
+        """まだ再取得の時期でなければ前回の広告情報を返す（再取得が必要なら None）"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT ad_info, next_refresh_at FROM freshness WHERE building_id = ?', (str(building_id),)
+            ).fetchone()
+            if row and row[1] > time.time():
+                self.reused += 1
+                return json.loads(row[0])
+            return None
+
+    def get_state(self, building_id):
+        """前回の取得記録（status, unchanged_count, last_fetched_at, last_changed_at, next_refresh_at）。なければ None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT status, unchanged_count, last_fetched_at, last_changed_at, next_refresh_at'
+                ' FROM freshness WHERE building_id = ?', (str(building_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('status', 'unchanged_count', 'last_fetched_at', 'last_changed_at', 'next_refresh_at'), row))
+
+    def record(self, building_id, ad_info):
+        """取得した広告情報を保存し、次回の再取得時刻を決める"""
+        now = time.time()
+        status = classify_ad_info(ad_info)
+        encoded = json.dumps(ad_info, ensure_ascii=False, sort_keys=True)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT ad_info, unchanged_count, last_changed_at FROM freshness WHERE building_id = ?',
+                (str(building_id),)
+            ).fetchone()
+            if row and row[0] == encoded:
+                unchanged_count, last_changed_at = row[1] + 1, row[2]
+            else:
+                unchanged_count, last_changed_at = 0, now
+            if status == STATUS_ON_SALE:
+                next_refresh_at = now
+            else:
+                # 何年も変わらない物件で 2 ** unchanged_count が float に収まらなくならないよう指数を抑える
+                interval = min(self.base_interval * 2 ** min(unchanged_count, MAX_BACKOFF_EXPONENT), self.max_interval)
+                # 日次実行の起動時刻の揺れで 1 回分取りこぼさないよう少し早めにする
+                next_refresh_at = now + interval * 0.9
+            self._conn.execute(
+                'INSERT OR REPLACE INTO freshness'
+                ' (building_id, status, ad_info, unchanged_count, last_fetched_at, last_changed_at, next_refresh_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (str(building_id), status, encoded, unchanged_count, now, last_changed_at, next_refresh_at)
+            )
+            self._conn.commit()
+            self.fetched += 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def print_stats(self):
+        print(f"\n=== 差分更新 ===")
+        print(f"差分更新モード: {'ON' if self.enabled else 'OFF'}")
+        print(f"取得した物件: {self.fetched} 件")
+        print(f"前回の値を引き継いだ物件: {self.reused} 件")
@@ -0,0 +1,293 @@
+"""物件ごとの広告情報（ad_info）の履歴を残すローカルの追記型ストア
+
+シートの M～S 列は毎日上書きされるので、P / L / Y 広告がいつ出ていつ完売になったかを
+後から追えるよう、実行ごとの広告情報をここに記録する。何年分たまっても小さく保てるよう
+次のように詰めて保存する。
+  - URL・entry_id は文字列の辞書（strings）に1回だけ入れ、履歴には番号だけを持つ
+  - 3 つの sold_flag は 1 つの整数に 2 ビットずつ詰める（'' / '0' / '1' 以外の値だけ別の列に残す）
+  - 日付は 2000/01/01 からの日数で持ち、状態が変わった日だけ 1 行追加する
+    （変わらない日は observed の最終観測日を進めるだけなので、行数は日数ではなく変化の回数に比例する）
+
+GitHub Actions の日次実行では、merge ジョブが全シャード分をまとめて1つの ad_history.sqlite3 に記録し、
+アーティファクト ad-history（または AD_HISTORY_REPO の非公開リポジトリ）に保存する。
+物件名・広告 URL を含むので、このリポジトリ自体には置かない。
+
+  HISTORY_BUILDING_ID=12345 HISTORY_DATE=2026/10/01 python scripts/history_store.py  その日の状態
+  HISTORY_BUILDING_ID=12345 python scripts/history_store.py                           その物件の全履歴
+  HISTORY_SINCE=2026/10/01 python scripts/history_store.py                            その日以降の変化
+  python scripts/history_store.py                                                     件数とファイルサイズ
+"""
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+DEFAULT_HISTORY_PATH = '.cache/ad_history.sqlite3'
+DATE_FORMAT = '%Y/%m/%d'
+EPOCH = date(2000, 1, 1)
+
+URL_FIELDS = ('entry_id', 'p_dtlurl', 'l_url', 'y_dtlurl')
+FLAG_FIELDS = ('p_sold_flag', 'l_sold_flag', 'y_sold_flag')
+FLAG_CODES = {'': 0, '0': 1, '1': 2}
+FLAG_OTHER = 3
+FLAG_VALUES = {code: value for value, code in FLAG_CODES.items()}
+
+
+def day_number(day):
+    """date / datetime / 'YYYY/MM/DD' を 2000/01/01 からの日数にする"""
+    if isinstance(day, str):
+        day = datetime.strptime(day, DATE_FORMAT).date()
+    elif isinstance(day, datetime):
+        day = day.date()
+    return (day - EPOCH).days
+
+
+def day_string(number):
+    return (EPOCH + timedelta(days=number)).strftime(DATE_FORMAT)
+
+
+def pack_flags(ad_info):
+    """3 つの sold_flag を 2 ビットずつ詰めた整数と、符号にない値（なければ None）を返す"""
+    packed = 0
+    others = []
+    for shift, field in enumerate(FLAG_FIELDS):
+        value = ad_info.get(field) or ''
+        code = FLAG_CODES.get(value, FLAG_OTHER)
+        if code == FLAG_OTHER:
+            others.append(value)
+        packed |= code << (shift * 2)
+    return packed, '\t'.join(others) if others else None
+
+
+def unpack_flags(packed, others):
+    pending = others.split('\t') if others else []
+    flags = {}
+    for shift, field in enumerate(FLAG_FIELDS):
+        code = (packed >> (shift * 2)) & 3
+        flags[field] = pending.pop(0) if code == FLAG_OTHER else FLAG_VALUES[code]
+    return flags
+
+
+class HistoryStore:
+    """Building ID ごとの広告情報の変化を日単位で保存し、ある日の状態・ある日以降の変化を引けるようにする"""
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS strings ('
+            ' string_id INTEGER PRIMARY KEY,'
+            ' value TEXT NOT NULL UNIQUE)'
+        )
+        # 1 行 = ある物件の状態が変わった日とその日からの状態（文字列は strings の番号、0 は空）
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS changes ('
+            ' building_id TEXT NOT NULL,'
+            ' day INTEGER NOT NULL,'
+            ' entry_id INTEGER NOT NULL,'
+            ' p_dtlurl INTEGER NOT NULL,'
+            ' l_url INTEGER NOT NULL,'
+            ' y_dtlurl INTEGER NOT NULL,'
+            ' flags INTEGER NOT NULL,'
+            ' other_flags TEXT,'
+            ' PRIMARY KEY (building_id, day)) WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS changes_day ON changes (day)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS observed ('
+            ' building_id TEXT PRIMARY KEY,'
+            ' first_day INTEGER NOT NULL,'
+            ' last_day INTEGER NOT NULL) WITHOUT ROWID'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._string_ids = {'': 0}
+        self._strings = {0: ''}
+        for string_id, value in self._conn.execute('SELECT string_id, value FROM strings'):
+            self._string_ids[value] = string_id
+            self._strings[string_id] = value
+        self.recorded = 0
+        # 今回の実行で最初に記録する前の状態と、それから状態が変わった Building ID
+        # （同じ日に記録し直して元の状態に戻ったものは外す）
+        self._initial_states = {}
+        self._changed_ids = set()
+
+    def _string_id(self, value):
+        value = value or ''
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._conn.execute('INSERT INTO strings (value) VALUES (?)', (value,)).lastrowid
+            self._string_ids[value] = string_id
+            self._strings[string_id] = value
+        return string_id
+
+    def _encode(self, ad_info):
+        flags, other_flags = pack_flags(ad_info)
+        return tuple(self._string_id(ad_info.get(field)) for field in URL_FIELDS) + (flags, other_flags)
+
+    def _decode(self, row):
+        ad_info = {field: self._strings[string_id] for field, string_id in zip(URL_FIELDS, row[:4])}
+        ad_info.update(unpack_flags(row[4], row[5]))
+        return ad_info
+
+    def _state_before(self, building_id, day):
+        return self._conn.execute(
+            'SELECT day, entry_id, p_dtlurl, l_url, y_dtlurl, flags, other_flags FROM changes'
+            ' WHERE building_id = ? AND day <= ? ORDER BY day DESC LIMIT 1', (building_id, day)
+        ).fetchone()
+
+    def _record(self, building_id, encoded, day):
+        building_id = str(building_id)
+        latest = self._state_before(building_id, day)
+        initial = self._initial_states.setdefault(building_id, latest[1:] if latest else None)
+        if latest is not None and latest[0] == day:
+            # 同じ日に2回以上記録したときは、その日の行を最新の状態で置き換える
+            previous = self._state_before(building_id, day - 1)
+            if previous is not None and previous[1:] == encoded:
+                self._conn.execute('DELETE FROM changes WHERE building_id = ? AND day = ?', (building_id, day))
+            elif latest[1:] != encoded:
+                self._conn.execute(
+                    'UPDATE changes SET entry_id = ?, p_dtlurl = ?, l_url = ?, y_dtlurl = ?, flags = ?, other_flags = ?'
+                    ' WHERE building_id = ? AND day = ?', encoded + (building_id, day)
+                )
+        elif latest is None or latest[1:] != encoded:
+            self._conn.execute(
+                'INSERT INTO changes (building_id, day, entry_id, p_dtlurl, l_url, y_dtlurl, flags, other_flags)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (building_id, day) + encoded
+            )
+        if encoded != initial:
+            self._changed_ids.add(building_id)
+        else:
+            self._changed_ids.discard(building_id)
+        self._conn.execute(
+            'INSERT INTO observed (building_id, first_day, last_day) VALUES (?, ?, ?)'
+            ' ON CONFLICT (building_id) DO UPDATE SET'
+            ' first_day = MIN(first_day, excluded.first_day), last_day = MAX(last_day, excluded.last_day)',
+            (building_id, day, day)
+        )
+        self.recorded += 1
+
+    @property
+    def changed(self):
+        """今回の実行で状態が変わった物件の数"""
+        return len(self._changed_ids)
+
+    def record_many(self, items, day=None):
+        """[(building_id, ad_info), ...] をその日（省略時は今日）の観測として1トランザクションで記録する
+
+        ad_info が None のもの（取得に失敗した物件）は記録しない。
+        """
+        day = day_number(day or date.today())
+        with self._lock:
+            for building_id, ad_info in items:
+                if building_id and ad_info is not None:
+                    self._record(building_id, self._encode(ad_info), day)
+            self._conn.commit()
+
+    def record(self, building_id, ad_info, day=None):
+        self.record_many([(building_id, ad_info)], day)
+
+    def status_on(self, building_id, day):
+        """その日時点の広告情報（最後に変化した日から引き継いだもの）。まだ記録がなければ None"""
+        with self._lock:
+            row = self._state_before(str(building_id), day_number(day))
+            return self._decode(row[1:]) if row else None
+
+    def history(self, building_id):
+        """[(日付, ad_info), ...] 状態が変わった日ごと"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT day, entry_id, p_dtlurl, l_url, y_dtlurl, flags, other_flags FROM changes'
+                ' WHERE building_id = ? ORDER BY day', (str(building_id),)
+            ).fetchall()
+            return [(day_string(row[0]), self._decode(row[1:])) for row in rows]
+
+    def changes_since(self, day):
+        """その日以降の変化 [(日付, building_id, 変化前の ad_info または None, 変化後の ad_info), ...]"""
+        since = day_number(day)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT building_id, day, entry_id, p_dtlurl, l_url, y_dtlurl, flags, other_flags FROM changes'
+                ' WHERE day >= ? ORDER BY day, building_id', (since,)
+            ).fetchall()
+            changes = []
+            for row in rows:
+                previous = self._state_before(row[0], row[1] - 1)
+                changes.append((
+                    day_string(row[1]), row[0],
+                    self._decode(previous[1:]) if previous else None, self._decode(row[2:])
+                ))
+            return changes
+
+    def observed_range(self, building_id):
+        """(最初に記録した日, 最後に記録した日)。記録がなければ None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT first_day, last_day FROM observed WHERE building_id = ?', (str(building_id),)
+            ).fetchone()
+            return (day_string(row[0]), day_string(row[1])) if row else None
+
+    def counts(self):
+        with self._lock:
+            return {
+                'buildings': self._conn.execute('SELECT COUNT(*) FROM observed').fetchone()[0],
+                'changes': self._conn.execute('SELECT COUNT(*) FROM changes').fetchone()[0],
+                'strings': len(self._strings) - 1
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def print_stats(self):
+        print(f"\n=== 広告情報の履歴 ===")
+        print(f"記録した物件: {self.recorded} 件 (状態が変わった物件 {self.changed} 件)")
+
+
+def describe(ad_info):
+    if ad_info is None:
+        return '(記録なし)'
+    parts = []
+    for label, url_field, flag_field in (('P', 'p_dtlurl', 'p_sold_flag'), ('L', 'l_url', 'l_sold_flag'),
+                                         ('Y', 'y_dtlurl', 'y_sold_flag')):
+        if ad_info[url_field]:
+            parts.append(f"{label}:{'完売' if ad_info[flag_field] == '1' else '掲載中'}")
+    return ' '.join(parts) or '広告なし'
+
+
+def main():
+    store = HistoryStore(os.environ.get('HISTORY_DB_PATH', DEFAULT_HISTORY_PATH))
+    building_id = os.environ.get('HISTORY_BUILDING_ID', '')
+    on_date = os.environ.get('HISTORY_DATE', '')
+    since = os.environ.get('HISTORY_SINCE', '')
+    if building_id and on_date:
+        ad_info = store.status_on(building_id, on_date)
+        print(f"{building_id} ({on_date}): {describe(ad_info)}")
+        if ad_info:
+            for field, value in ad_info.items():
+                print(f"  {field}: {value}")
+    elif building_id:
+        observed = store.observed_range(building_id)
+        if observed:
+            print(f"{building_id}: {observed[0]} ～ {observed[1]} に記録")
+        for day, ad_info in store.history(building_id):
+            print(f"  {day}: {describe(ad_info)}")
+    elif since:
+        changes = store.changes_since(since)
+        for day, changed_id, before, after in changes:
+            print(f"{day} {changed_id}: {describe(before)} → {describe(after)}")
+        print(f"\n{since} 以降の変化: {len(changes)} 件")
+    else:
+        counts = store.counts()
+        print(f"物件: {counts['buildings']} 件 / 変化: {counts['changes']} 行 / 文字列: {counts['strings']} 件")
+        print(f"ファイルサイズ: {os.path.getsize(store.path) / 1024:.1f} KB")
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""e-mansion の応答を記録・再生するためのアーカイブ
+
+アーカイブは gzip 圧縮した JSONL で、1行が1つのリクエストパス（クエリ込み）に対応する。
+  {"path": "/bbs/yre/building/123/ajaxJson/", "status": 200, "headers": {...}, "body": "..."}
+同じパスは後から記録したものが優先され、既存のアーカイブに追記する形で保存する。
+"""
+import base64
+import gzip
+import json
+import os
+import threading
+from urllib.parse import urlsplit
+
+# 再生に必要なヘッダーだけを残す
+ARCHIVE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Retry-After')
+
+
+def request_path(url):
+    """URL からホストを除いたパス（クエリ込み）を返す。アーカイブのキーに使う"""
+    parts = urlsplit(url)
+    return parts.path + ('?' + parts.query if parts.query else '')
+
+
+def entry_body(entry):
+    """アーカイブの1件から本文の bytes を取り出す"""
+    if 'body_b64' in entry:
+        return base64.b64decode(entry['body_b64'])
+    return entry.get('body', '').encode('utf-8')
+
+
+def load_archive(path):
+    """アーカイブを {path: entry} の dict として読み込む（ファイルがなければ空）"""
+    entries = {}
+    if not path or not os.path.exists(path):
+        return entries
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries[entry['path']] = entry
+    return entries
+
+
+def save_archive(path, entries):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        for key in sorted(entries):
+            f.write(json.dumps(entries[key], ensure_ascii=False, separators=(',', ':')) + '\n')
+    os.replace(tmp_path, path)
+
+
+class HttpRecorder:
+    """http_client.get の応答をアーカイブに記録する（HTTP_RECORD_PATH）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = load_archive(path)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def record(self, url, response):
+        # 304 は本文を持たないので記録しない（記録時は HTTP_CACHE_PATH を空にしておくとよい）
+        if response.status_code == 304:
+            return
+        entry = {
+            'path': request_path(url),
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in ARCHIVE_HEADERS if name in response.headers}
+        }
+        try:
+            entry['body'] = response.content.decode('utf-8')
+        except UnicodeDecodeError:
+            entry['body_b64'] = base64.b64encode(response.content).decode('ascii')
+        with self._lock:
+            self._entries[entry['path']] = entry
+            self.recorded += 1
+
+    def save(self):
+        with self._lock:
+            save_archive(self.path, self._entries)
+            print(f"  Recorded {self.recorded} responses to {self.path} ({len(self._entries)} entries)")
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_HTTP_CACHE_PATH = '.cache/http_cache.sqlite3'
+
+
+class HttpCache:
+    """URL ごとに検証子（ETag / Last-Modified）・本文のハッシュ・解析結果を保存するキャッシュ
+
+    - 304 Not Modified が返れば保存済みの解析結果を使う（revalidated）
+    - 200 でも本文のハッシュが前回と同じなら解析をスキップする（hit）
+    - それ以外は解析して保存する（miss）
+    parser_version が変わった場合は保存済みの解析結果を使わない。
+    """
+
+    def __init__(self, path=DEFAULT_HTTP_CACHE_PATH, parser_version=1):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.parser_version = parser_version
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' url TEXT PRIMARY KEY,'
+            ' etag TEXT,'
+            ' last_modified TEXT,'
+            ' body_hash TEXT NOT NULL,'
+            ' parser_version INTEGER NOT NULL,'
+            ' parsed TEXT NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    def _load(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT etag, last_modified, body_hash, parser_version, parsed FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+        if not row or row[3] != self.parser_version:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'body_hash': row[2], 'parsed': json.loads(row[4])}
+
+    def _store(self, url, response, body_hash, parsed):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses'
+                ' (url, etag, last_modified, body_hash, parser_version, parsed, updated_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    url,
+                    response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'),
+                    body_hash,
+                    self.parser_version,
+                    json.dumps(parsed, ensure_ascii=False),
+                    time.time()
+                )
+            )
+            self._conn.commit()
+
+    def fetch(self, get, url, parse, timeout=10):
+        """条件付き GET で url を取得し、parse(response) の結果を返す
+
+        get は http_client.get と同じシグネチャ (url, timeout, headers) の関数。
+        HTTP エラーは raise_for_status() で例外として呼び出し元に返す。
+        """
+        cached = self._load(url)
+        headers = {}
+        if cached and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached['last_modified']:
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        response = get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self.revalidated += 1
+            return cached['parsed']
+        response.raise_for_status()
+
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        if cached and cached['body_hash'] == body_hash:
+            with self._lock:
+                self.hits += 1
+            parsed = cached['parsed']
+        else:
+            with self._lock:
+                self.misses += 1
+            parsed = parse(response)
+        self._store(url, response, body_hash, parsed)
+        return parsed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def print_stats(self):
+        print(f"\n=== HTTPキャッシュ (ajaxJson) ===")
+        print(f"ヒット（本文変化なし）: {self.hits} 件")
+        print(f"再検証（304）: {self.revalidated} 件")
+        print(f"ミス（解析あり）: {self.misses} 件")
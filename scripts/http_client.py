@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from rate_limiter import get_rate_limiter, parse_retry_after
+from resilience import RETRYABLE_STATUS_CODES, CircuitOpenError, retry_policy_from_env, circuit_breaker_from_env
+from http_archive import HttpRecorder
+import startup_profile
+from metrics import get_metrics
+
+# EMANSION_BASE_URL でローカルの代替サーバー（emansion_stub_server.py）などに向けられる
+BASE_URL = os.environ.get('EMANSION_BASE_URL', 'https://www.e-mansion.co.jp').rstrip('/')
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    # urllib3 が展開できる圧縮形式（gzip, deflate と、brotli 等が入っていればそれも）を要求する
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive'
+}
+
+_session = None
+_session_lock = threading.Lock()
+_retry_policy = None
+_circuit_breaker = None
+_recorder = None
+
+
+def get_session():
+    """e-mansion へのリクエストで共有する keep-alive セッションを返す"""
+    global _session, _retry_policy, _circuit_breaker, _recorder
+    with _session_lock:
+        if _retry_policy is None:
+            _retry_policy = retry_policy_from_env()
+            _circuit_breaker = circuit_breaker_from_env()
+            record_path = os.environ.get('HTTP_RECORD_PATH')
+            if record_path:
+                _recorder = HttpRecorder(record_path)
+        if _session is None:
+            pool_size = int(os.environ.get('HTTP_POOL_SIZE', '10'))
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True)
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+def get(url, timeout=10, headers=None):
+    """共有セッションで GET する（接続はプールから再利用される）
+
+    送信前にサーキットブレーカーと共有レートリミッターを通し、応答の状態
+    （403 / 429 / 5xx / タイムアウト）をそれぞれにフィードバックする。
+    タイムアウト・接続エラー・429 / 5xx はジッター付きバックオフで再試行し、
+    最後の試行でも失敗した場合は例外またはそのレスポンスを返す。
+    サーキットが開いている間は CircuitOpenError を送出する。
+    HTTP_RECORD_PATH が指定されていれば、最終的な応答をアーカイブに記録する。
+    """
+    session = get_session()
+    startup_profile.mark_once('最初の e-mansion リクエスト')
+    response = _get_with_retries(session, url, timeout, headers)
+    if _recorder is not None:
+        _recorder.record(url, response)
+    return response
+
+
+def _get_with_retries(session, url, timeout, headers):
+    limiter = get_rate_limiter()
+    metrics = get_metrics()
+    for attempt in range(_retry_policy.max_attempts):
+        last_attempt = attempt + 1 >= _retry_policy.max_attempts
+        if attempt:
+            metrics.count('http.retries')
+        try:
+            _circuit_breaker.before_request()
+        except CircuitOpenError as e:
+            metrics.error('http', e)
+            raise
+        limiter.acquire()
+        try:
+            with metrics.timer('http.request'):
+                response = session.get(url, timeout=timeout, headers=headers)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            metrics.error('http', e)
+            limiter.on_throttle()
+            _circuit_breaker.record_failure()
+            if last_attempt:
+                raise
+            print(f"  Retrying after {type(e).__name__} ({attempt + 1}/{_retry_policy.max_attempts})")
+            time.sleep(_retry_policy.backoff(attempt))
+            continue
+        except Exception as e:
+            # ChunkedEncodingError など再試行しない例外も失敗として数える
+            # （half-open の試行中なら、ここで記録しないとサーキットが閉じも開きもしなくなる）
+            metrics.error('http', e)
+            _circuit_breaker.record_failure()
+            raise
+
+        metrics.count(f'http.status.{response.status_code}')
+        if not limiter.is_throttle_status(response.status_code):
+            limiter.on_success()
+            _circuit_breaker.record_success()
+            return response
+
+        metrics.error(f'http:HTTP {response.status_code}')
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        limiter.on_throttle(retry_after)
+        _circuit_breaker.record_failure()
+        if last_attempt or response.status_code not in RETRYABLE_STATUS_CODES:
+            return response
+        print(f"  Retrying after HTTP {response.status_code} ({attempt + 1}/{_retry_policy.max_attempts})")
+        time.sleep(_retry_policy.backoff(attempt, retry_after))
+
+
+def connection_stats():
+    """今回の実行で開いた接続数と再利用したリクエスト数を返す"""
+    opened = 0
+    total_requests = 0
+    if _session is not None:
+        # http:// と https:// に同じアダプタをマウントしているので重複を除く
+        adapters = {id(adapter): adapter for adapter in _session.adapters.values()}
+        for adapter in adapters.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                opened += pool.num_connections
+                total_requests += pool.num_requests
+    return {
+        'requests': total_requests,
+        'connections_opened': opened,
+        'connections_reused': max(0, total_requests - opened)
+    }
+
+
+def print_connection_stats():
+    stats = connection_stats()
+    print(f"\n=== HTTP接続統計 ===")
+    print(f"リクエスト数: {stats['requests']}")
+    print(f"新規接続数: {stats['connections_opened']}")
+    print(f"再利用接続数: {stats['connections_reused']}")
+    limiter = get_rate_limiter()
+    print(f"最終レート: {limiter.rate:.2f} req/sec (抑制 {limiter.throttles} 回, 待機 {limiter.waited_seconds:.1f} 秒)")
+    if _circuit_breaker is not None:
+        print(f"サーキットブレーカー: 遮断 {_circuit_breaker.opened_count} 回, 送信しなかったリクエスト {_circuit_breaker.rejected} 件")
+
+
+def close():
+    global _session, _recorder
+    with _session_lock:
+        if _recorder is not None:
+            _recorder.save()
+            _recorder = None
+        if _session is not None:
+            _session.close()
+            _session = None
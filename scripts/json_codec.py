@@ -0,0 +1,38 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # orjson は任意の依存。なければ標準の json を使う
+    orjson = None
+
+
+def _stdlib_loads(data):
+    # json.loads は bytes も受け付ける（UTF-8/16/32 を自動判定）
+    return json.loads(data)
+
+
+def _orjson_loads(data):
+    # 64bit を超える整数は orjson では float になる（e-mansion の応答には出てこないので区別しない。
+    # 事前に数字の並びを探すと、標準の json でデコードするより遅くなる）
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        # NaN など orjson が受け付けない入力は標準の json に任せる
+        return json.loads(data)
+
+
+def get_decoder(name=None):
+    """JSON_DECODER（orjson / stdlib）に応じたデコード関数を返す。未指定なら使えるほうを使う"""
+    name = name or os.environ.get('JSON_DECODER', '')
+    if name == 'stdlib' or orjson is None:
+        return _stdlib_loads
+    return _orjson_loads
+
+
+loads = get_decoder()
+
+
+def response_json(response):
+    """requests のレスポンスを str に変換せず、本文の bytes から直接デコードする"""
+    return loads(response.content)
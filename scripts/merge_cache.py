@@ -0,0 +1,107 @@
+"""シャードごとに更新した .cache を1つのキャッシュにまとめる（merge ジョブで使う）
+
+各シャードは共有のキャッシュを復元して担当の行だけを取得し、更新したストアを
+アーティファクトとして上げる。ここでそれらを CACHE_DIR（既定 .cache）に取り込むので、
+次回はどのシャードも同じインデックス・ネガティブキャッシュ・取得記録・HTTP キャッシュを引ける。
+  - SQLite のストアは主キーごとに MERGE_TABLES の列が新しい方を残す
+  - それ以外のファイル（シャードごとのジャーナル）はそのままコピーする
+
+  CACHE_MERGE_DIR=shard-cache python scripts/merge_cache.py
+  （shard-cache/<シャードごとのディレクトリ>/building_index.sqlite3 ... を .cache に取り込む）
+"""
+import os
+import shutil
+import sqlite3
+from building_index import DEFAULT_INDEX_PATH
+from freshness import DEFAULT_FRESHNESS_PATH
+from http_cache import DEFAULT_HTTP_CACHE_PATH
+
+DEFAULT_CACHE_DIR = os.path.dirname(DEFAULT_INDEX_PATH)
+
+# ファイル名 → [(テーブル, 新しさを比べる列), ...]
+MERGE_TABLES = {
+    os.path.basename(DEFAULT_INDEX_PATH): [('buildings', 'updated_at'), ('negative_results', 'next_check_at')],
+    os.path.basename(DEFAULT_FRESHNESS_PATH): [('freshness', 'last_fetched_at')],
+    os.path.basename(DEFAULT_HTTP_CACHE_PATH): [('responses', 'updated_at')],
+}
+SQLITE_SUFFIXES = ('.sqlite3', '.sqlite3-wal', '.sqlite3-shm')
+
+
+def merge_table(conn, table, newer_column):
+    """ATTACH した shard の table を main に取り込み、取り込んだ行数を返す"""
+    if not conn.execute("SELECT 1 FROM shard.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+        return 0
+    info = conn.execute(f'PRAGMA main.table_info({table})').fetchall()
+    columns = [row[1] for row in info]
+    keys = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+    names = ', '.join(columns)
+    assignments = ', '.join(f'{c} = excluded.{c}' for c in columns if c not in keys)
+    before = conn.total_changes
+    # WHERE true は INSERT ... SELECT と ON CONFLICT の構文のあいまいさを避けるため
+    conn.execute(
+        f'INSERT INTO main.{table} ({names}) SELECT {names} FROM shard.{table} WHERE true'
+        f' ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {assignments}'
+        f' WHERE excluded.{newer_column} > {table}.{newer_column}'
+    )
+    return conn.total_changes - before
+
+
+def merge_store(target_path, shard_path, tables):
+    if not os.path.exists(target_path):
+        shutil.copyfile(shard_path, target_path)
+        return {table: 'copied' for table, _ in tables}
+    conn = sqlite3.connect(target_path)
+    try:
+        conn.execute('ATTACH DATABASE ? AS shard', (shard_path,))
+        merged = {table: merge_table(conn, table, newer_column) for table, newer_column in tables}
+        conn.commit()
+        conn.execute('DETACH DATABASE shard')
+    finally:
+        conn.close()
+    return merged
+
+
+def drop_resolved_negatives(index_path):
+    """どれかのシャードで見つかった物件名は、ほかのシャードのネガティブキャッシュから外す"""
+    if not os.path.exists(index_path):
+        return
+    conn = sqlite3.connect(index_path)
+    try:
+        conn.execute('DELETE FROM negative_results WHERE name_key IN (SELECT name_key FROM buildings)')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def merge_cache_dirs(shard_dirs, cache_dir=DEFAULT_CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    for shard_dir in shard_dirs:
+        for name in sorted(os.listdir(shard_dir)):
+            source = os.path.join(shard_dir, name)
+            target = os.path.join(cache_dir, name)
+            if not os.path.isfile(source):
+                continue
+            if name in MERGE_TABLES:
+                merged = merge_store(target, source, MERGE_TABLES[name])
+                print(f"{shard_dir}/{name}: " + ', '.join(f"{table} {n}" for table, n in merged.items()))
+            elif not name.endswith(SQLITE_SUFFIXES):
+                shutil.copyfile(source, target)
+                print(f"{shard_dir}/{name}: copied")
+    drop_resolved_negatives(os.path.join(cache_dir, os.path.basename(DEFAULT_INDEX_PATH)))
+
+
+def main():
+    merge_dir = os.environ.get('CACHE_MERGE_DIR', 'shard-cache')
+    cache_dir = os.environ.get('CACHE_DIR', DEFAULT_CACHE_DIR)
+    if not os.path.isdir(merge_dir):
+        print(f"{merge_dir} がないので取り込むキャッシュはありません")
+        return
+    shard_dirs = sorted(
+        os.path.join(merge_dir, name) for name in os.listdir(merge_dir) if os.path.isdir(os.path.join(merge_dir, name))
+    )
+    merge_cache_dirs(shard_dirs, cache_dir)
+    print(f"Merged {len(shard_dirs)} shard caches into {cache_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""実行ごとの計測（フェーズ別の所要時間・レイテンシ分布・件数・エラー分類）と JSON レポート
+
+各モジュールは get_metrics() で共有のインスタンスを取り、
+  with metrics.timer('search'): ...   1回ごとのレイテンシを記録
+  metrics.count('http.status.200')     件数を数える
+  metrics.error('search', e)           エラーを「区分:例外名」で数える
+のように記録する。RUN_REPORT_PATH を指定すると write_report() が JSON を書き出す。
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+def percentile(sorted_values, p):
+    """ソート済みの値の p パーセンタイル（nearest-rank）"""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'total_ms': round(sum(values) * 1000, 3),
+        'mean_ms': round(sum(values) / len(values) * 1000, 3),
+        'p50_ms': round(percentile(values, 50) * 1000, 3),
+        'p95_ms': round(percentile(values, 95) * 1000, 3),
+        'p99_ms': round(percentile(values, 99) * 1000, 3),
+        'max_ms': round(values[-1] * 1000, 3)
+    }
+
+
+class RunMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+        self._started = time.perf_counter()
+        self._samples = {}
+        self._phases = {}
+        self._counters = {}
+        self._errors = {}
+        self._sections = {}
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, []).append(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """ブロック1回分の所要時間を name のレイテンシとして記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    @contextmanager
+    def phase(self, name):
+        """実行全体の中のフェーズ（シート読み込み・取得・書き込みなど）の経過時間を記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._phases[name] = self._phases.get(name, 0.0) + elapsed
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def error(self, category, exception=None):
+        key = f"{category}:{type(exception).__name__}" if exception is not None else category
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def section(self, name, values):
+        """キャッシュのヒット率などモジュールごとの集計をそのままレポートに載せる"""
+        with self._lock:
+            self._sections[name] = values
+
+    def report(self):
+        with self._lock:
+            return {
+                'started_at': datetime.fromtimestamp(self._started_at, timezone.utc).isoformat(),
+                'duration_seconds': round(time.perf_counter() - self._started, 3),
+                'phases_seconds': {name: round(value, 3) for name, value in self._phases.items()},
+                'latency': {name: summarize(samples) for name, samples in sorted(self._samples.items())},
+                'counters': dict(sorted(self._counters.items())),
+                'errors': dict(sorted(self._errors.items())),
+                **self._sections
+            }
+
+    def print_summary(self):
+        report = self.report()
+        print(f"\n=== 実行計測 ===")
+        print(f"所要時間: {report['duration_seconds']:.1f} 秒")
+        for name, seconds in report['phases_seconds'].items():
+            print(f"  {name}: {seconds:.1f} 秒")
+        for name, stats in report['latency'].items():
+            if stats['count']:
+                print(f"  {name}: {stats['count']} 回 p50 {stats['p50_ms']:.0f} ms / p95 {stats['p95_ms']:.0f} ms"
+                      f" / p99 {stats['p99_ms']:.0f} ms")
+        if report['errors']:
+            print(f"エラー: " + ', '.join(f"{k} {v} 件" for k, v in report['errors'].items()))
+
+    def write_report(self, path):
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        print(f"Run report written to {path}")
+
+
+def hit_ratio(hits, total):
+    return round(hits / total, 4) if total else None
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """プロセス内で共有する RunMetrics を返す"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = RunMetrics()
+        return _metrics
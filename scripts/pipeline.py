@@ -0,0 +1,58 @@
+import queue
+import threading
+
+_DONE = object()
+
+
+def run_pipeline(chunks, stages, sink, queue_size=2):
+    """chunks の各要素を stages の関数に順に通し、最後の結果を sink に渡す
+
+    最初の段は呼び出したスレッドで、2段目以降と sink はそれぞれ別スレッドで動き、
+    段の間を queue_size 件の有界キューでつなぐ（例: 検索 → 広告情報取得 → シートへの書き込み）。
+    後ろの段が遅ければ前の段が待つので、途中の結果を溜め込まない。
+    どこかの段で例外が起きたら先頭の段も止め、最初の例外を送出し直す。
+    """
+    queue_size = max(1, queue_size)
+    inboxes = [queue.Queue(maxsize=queue_size) for _ in stages[1:]] + [queue.Queue(maxsize=queue_size)]
+    errors = []
+
+    def worker(inbox, fn, outbox):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                if outbox is not None:
+                    outbox.put(_DONE)
+                return
+            if errors:
+                # 失敗後は取り出すだけにして前の段を詰まらせない
+                continue
+            try:
+                result = fn(item)
+            except BaseException as e:
+                errors.append(e)
+                continue
+            if outbox is not None:
+                outbox.put(result)
+
+    workers = []
+    for i, fn in enumerate(list(stages[1:]) + [sink]):
+        outbox = inboxes[i + 1] if i + 1 < len(inboxes) else None
+        thread = threading.Thread(target=worker, args=(inboxes[i], fn, outbox), name=f'pipeline-stage{i + 1}', daemon=True)
+        thread.start()
+        workers.append(thread)
+    try:
+        for chunk in chunks:
+            if errors:
+                break
+            try:
+                result = stages[0](chunk)
+            except BaseException as e:
+                errors.append(e)
+                break
+            inboxes[0].put(result)
+    finally:
+        inboxes[0].put(_DONE)
+        for thread in workers:
+            thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+# 混雑・ブロックのサインとみなすステータスコード
+THROTTLE_STATUS_CODES = {403, 429}
+
+
+class AdaptiveRateLimiter:
+    """AIMD で送信レートを調整するトークンバケット
+
+    正常応答が続く間は rate を少しずつ上げ（加算増加）、403 / 429 / 5xx / タイムアウトで
+    rate を半分に下げる（乗算減少）。Retry-After が返ってきた場合はその間すべての送信を止める。
+    """
+
+    def __init__(self, rate=1.0, min_rate=0.1, max_rate=4.0, increase=0.05, decrease=0.5, burst=1.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max(max_rate, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.successes = 0
+        self.throttles = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        """送信可能になるまで待つ"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.successes += 1
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            self.throttles += 1
+            now = time.monotonic()
+            # 並列リクエストがまとめて失敗した場合に何度も半減しないよう、1 送信間隔に 1 回だけ下げる
+            if now - self._last_decrease >= 1.0 / self.rate:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_decrease = now
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            self._tokens = min(self._tokens, 0)
+
+    def is_throttle_status(self, status_code):
+        return status_code in THROTTLE_STATUS_CODES or status_code >= 500
+
+
+def parse_retry_after(value):
+    """Retry-After ヘッダー（秒数のみ対応）を秒に変換する"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """e-mansion への全リクエストで共有するレートリミッターを返す
+
+    SHARD_COUNT 個のジョブが並行して同じホストに送るときは、合計が REQUESTS_PER_SECOND /
+    RATE_LIMIT_MAX_RPS 等を超えないよう、1ジョブあたりのレートをシャード数で割る。
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            shard_count = max(1, int(os.environ.get('SHARD_COUNT', '1')))
+            _limiter = AdaptiveRateLimiter(
+                rate=float(os.environ.get('REQUESTS_PER_SECOND', '1')) / shard_count,
+                min_rate=float(os.environ.get('RATE_LIMIT_MIN_RPS', '0.1')) / shard_count,
+                max_rate=float(os.environ.get('RATE_LIMIT_MAX_RPS', '4')) / shard_count
+            )
+        return _limiter
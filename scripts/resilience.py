@@ -0,0 +1,98 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# 一時的な障害とみなして再試行するステータスコード（403 はブロックの可能性が高いので再試行しない）
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """サーキットブレーカーが開いているためリクエストを送らなかった"""
+
+
+class RetryPolicy:
+    """試行回数の上限と、ジッター付き指数バックオフ（full jitter）"""
+
+    def __init__(self, max_attempts=3, backoff_base=1.0, backoff_max=30.0):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt, retry_after=None):
+        """attempt 回目（0 始まり）の失敗後に待つ秒数"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+
+class CircuitBreaker:
+    """直近の失敗率がしきい値を超えたらホストへのリクエストを一定時間止める
+
+    closed → （直近 window 件中の失敗率 >= threshold）→ open →（cooldown 秒後）→ half-open。
+    half-open では1件だけ試し、成功すれば closed、失敗すれば再び open に戻る。
+    """
+
+    def __init__(self, window=20, min_requests=10, threshold=0.5, cooldown=60.0):
+        self.window = window
+        self.min_requests = min_requests
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.opened_count = 0
+        self.rejected = 0
+
+    def before_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at >= self.cooldown and not self._trial_in_flight:
+                # half-open: 1件だけ試す
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError('circuit open for www.e-mansion.co.jp')
+
+    def record_success(self):
+        with self._lock:
+            if self._trial_in_flight:
+                self._opened_at = None
+                self._trial_in_flight = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        with self._lock:
+            if self._trial_in_flight:
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (self._opened_at is None and len(self._outcomes) >= self.min_requests
+                    and failures / len(self._outcomes) >= self.threshold):
+                self._opened_at = time.monotonic()
+                self.opened_count += 1
+                print(f"  Circuit opened: {failures}/{len(self._outcomes)} recent requests failed")
+
+
+def retry_policy_from_env():
+    return RetryPolicy(
+        max_attempts=int(os.environ.get('HTTP_MAX_ATTEMPTS', '3')),
+        backoff_base=float(os.environ.get('HTTP_BACKOFF_BASE', '1')),
+        backoff_max=float(os.environ.get('HTTP_BACKOFF_MAX', '30'))
+    )
+
+
+def circuit_breaker_from_env():
+    return CircuitBreaker(
+        window=int(os.environ.get('CIRCUIT_WINDOW', '20')),
+        min_requests=int(os.environ.get('CIRCUIT_MIN_REQUESTS', '10')),
+        threshold=float(os.environ.get('CIRCUIT_FAILURE_RATE', '0.5')),
+        cooldown=float(os.environ.get('CIRCUIT_COOLDOWN_SECONDS', '60'))
+    )
@@ -0,0 +1,141 @@
+"""取得の優先度付けとスケジューリング（常駐モード・時間予算モードで共有）
+
+優先度（小さいほど先）:
+  PRIORITY_NEW_ROW    シートに Building ID がまだない新しい行
+  PRIORITY_ON_SALE    掲載中の物件（sold_flag が変わりやすい）
+  PRIORITY_UNKNOWN    状態が分からない物件（未取得・シートに広告情報がない）
+  PRIORITY_SOLD_OUT   完売・広告なしで落ち着いている物件
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from freshness import classify_ad_info, STATUS_ON_SALE, STATUS_SOLD_OUT
+
+PRIORITY_NEW_ROW = 0
+PRIORITY_ON_SALE = 1
+PRIORITY_UNKNOWN = 2
+PRIORITY_SOLD_OUT = 3
+
+PRIORITY_LABELS = {
+    PRIORITY_NEW_ROW: '新規行',
+    PRIORITY_ON_SALE: '掲載中',
+    PRIORITY_UNKNOWN: '状態不明',
+    PRIORITY_SOLD_OUT: '完売・広告なし'
+}
+
+
+def row_priority(sheet_building_id, sheet_status, freshness_state):
+    """1行（1物件）の優先度を返す
+
+    sheet_status はシートの M～S 列から作った広告情報（classify_ad_info に渡せる dict、なければ None）、
+    freshness_state は FreshnessStore.get_state() の結果（未取得なら None）。
+    ローカルの取得記録があればそれを、なければシートの値を使って判定する。
+    """
+    if not sheet_building_id:
+        return PRIORITY_NEW_ROW
+    if freshness_state is not None:
+        status = freshness_state['status']
+    elif sheet_status:
+        status = classify_ad_info(sheet_status)
+        if status not in (STATUS_ON_SALE, STATUS_SOLD_OUT):
+            return PRIORITY_UNKNOWN
+    else:
+        return PRIORITY_UNKNOWN
+    return PRIORITY_ON_SALE if status == STATUS_ON_SALE else PRIORITY_SOLD_OUT
+
+
+class RefreshScheduler:
+    """次回の取得時刻（due_at）と優先度で並ぶキュー
+
+    schedule() で同じキーを登録し直すと前の予定は無効になる。pop_due() は due_at を過ぎたものの
+    うち、優先度が高く、前回の取得が古いものから返す。
+    期限前の予定は due_at 順のヒープに、期限を過ぎたものは (優先度, 前回の取得時刻) 順の
+    ready ヒープに移して持つので、どちらの操作も O(log n) で済む。
+    """
+
+    def __init__(self):
+        self._waiting = []
+        self._ready = []
+        self._entries = {}
+        self._seq = itertools.count()
+
+    def schedule(self, key, due_at, priority, last_fetched_at=0.0):
+        entry = (due_at, priority, last_fetched_at, next(self._seq), key)
+        self._entries[key] = entry
+        heapq.heappush(self._waiting, entry)
+
+    def discard(self, key):
+        self._entries.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def count_by_priority(self):
+        """{優先度: 登録中の件数}"""
+        counts = {}
+        for entry in self._entries.values():
+            counts[entry[1]] = counts.get(entry[1], 0) + 1
+        return counts
+
+    def _is_current(self, entry):
+        return self._entries.get(entry[4]) is entry
+
+    def _promote(self, now):
+        """期限を過ぎた予定を ready ヒープに移し、両方のヒープの先頭から無効な予定を捨てる"""
+        while self._waiting and (self._waiting[0][0] <= now or not self._is_current(self._waiting[0])):
+            entry = heapq.heappop(self._waiting)
+            if self._is_current(entry):
+                heapq.heappush(self._ready, (entry[1], entry[2], entry[3], entry))
+        while self._ready and not self._is_current(self._ready[0][3]):
+            heapq.heappop(self._ready)
+
+    def next_due(self, now=None):
+        """次に期限が来る時刻（空なら None。期限を過ぎたものがあればその due_at）"""
+        self._promote(time.time() if now is None else now)
+        if self._ready:
+            return self._ready[0][3][0]
+        return self._waiting[0][0] if self._waiting else None
+
+    def pop_due(self, now=None):
+        """期限を過ぎたキーのうち先頭のものを取り出す（なければ None）
+
+        期限を過ぎたものが複数あれば、優先度 → 前回の取得時刻の順に選ぶ。
+        """
+        self._promote(time.time() if now is None else now)
+        if not self._ready:
+            return None
+        entry = heapq.heappop(self._ready)[3]
+        del self._entries[entry[4]]
+        return entry[4]
+
+
+class RequestBudget:
+    """直近1時間のリクエスト数を requests_per_hour 以内に抑える"""
+
+    def __init__(self, requests_per_hour):
+        self.requests_per_hour = requests_per_hour
+        self._sent = deque()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def wait_seconds(self, now=None):
+        """今すぐ1件送れるなら 0、そうでなければ送れるようになるまでの秒数"""
+        if not self.requests_per_hour:
+            return 0.0
+        now = time.time() if now is None else now
+        with self._lock:
+            while self._sent and now - self._sent[0] >= 3600:
+                self._sent.popleft()
+            if len(self._sent) < self.requests_per_hour:
+                return 0.0
+            return self._sent[0] + 3600 - now
+
+    def spend(self, n=1, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._sent.extend([now] * n)
@@ -0,0 +1,108 @@
+"""複数ジョブで行を分担するためのシャーディング
+
+SHARD_COUNT 個のジョブがそれぞれ SHARD_INDEX 番目の行だけを処理し、結果をシャードファイル
+（JSONL）に書き出す。最後にマージ用のジョブが全シャードの結果を集めてシートに書き込む。
+
+分け方（SHARD_BY）:
+  building  シート上の Building ID（なければ正規化した物件名）のハッシュで分ける（既定）。
+            同じ物件は常に同じシャードに入るので、重複排除とシャードごとのキャッシュが効く。
+  row       行番号の連続した範囲で分ける。
+どちらもシートの内容だけから決まるので、全シャードで同じ分け方になる。
+"""
+import json
+import os
+import zlib
+from building_index import normalize_name
+
+SHARD_BY_BUILDING = 'building'
+SHARD_BY_ROW = 'row'
+DEFAULT_SHARD_DIR = 'shard-results'
+
+
+def shard_of(key, shard_count):
+    """文字列のキーを 0 〜 shard_count - 1 に割り当てる（実行ごとに変わらない crc32 を使う）"""
+    return zlib.crc32(key.encode('utf-8')) % shard_count
+
+
+def select_rows(property_names, sheet_ids, shard_index, shard_count, shard_by=SHARD_BY_BUILDING):
+    """このシャードが処理する行番号（0 始まり）のリストを返す
+
+    sheet_ids はシートから読んだ {物件名: Building ID}。ローカルのインデックスは
+    シャードごとに内容が違うので、分け方には使わない。
+    """
+    total = len(property_names)
+    if shard_by == SHARD_BY_ROW:
+        return list(range(shard_index * total // shard_count, (shard_index + 1) * total // shard_count))
+    if shard_by != SHARD_BY_BUILDING:
+        raise ValueError(f"Unknown SHARD_BY: {shard_by}")
+    rows = []
+    for i, property_name in enumerate(property_names):
+        building_id = sheet_ids.get(property_name)
+        key = f"id:{building_id}" if building_id else f"name:{normalize_name(property_name)}"
+        if shard_of(key, shard_count) == shard_index:
+            rows.append(i)
+    return rows
+
+
+def shard_path(directory, shard_index, shard_count):
+    return os.path.join(directory, f"shard-{shard_index:03d}-of-{shard_count:03d}.jsonl")
+
+
+def write_shard_results(path, shard_index, shard_count, total_rows, results):
+    """results は [(行番号, 物件名, building_id, ad_info), ...]"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'shard_index': shard_index, 'shard_count': shard_count, 'total_rows': total_rows}) + '\n')
+        for row, property_name, building_id, ad_info in results:
+            f.write(json.dumps(
+                {'row': row, 'name': property_name, 'building_id': building_id, 'ad_info': ad_info},
+                ensure_ascii=False
+            ) + '\n')
+    os.replace(tmp_path, path)
+
+
+def load_shard_results(directory):
+    """ディレクトリ内のシャードファイルを読み、({行番号: (物件名, building_id, ad_info)}, 読んだシャード番号, shard_count) を返す"""
+    results = {}
+    shard_indexes = set()
+    shard_count = None
+    if not os.path.isdir(directory):
+        return results, shard_indexes, shard_count
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith('shard-') and name.endswith('.jsonl')):
+            continue
+        with open(os.path.join(directory, name), encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if shard_count is not None and header['shard_count'] != shard_count:
+                print(f"  Skipping {name}: shard_count {header['shard_count']} != {shard_count}")
+                continue
+            shard_count = header['shard_count']
+            shard_indexes.add(header['shard_index'])
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    results.setdefault(entry['row'], (entry['name'], entry['building_id'], entry['ad_info']))
+    return results, shard_indexes, shard_count
+
+
+def merged_lookups(property_names, results):
+    """シャードの結果を行順の lookups にする
+
+    結果がない行や、シャード実行後に行がずれて物件名が一致しない行は None
+    （シートの現在の値をそのまま残す）にする。戻り値は (lookups, 一致しなかった行数)。
+    """
+    lookups = []
+    mismatched = 0
+    for i, property_name in enumerate(property_names):
+        result = results.get(i)
+        if result is None:
+            lookups.append(None)
+        elif result[0] != property_name:
+            mismatched += 1
+            lookups.append(None)
+        else:
+            lookups.append((result[1], result[2]))
+    return lookups, mismatched
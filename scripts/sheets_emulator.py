@@ -0,0 +1,338 @@
+"""Google Sheets API（values の get / update / batchGet / batchUpdate）のローカルエミュレーター
+
+SHEETS_BACKEND=emulator のとき emansion.sheets.get_sheets_service() がこれを返す。
+service.spreadsheets().values().get(...).execute() の形で呼べ、応答の形も本物に合わせている
+（読み込みでは末尾の空行・各行末尾の空セルを削り、セルの値は文字列で返す）。
+
+環境変数:
+  SHEETS_EMULATOR_PATH           グリッドを保存する JSON ファイル（なければメモリ上のみ。書き込みはプロセス終了時に保存する）
+  SHEETS_EMULATOR_LATENCY_MS     1リクエストあたりの遅延（ミリ秒）
+  SHEETS_EMULATOR_MS_PER_1K_CELLS  読み書きするセル1000個あたりの追加遅延（ミリ秒）
+  SHEETS_EMULATOR_QUOTA_PER_MINUTE 1分あたりの読み込み・書き込みそれぞれのリクエスト上限（0 は無制限）
+  SHEETS_EMULATOR_ERROR_RATE     ランダムにクォータエラー（429）を返す割合（0〜1）
+
+直接実行すると、EMULATOR_SEED_ROWS 行の物件名を B 列に入れたシートを作る（ベンチマーク用）。
+行数を指定しなければ、保存済みシートの列ごとの最終行を表示して C / L / M～S 列の揃いを確認する。
+"""
+import atexit
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from write_planner import column_index, column_letter
+
+_CELL_RE = re.compile(r'^([A-Z]*)(\d*)$')
+
+
+class SheetsEmulatorError(Exception):
+    """エミュレーターが返す API エラー（status は HTTP ステータスに相当）"""
+
+    def __init__(self, status, message):
+        super().__init__(f"<HttpError {status}: {message}>")
+        self.status = status
+
+
+class QuotaExceededError(SheetsEmulatorError):
+    def __init__(self, message='Quota exceeded'):
+        super().__init__(429, f"RESOURCE_EXHAUSTED: {message}")
+
+
+def parse_range(a1):
+    """'シート!C1:C' のような A1 表記を (シート名, 開始行, 開始列, 終了行, 終了列) に分解する
+
+    行・列はすべて 0 始まり。上限のない方向は None。
+    """
+    if '!' not in a1:
+        raise SheetsEmulatorError(400, f"Unable to parse range: {a1}")
+    sheet, cells = a1.rsplit('!', 1)
+    sheet = sheet.strip("'")
+    start, _, end = cells.partition(':')
+    start_match = _CELL_RE.match(start)
+    end_match = _CELL_RE.match(end) if end else start_match
+    if not start_match or not end_match or not start_match.group(1):
+        raise SheetsEmulatorError(400, f"Unable to parse range: {a1}")
+    start_col = column_index(start_match.group(1))
+    start_row = int(start_match.group(2)) - 1 if start_match.group(2) else 0
+    end_col = column_index(end_match.group(1)) if end_match.group(1) else None
+    if end:
+        end_row = int(end_match.group(2)) - 1 if end_match.group(2) else None
+    else:
+        # 単一セル指定
+        end_row = start_row
+    return sheet, start_row, start_col, end_row, end_col
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    return str(value)
+
+
+class EmulatedSpreadsheet:
+    """シート名 → 行のリスト（各行はセル値のリスト）のグリッドと、遅延・クォータの注入"""
+
+    def __init__(self, path=None, latency_ms=0.0, ms_per_1k_cells=0.0, quota_per_minute=0, error_rate=0.0,
+                 seed=None):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.ms_per_1k_cells = ms_per_1k_cells
+        self.quota_per_minute = quota_per_minute
+        self.error_rate = error_rate
+        self.sheets = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+        self._recent = {'read': deque(), 'write': deque()}
+        self._save_registered = False
+        self.stats = {'read_requests': 0, 'write_requests': 0, 'cells_read': 0, 'cells_written': 0,
+                      'quota_errors': 0}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.sheets = json.load(f)
+
+    def _schedule_save(self):
+        """書き込みのたびにグリッド全体を保存すると書き込みの遅延がシートの大きさに比例してしまうので、
+        保存はプロセスの終了時（または save() を呼んだとき）にまとめて行う"""
+        if self.path and not self._save_registered:
+            self._save_registered = True
+            atexit.register(self.save)
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with self._lock, open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.sheets, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _admit(self, kind):
+        """クォータとランダムエラーの判定（超えていれば QuotaExceededError）"""
+        with self._lock:
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self.stats['quota_errors'] += 1
+                raise QuotaExceededError(f"injected {kind} error")
+            if self.quota_per_minute:
+                now = time.monotonic()
+                recent = self._recent[kind]
+                while recent and now - recent[0] >= 60:
+                    recent.popleft()
+                if len(recent) >= self.quota_per_minute:
+                    self.stats['quota_errors'] += 1
+                    raise QuotaExceededError(f"{kind} requests per minute per user")
+                recent.append(now)
+
+    def _delay(self, cells):
+        delay_ms = self.latency_ms + self.ms_per_1k_cells * cells / 1000
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def read(self, a1):
+        sheet, start_row, start_col, end_row, end_col = parse_range(a1)
+        with self._lock:
+            rows = self.sheets.get(sheet)
+            if rows is None:
+                raise SheetsEmulatorError(400, f"Unable to parse range: {a1}")
+            last_row = len(rows) - 1 if end_row is None else min(end_row, len(rows) - 1)
+            values = []
+            for row in rows[start_row:last_row + 1]:
+                stop = len(row) if end_col is None else min(end_col + 1, len(row))
+                cells = [_format_value(v) for v in row[start_col:stop]]
+                while cells and cells[-1] == '':
+                    cells.pop()
+                values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        response = {'range': a1, 'majorDimension': 'ROWS'}
+        if values:
+            response['values'] = values
+        return response, sum(len(row) for row in values)
+
+    def _check_write(self, a1, values):
+        """書き込みの範囲を検証し、(シート名, 開始行, 開始列, 値, 幅) を返す（不正なら SheetsEmulatorError）"""
+        sheet, start_row, start_col, end_row, end_col = parse_range(a1)
+        values = values or []
+        width = max((len(row) for row in values), default=0)
+        if end_row is not None and a1.count(':') and start_row + len(values) - 1 > end_row:
+            raise SheetsEmulatorError(400, f"Requested writing within range [{a1}], but tried writing to row [{start_row + len(values)}]")
+        if end_col is not None and a1.count(':') and start_col + width - 1 > end_col:
+            raise SheetsEmulatorError(400, f"Requested writing within range [{a1}], but tried writing to column [{column_letter(start_col + width - 1)}]")
+        return sheet, start_row, start_col, values, width
+
+    def _apply_write(self, sheet, start_row, start_col, values, width):
+        """検証済みの書き込みをグリッドに反映する（self._lock を持った状態で呼ぶ）"""
+        cells = 0
+        rows = self.sheets.setdefault(sheet, [])
+        for i, new_row in enumerate(values):
+            r = start_row + i
+            while len(rows) <= r:
+                rows.append([])
+            row = rows[r]
+            for j, value in enumerate(new_row):
+                if value is None:
+                    # null は「このセルは変更しない」
+                    continue
+                c = start_col + j
+                if len(row) <= c:
+                    row.extend([''] * (c + 1 - len(row)))
+                row[c] = value
+                cells += 1
+        updated_range = f"{sheet}!{column_letter(start_col)}{start_row + 1}"
+        if values and width:
+            updated_range += f":{column_letter(start_col + width - 1)}{start_row + len(values)}"
+        return {'updatedRange': updated_range, 'updatedRows': len(values), 'updatedColumns': width,
+                'updatedCells': cells}, cells
+
+    def execute_read(self, ranges):
+        self._admit('read')
+        responses = []
+        total_cells = 0
+        for a1 in ranges:
+            response, cells = self.read(a1)
+            responses.append(response)
+            total_cells += cells
+        with self._lock:
+            self.stats['read_requests'] += 1
+            self.stats['cells_read'] += total_cells
+        self._delay(total_cells)
+        return responses
+
+    def execute_write(self, data):
+        self._admit('write')
+        # 本物の batchUpdate と同じく、どれか1つでも範囲が不正なら何も書き込まない
+        checked = [self._check_write(a1, values) for a1, values in data]
+        responses = []
+        total_cells = 0
+        with self._lock:
+            for write in checked:
+                response, cells = self._apply_write(*write)
+                responses.append(response)
+                total_cells += cells
+            self.stats['write_requests'] += 1
+            self.stats['cells_written'] += total_cells
+            self._schedule_save()
+        self._delay(total_cells)
+        return responses
+
+
+class _Request:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self, num_retries=0):
+        return self._fn()
+
+
+class _Values:
+    def __init__(self, spreadsheet):
+        self._spreadsheet = spreadsheet
+
+    def get(self, spreadsheetId, range, **kwargs):
+        def run():
+            response, = self._spreadsheet.execute_read([range])
+            return response
+        return _Request(run)
+
+    def batchGet(self, spreadsheetId, ranges, **kwargs):
+        def run():
+            return {'spreadsheetId': spreadsheetId, 'valueRanges': self._spreadsheet.execute_read(list(ranges))}
+        return _Request(run)
+
+    def update(self, spreadsheetId, range, valueInputOption, body, **kwargs):
+        def run():
+            response, = self._spreadsheet.execute_write([(range, body.get('values'))])
+            return dict(response, spreadsheetId=spreadsheetId)
+        return _Request(run)
+
+    def batchUpdate(self, spreadsheetId, body):
+        def run():
+            data = [(d['range'], d.get('values')) for d in body.get('data', [])]
+            responses = [dict(r, spreadsheetId=spreadsheetId) for r in self._spreadsheet.execute_write(data)]
+            return {
+                'spreadsheetId': spreadsheetId,
+                'totalUpdatedRows': sum(r['updatedRows'] for r in responses),
+                'totalUpdatedColumns': max((r['updatedColumns'] for r in responses), default=0),
+                'totalUpdatedCells': sum(r['updatedCells'] for r in responses),
+                'totalUpdatedSheets': len({r['updatedRange'].rsplit('!', 1)[0] for r in responses}),
+                'responses': responses
+            }
+        return _Request(run)
+
+
+class _Spreadsheets:
+    def __init__(self, spreadsheet):
+        self._values = _Values(spreadsheet)
+
+    def values(self):
+        return self._values
+
+
+class EmulatedSheetsService:
+    """build('sheets', 'v4', ...) の代わりに使うサービスオブジェクト"""
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        self._spreadsheets = _Spreadsheets(spreadsheet)
+
+    def spreadsheets(self):
+        return self._spreadsheets
+
+
+def service_from_env():
+    seed = os.environ.get('SHEETS_EMULATOR_SEED')
+    return EmulatedSheetsService(EmulatedSpreadsheet(
+        path=os.environ.get('SHEETS_EMULATOR_PATH') or None,
+        latency_ms=float(os.environ.get('SHEETS_EMULATOR_LATENCY_MS', '0')),
+        ms_per_1k_cells=float(os.environ.get('SHEETS_EMULATOR_MS_PER_1K_CELLS', '0')),
+        quota_per_minute=int(os.environ.get('SHEETS_EMULATOR_QUOTA_PER_MINUTE', '0')),
+        error_rate=float(os.environ.get('SHEETS_EMULATOR_ERROR_RATE', '0')),
+        seed=int(seed) if seed else None
+    ))
+
+
+def seed_sheet(spreadsheet, rows, sheet='新着物件'):
+    """ヘッダー行と rows 行の物件名（B列）だけのシートを作る"""
+    grid = [['', '物件名', 'スレURL']]
+    grid += [['', f'ベンチマーク物件{i}'] for i in range(1, rows + 1)]
+    spreadsheet.sheets[sheet] = grid
+    spreadsheet.save()
+
+
+def column_extents(spreadsheet, sheet='新着物件'):
+    """列ごとに値が入っている最終行（1始まり、空なら 0）を返す"""
+    extents = {}
+    for r, row in enumerate(spreadsheet.sheets.get(sheet, []), start=1):
+        for c, value in enumerate(row):
+            if value != '' and value is not None:
+                extents[column_letter(c)] = r
+    return extents
+
+
+def main():
+    spreadsheet = service_from_env().spreadsheet
+    rows = int(os.environ.get('EMULATOR_SEED_ROWS', '0'))
+    if rows:
+        if not spreadsheet.path:
+            raise ValueError("SHEETS_EMULATOR_PATH is not set")
+        seed_sheet(spreadsheet, rows)
+        print(f"Seeded {rows} rows into {spreadsheet.path}")
+        return
+    extents = column_extents(spreadsheet)
+    print(f"=== 列ごとの最終行 ===")
+    for column in sorted(extents, key=column_index):
+        print(f"{column}: {extents[column]}")
+    last_b = extents.get('B', 0)
+    # C / L 列はヘッダー行から、M～S 列は B 列の最終行までしか書かれないはず
+    misaligned = [c for c in ['C', 'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S'] if extents.get(c, 0) > last_b]
+    if misaligned:
+        print(f"B列（{last_b}行）より下まで値がある列: {', '.join(misaligned)}")
+    else:
+        print(f"C / L / M～S 列は B 列の {last_b} 行以内に収まっています")
+
+
+if __name__ == '__main__':
+    main()
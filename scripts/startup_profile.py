@@ -0,0 +1,59 @@
+"""起動時間の計測（プロセス開始から最初の HTTP リクエストまで）
+
+mark() で区切りごとの経過時間を記録しておき、PROFILE_STARTUP=1（またはコマンドライン引数
+--profile-startup）のときだけ print_report() が一覧を表示する。
+"""
+import os
+import sys
+import threading
+import time
+
+_module_loaded_at = time.time()
+_marks = []
+_seen = set()
+_lock = threading.Lock()
+
+
+def _process_start_time():
+    """プロセスの開始時刻（UNIX 時刻）。/proc が読めなければこのモジュールの読み込み時刻"""
+    try:
+        with open('/proc/self/stat') as f:
+            # comm にスペースが入ることがあるので ')' 以降を分割する
+            fields = f.read().rsplit(')', 1)[1].split()
+        start_ticks = int(fields[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return _module_loaded_at
+
+
+_process_started_at = _process_start_time()
+
+
+def enabled():
+    return os.environ.get('PROFILE_STARTUP') == '1' or '--profile-startup' in sys.argv
+
+
+def mark(label):
+    """プロセス開始からの経過時間を label で記録する"""
+    _marks.append((label, time.time() - _process_started_at))
+
+
+def mark_once(label):
+    """最初の1回だけ記録する（「最初の HTTP リクエスト」など）"""
+    with _lock:
+        if label in _seen:
+            return
+        _seen.add(label)
+    mark(label)
+
+
+def print_report():
+    if not enabled():
+        return
+    print(f"\n=== 起動プロファイル（プロセス開始からの経過） ===")
+    previous = 0.0
+    for label, elapsed in _marks:
+        print(f"{elapsed * 1000:8.1f} ms  (+{(elapsed - previous) * 1000:7.1f} ms)  {label}")
+        previous = elapsed
@@ -0,0 +1,56 @@
+def column_index(letters):
+    """'A' → 0, 'Z' → 25, 'AA' → 26"""
+    index = 0
+    for c in letters:
+        index = index * 26 + (ord(c.upper()) - ord('A') + 1)
+    return index - 1
+
+
+def column_letter(index):
+    """0 → 'A', 25 → 'Z', 26 → 'AA'"""
+    letters = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+
+def _pad(row, width):
+    row = list(row or [])[:width]
+    return row + [''] * (width - len(row))
+
+
+def plan_writes(sheet_name, start_column, start_row, new_rows, old_rows, width):
+    """新しい値と既存の値を比べ、変更のあったセルだけを覆う最小限の範囲を返す
+
+    連続して変更のある行をひとまとまりにし、その中で変更のあった列の範囲だけを書き込む。
+    戻り値は ([(range, values), ...], 書き込むセル数, 変更なしのセル数)。
+    """
+    first_column = column_index(start_column)
+    changed_rows = []
+    for i, new_row in enumerate(new_rows):
+        new_row = _pad(new_row, width)
+        old_row = _pad(old_rows[i] if i < len(old_rows) else [], width)
+        changed = [j for j in range(width) if new_row[j] != old_row[j]]
+        if changed:
+            changed_rows.append((i, new_row, min(changed), max(changed)))
+
+    writes = []
+    written_cells = 0
+    run = []
+    for item in changed_rows + [None]:
+        if run and (item is None or item[0] != run[-1][0] + 1):
+            c0 = min(r[2] for r in run)
+            c1 = max(r[3] for r in run)
+            r0 = start_row + run[0][0]
+            r1 = start_row + run[-1][0]
+            a1 = f"{sheet_name}!{column_letter(first_column + c0)}{r0}:{column_letter(first_column + c1)}{r1}"
+            writes.append((a1, [r[1][c0:c1 + 1] for r in run]))
+            written_cells += (r1 - r0 + 1) * (c1 - c0 + 1)
+            run = []
+        if item is not None:
+            run.append(item)
+
+    unchanged_cells = len(new_rows) * width - written_cells
+    return writes, written_cells, unchanged_cells
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# scripts/ のモジュールは `python scripts/xxx.py` で実行される前提で、互いにトップレベル名で import し合う
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,144 @@
+import pytest
+from emansion.parser import extract_ad_info
+
+YAHOO_NEW = 'https://realestate.yahoo.co.jp/new/mansion/dtl/123/'
+YAHOO_OLD = 'http://new.realestate.yahoo.co.jp/mansion/123/'
+
+
+def legacy_parse_ad_info(data):
+    """置き換え前の if 文の連鎖による実装（比較用にそのまま残す）"""
+    ad_info = {
+        'entry_id': '',
+        'p_dtlurl': '',
+        'p_sold_flag': '',
+        'l_url': '',
+        'l_sold_flag': '',
+        'y_dtlurl': '',
+        'y_sold_flag': ''
+    }
+    
+    if 'result' in data and data['result'] is not None:
+        result_data = data['result']
+        
+        # entry_id を取得
+        if 'entry' in result_data and isinstance(result_data['entry'], list) and len(result_data['entry']) > 0:
+            entry_id = result_data['entry'][0].get('entry_id')
+            if entry_id is not None:
+                ad_info['entry_id'] = str(entry_id)
+        
+        # 純広告（P） - result.p キー
+        if 'p' in result_data and isinstance(result_data['p'], dict) and result_data['p']:
+            p = result_data['p']
+            ad_info['p_dtlurl'] = str(p.get('dtlurl') or '')
+            ad_info['p_sold_flag'] = str(p.get('sold_flag') or '')
+        
+        # L広告（L） - result.l キー
+        if 'l' in result_data and isinstance(result_data['l'], dict) and result_data['l']:
+            l = result_data['l']
+            project_cd = l.get('project_cd', '')
+            if project_cd:
+                ad_info['l_url'] = f"https://www.homes.co.jp/mansion/b-{project_cd}/?cmp_id=001_08359_0009551273&utm_campaign=alliance_sumulab&utm_content=001_08359_0009551273&utm_medium=cpa&utm_source=sumulab&utm_term="
+            ad_info['l_sold_flag'] = str(l.get('sold_flag') or '')
+        
+        
+        # Y広告の処理（dtlurlとsold_flagをペアで取得）
+        y_dtlurl = ''
+        y_sold_flag = ''
+        
+        # 1. ynew キーを確認
+        if 'ynew' in result_data and isinstance(result_data['ynew'], dict):
+            dtlurl = result_data['ynew'].get('dtlurl', '')
+            if dtlurl:
+                y_dtlurl = dtlurl
+                sold_flag = result_data['ynew'].get('sold_flag')
+                if sold_flag is not None:
+                    y_sold_flag = str(sold_flag)
+        
+        # 2. a キーを確認（ynewで取得できなかった場合のみ）
+        if not y_dtlurl and 'a' in result_data and isinstance(result_data['a'], dict):
+            dtlurl = result_data['a'].get('dtlurl', '')
+            if dtlurl:
+                y_dtlurl = dtlurl
+                sold_flag = result_data['a'].get('sold_flag')
+                if sold_flag is not None:
+                    y_sold_flag = str(sold_flag)
+        
+        # 3. result 直下を確認（ynewとaで取得できなかった場合のみ）
+        if not y_dtlurl and 'dtlurl' in result_data:
+            dtlurl = result_data.get('dtlurl', '')
+            if dtlurl:
+                y_dtlurl = dtlurl
+                sold_flag = result_data.get('sold_flag')
+                if sold_flag is not None:
+                    y_sold_flag = str(sold_flag)
+        
+        # Yahoo不動産のURLかどうかを判定（新旧両形式をサポート）
+        if y_dtlurl:
+            is_yahoo_url = (
+                y_dtlurl.startswith('https://realestate.yahoo.co.jp/new/mansion/dtl/') or
+                y_dtlurl.startswith('http://new.realestate.yahoo.co.jp/mansion/')
+            )
+            
+            if is_yahoo_url:
+                # 新形式のYahoo不動産URLの場合のみパラメータを追加
+                if y_dtlurl.startswith('https://realestate.yahoo.co.jp/new/mansion/dtl/'):
+                    # パラメータ二重付加しないようにガード
+                    if 'sc_out=mikle_mansion_official' not in y_dtlurl:
+                        if '?' in y_dtlurl:
+                            y_dtlurl += '&sc_out=mikle_mansion_official'
+                        else:
+                            y_dtlurl += '?sc_out=mikle_mansion_official'
+                
+                # URLとsold_flagをペアで設定
+                ad_info['y_dtlurl'] = y_dtlurl
+                if y_sold_flag:
+                    ad_info['y_sold_flag'] = y_sold_flag
+
+    return ad_info
+
+
+PAYLOADS = {
+    'empty': {},
+    'result_none': {'result': None},
+    'result_empty': {'result': {}},
+    'entry': {'result': {'entry': [{'entry_id': 42}]}},
+    'entry_zero': {'result': {'entry': [{'entry_id': 0}]}},
+    'entry_missing_id': {'result': {'entry': [{}]}},
+    'entry_empty_list': {'result': {'entry': []}},
+    'p_on_sale': {'result': {'p': {'dtlurl': 'https://p.example/1', 'sold_flag': '0'}}},
+    'p_sold_int': {'result': {'p': {'dtlurl': 'https://p.example/1', 'sold_flag': 1}}},
+    'p_flag_zero_int': {'result': {'p': {'dtlurl': 'https://p.example/1', 'sold_flag': 0}}},
+    'p_no_flag': {'result': {'p': {'dtlurl': 'https://p.example/1'}}},
+    'p_empty_dict': {'result': {'p': {}}},
+    'p_not_dict': {'result': {'p': []}},
+    'l_project': {'result': {'l': {'project_cd': '9876', 'sold_flag': '1'}}},
+    'l_no_project': {'result': {'l': {'sold_flag': '0'}}},
+    'l_none_flag': {'result': {'l': {'project_cd': '9876', 'sold_flag': None}}},
+    'ynew_new_url': {'result': {'ynew': {'dtlurl': YAHOO_NEW, 'sold_flag': 0}}},
+    'ynew_query_url': {'result': {'ynew': {'dtlurl': YAHOO_NEW + '?a=1', 'sold_flag': '1'}}},
+    'ynew_already_tagged': {'result': {'ynew': {'dtlurl': YAHOO_NEW + '?sc_out=mikle_mansion_official'}}},
+    'ynew_old_url': {'result': {'ynew': {'dtlurl': YAHOO_OLD, 'sold_flag': '0'}}},
+    'ynew_not_yahoo': {'result': {'ynew': {'dtlurl': 'https://other.example/', 'sold_flag': '0'}}},
+    'ynew_no_flag': {'result': {'ynew': {'dtlurl': YAHOO_NEW}}},
+    'ynew_empty_then_a': {'result': {'ynew': {'dtlurl': ''}, 'a': {'dtlurl': YAHOO_OLD, 'sold_flag': 1}}},
+    'a_only': {'result': {'a': {'dtlurl': YAHOO_NEW, 'sold_flag': '0'}}},
+    'root_only': {'result': {'dtlurl': YAHOO_NEW, 'sold_flag': '1'}},
+    'root_not_yahoo': {'result': {'dtlurl': 'https://other.example/', 'sold_flag': '1'}},
+    'ynew_wins_over_a': {'result': {'ynew': {'dtlurl': YAHOO_OLD, 'sold_flag': '1'}, 'a': {'dtlurl': YAHOO_NEW, 'sold_flag': '0'}}},
+    'everything': {'result': {
+        'entry': [{'entry_id': '7'}],
+        'p': {'dtlurl': 'https://p.example/7', 'sold_flag': '1'},
+        'l': {'project_cd': '7', 'sold_flag': '0'},
+        'ynew': {'dtlurl': YAHOO_NEW, 'sold_flag': '0'},
+    }},
+}
+
+
+@pytest.mark.parametrize('name', sorted(PAYLOADS))
+def test_extractor_matches_legacy_if_chain(name):
+    assert extract_ad_info(PAYLOADS[name]) == legacy_parse_ad_info(PAYLOADS[name])
+
+
+def test_non_dict_response_gives_empty_ad_info():
+    assert extract_ad_info(None) == extract_ad_info({})
+    assert set(extract_ad_info([])) == {'entry_id', 'p_dtlurl', 'p_sold_flag', 'l_url', 'l_sold_flag', 'y_dtlurl', 'y_sold_flag'}
@@ -0,0 +1,102 @@
+import sqlite3
+
+import pytest
+
+import building_index
+from building_index import BuildingIndex, normalize_name
+from emansion import client
+
+CANDIDATES = [{'buildingid': '100', 'name': 'テストマンション'}]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = BuildingIndex(str(tmp_path / 'index.sqlite3'))
+    yield index
+    index.close()
+
+
+def row(index, name):
+    with sqlite3.connect(index.path) as conn:
+        return conn.execute('SELECT building_id, source, candidates FROM buildings WHERE name_key = ?',
+                            (normalize_name(name),)).fetchone()
+
+
+def test_normalize_name_absorbs_width_and_kana():
+    assert normalize_name('ﾃｽﾄ マンション') == normalize_name('てすと・マンション')
+
+
+def test_seed_keeps_candidates_when_sheet_agrees(index):
+    index.record('テストマンション', CANDIDATES)
+    index.seed({'テストマンション': '100'})
+    building_id, source, candidates = row(index, 'テストマンション')
+    assert (building_id, source) == ('100', 'sheet')
+    assert candidates is not None
+
+
+def test_seed_overrides_search_result(index):
+    index.record('テストマンション', CANDIDATES)
+    index.seed({'テストマンション': '200'})
+    assert row(index, 'テストマンション') == ('200', 'sheet', None)
+    assert index.get('テストマンション') == '200'
+
+
+def test_seed_forgets_names_whose_l_cell_was_cleared(index):
+    index.record('テストマンション', CANDIDATES)
+    index.seed({'別の物件': '300'}, ['テストマンション', '別の物件', ''])
+    assert index.get('テストマンション') is None
+    assert index.get('別の物件') == '300'
+    assert index.forgotten == 1
+
+
+def test_seed_keeps_name_filled_on_another_row(index):
+    # 同じ物件名の行が別にあり、そちらの L列が埋まっていれば消さない
+    index.record('テストマンション', CANDIDATES)
+    index.seed({'ﾃｽﾄﾏﾝｼｮﾝ': '100'}, ['テストマンション', 'ﾃｽﾄﾏﾝｼｮﾝ'])
+    assert index.get('テストマンション') == '100'
+    assert index.forgotten == 0
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def test_negative_cache_backs_off_until_max_ttl(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(building_index.time, 'time', clock.time)
+    index = BuildingIndex(str(tmp_path / 'index.sqlite3'), negative_ttl_hours=1, negative_max_ttl_days=4 / 24)
+    ttls = []
+    for _ in range(4):
+        index.record_miss('ない物件')
+        assert index.is_negative_cached('ない物件')
+        expires_in = 0
+        while index.is_negative_cached('ない物件'):
+            clock.now += 3600
+            expires_in += 1
+        ttls.append(expires_in)
+    assert ttls == [1, 2, 4, 4]
+    index.close()
+
+
+def test_found_name_leaves_negative_cache(index):
+    index.record_miss('テストマンション')
+    assert index.is_negative_cached('ﾃｽﾄﾏﾝｼｮﾝ')
+    index.record('テストマンション', CANDIDATES)
+    assert not index.is_negative_cached('テストマンション')
+
+
+def test_search_skips_negative_cached_name_and_records_misses(index, monkeypatch):
+    searched = []
+    responses = {'ない物件': [], 'エラー物件': None}
+    monkeypatch.setattr(client, 'search_building_candidates', lambda name: searched.append(name) or responses[name])
+    assert client.search_building_id('ない物件', index) is None
+    assert client.search_building_id('ない物件', index) is None
+    # 通信エラーは見つからなかったことにしない
+    assert client.search_building_id('エラー物件', index) is None
+    assert client.search_building_id('エラー物件', index) is None
+    assert searched == ['ない物件', 'エラー物件', 'エラー物件']
+    assert index.negative_skips == 1
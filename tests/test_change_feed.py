@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from change_feed import ChangeFeed
+
+EMPTY_URLS = {'p_dtlurl': '', 'l_url': '', 'y_dtlurl': ''}
+EMPTY_STATUS = {'thread_url': '', 'p_sold_flag': '', 'l_sold_flag': '', 'y_sold_flag': ''}
+
+
+def m_row(p_url='', p_flag='', l_url='', l_flag='', y_url='', y_flag='', date=''):
+    return [p_url, p_flag, l_url, l_flag, y_url, y_flag, date]
+
+
+def collect(feed, before_urls, before_status, after_m_row, before_date='', after_thread='', name='テスト物件',
+            sheet_id='100'):
+    """Building ID 100 の1行について、変更前（シート）と変更後（書き込む値）からイベントを作る"""
+    return feed.collect(
+        [name], [('100', {})], [[after_thread]], [['100']], [after_m_row],
+        {name: sheet_id} if sheet_id else {}, {'100': before_date} if before_date else {},
+        {'100': dict(EMPTY_URLS, **before_urls)}, {'100': dict(EMPTY_STATUS, **before_status)}
+    )
+
+
+def kinds(events):
+    return [(event['type'], event.get('site'), event['before'], event['after']) for event in events]
+
+
+@pytest.fixture
+def feed():
+    return ChangeFeed('', '2026/10/16')
+
+
+@pytest.mark.parametrize('before_urls, before_status, after, expected', [
+    ({}, {}, m_row(p_url='https://p/1', p_flag='0'), [('ad_appeared', 'p', '', 'https://p/1')]),
+    ({'l_url': 'https://l/1'}, {'l_sold_flag': '0'}, m_row(l_url='https://l/2', l_flag='0'),
+     [('url_changed', 'l', 'https://l/1', 'https://l/2')]),
+    ({'y_dtlurl': 'https://y/1'}, {'y_sold_flag': '0'}, m_row(y_url='https://y/1', y_flag='1'),
+     [('sold_out', 'y', '0', '1')]),
+    ({'p_dtlurl': 'https://p/1'}, {'p_sold_flag': '1'}, m_row(p_url='https://p/1', p_flag='0'),
+     [('back_on_sale', 'p', '1', '0')]),
+    ({'p_dtlurl': 'https://p/1'}, {'p_sold_flag': ''}, m_row(p_url='https://p/1', p_flag='0'),
+     [('sold_flag_changed', 'p', '', '0')]),
+    ({'p_dtlurl': 'https://p/1'}, {'p_sold_flag': '0'}, m_row(p_url='https://p/1', p_flag='0'), []),
+])
+def test_ad_transitions(feed, before_urls, before_status, after, expected):
+    assert kinds(collect(feed, before_urls, before_status, after)) == expected
+
+
+def test_sale_date_and_thread_url(feed):
+    events = collect(feed, {'p_dtlurl': 'https://p/1'}, {'p_sold_flag': '0', 'thread_url': 'https://t/1'},
+                     m_row(p_url='https://p/1', p_flag='0', date='2026/10/16'), after_thread='https://t/2')
+    assert kinds(events) == [('sale_date_recorded', None, '', '2026/10/16'),
+                             ('thread_url_changed', None, 'https://t/1', 'https://t/2')]
+    # 既に日付が入っていれば記録しない
+    assert kinds(collect(ChangeFeed('', '2026/10/16'), {'p_dtlurl': 'https://p/1'}, {'p_sold_flag': '0'},
+                         m_row(p_url='https://p/1', p_flag='0', date='2026/10/01'), before_date='2026/10/01')) == []
+
+
+def test_building_id_resolved_once_per_name(feed):
+    events = collect(feed, {}, {}, m_row(), sheet_id='')
+    assert kinds(events) == [('building_id_resolved', None, '', '100')]
+    assert events[0]['property_names'] == ['テスト物件']
+    assert collect(feed, {}, {}, m_row(), sheet_id='') == []
+
+
+def test_building_shared_by_rows_is_compared_once(feed):
+    events = feed.collect(
+        ['本館', '本館 別表記', '未取得'], [('100', {}), ('100', {}), None],
+        [[''], [''], ['']], [['100'], ['100'], ['100']], [m_row(p_url='https://p/1')] * 3,
+        {'本館': '100', '本館 別表記': '100', '未取得': '100'}, {}, {'100': EMPTY_URLS}, {'100': EMPTY_STATUS}
+    )
+    assert kinds(events) == [('ad_appeared', 'p', '', 'https://p/1')]
+    assert events[0]['property_names'] == ['本館', '本館 別表記']
+
+
+def test_append_counts_and_writes_jsonl(tmp_path):
+    path = tmp_path / 'feed' / 'changes.jsonl'
+    feed = ChangeFeed(str(path), '2026/10/16')
+    events = collect(feed, {}, {}, m_row(p_url='https://p/1', p_flag='1'))
+    feed.append(events)
+    written = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [event['type'] for event in written] == ['ad_appeared']
+    assert written[0]['date'] == '2026/10/16'
+    assert feed.counts == {'ad_appeared': 1}
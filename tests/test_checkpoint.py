@@ -0,0 +1,69 @@
+import json
+import time
+
+from checkpoint import RunJournal, KIND_SEARCH, KIND_AD_INFO
+
+
+def test_resume_restores_recorded_entries(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+    journal = RunJournal(path)
+    journal.record(KIND_SEARCH, 'テスト物件', '100')
+    journal.record(KIND_AD_INFO, '100', {'p_dtlurl': 'u'})
+    journal.close()
+
+    resumed = RunJournal(path, resume=True)
+    assert resumed.get(KIND_SEARCH, 'テスト物件') == (True, '100')
+    assert resumed.get(KIND_AD_INFO, '100') == (True, {'p_dtlurl': 'u'})
+    assert resumed.get(KIND_AD_INFO, '200') == (False, None)
+    assert resumed.resumed == 2
+    resumed.close()
+
+
+def test_without_resume_starts_empty(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+    journal = RunJournal(path)
+    journal.record(KIND_SEARCH, 'テスト物件', '100')
+    journal.close()
+
+    fresh = RunJournal(path)
+    assert fresh.get(KIND_SEARCH, 'テスト物件') == (False, None)
+    fresh.close()
+
+
+def test_resume_keeps_appending(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+    journal = RunJournal(path)
+    journal.record(KIND_SEARCH, 'a', '1')
+    journal.close()
+    journal = RunJournal(path, resume=True)
+    journal.record(KIND_SEARCH, 'b', '2')
+    journal.close()
+
+    resumed = RunJournal(path, resume=True)
+    assert resumed.get(KIND_SEARCH, 'a') == (True, '1')
+    assert resumed.get(KIND_SEARCH, 'b') == (True, '2')
+    resumed.close()
+
+
+def test_resume_skips_old_and_truncated_entries(tmp_path):
+    path = tmp_path / 'checkpoint.jsonl'
+    old = {'t': time.time() - 13 * 3600, 'kind': KIND_SEARCH, 'key': 'old', 'value': '1'}
+    recent = {'t': time.time(), 'kind': KIND_SEARCH, 'key': 'recent', 'value': '2'}
+    path.write_text(json.dumps(old) + '\n' + json.dumps(recent) + '\n{"t": 1, "ki', encoding='utf-8')
+
+    resumed = RunJournal(str(path), resume=True, window_hours=12)
+    assert resumed.get(KIND_SEARCH, 'old') == (False, None)
+    assert resumed.get(KIND_SEARCH, 'recent') == (True, '2')
+    resumed.close()
+
+
+def test_clear_empties_journal(tmp_path):
+    path = str(tmp_path / 'checkpoint.jsonl')
+    journal = RunJournal(path)
+    journal.record(KIND_SEARCH, 'a', '1')
+    journal.clear()
+    journal.close()
+
+    resumed = RunJournal(path, resume=True)
+    assert resumed.get(KIND_SEARCH, 'a') == (False, None)
+    resumed.close()
@@ -0,0 +1,86 @@
+"""エミュレーター（sheets_emulator）と代替サーバー（emansion_stub_server）を相手に
+fetch_mansion_links.py を実際に実行し、実行モードが違ってもシートの結果が同じになることを確かめる"""
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SCRIPTS_DIR
+from emansion_stub_server import StubState, start_in_thread
+from merge_cache import merge_cache_dirs
+from sheets_emulator import EmulatedSpreadsheet
+
+ROWS = 24
+SHARD_COUNT = 2
+
+
+@pytest.fixture(scope='module')
+def base_url():
+    server, url = start_in_thread(StubState({}, synthetic=True))
+    yield url
+    server.shutdown()
+
+
+def seed(path):
+    spreadsheet = EmulatedSpreadsheet(path)
+    grid = [['', '物件名', 'スレURL']]
+    # 同じ物件名の行・空の行も混ぜる
+    for i in range(1, ROWS + 1):
+        grid.append(['', '' if i % 11 == 0 else f'テスト物件{i % 17}'])
+    spreadsheet.sheets['新着物件'] = grid
+    spreadsheet.save()
+
+
+def run(workdir, sheet_path, base_url, **env):
+    os.makedirs(workdir, exist_ok=True)
+    full_env = dict(os.environ)
+    full_env.update({
+        'SHEETS_BACKEND': 'emulator',
+        'SHEETS_EMULATOR_PATH': sheet_path,
+        'EMANSION_BASE_URL': base_url,
+        'SPREADSHEET_ID': 'test',
+        'REQUESTS_PER_SECOND': '1000',
+        'RATE_LIMIT_MAX_RPS': '1000',
+    })
+    full_env.update({key: str(value) for key, value in env.items()})
+    result = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'fetch_mansion_links.py')],
+                            cwd=workdir, env=full_env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+
+def final_sheet(tmp_path, name, base_url, **env):
+    sheet_path = str(tmp_path / f'{name}.json')
+    seed(sheet_path)
+    run(str(tmp_path / name), sheet_path, base_url, **env)
+    return EmulatedSpreadsheet(sheet_path).sheets['新着物件']
+
+
+def test_modes_write_the_same_sheet(tmp_path, base_url):
+    expected = final_sheet(tmp_path, 'default', base_url)
+    assert len(expected) == ROWS + 1
+    assert any(len(row) > 12 and row[12] for row in expected[1:])
+
+    assert final_sheet(tmp_path, 'pipeline', base_url, PIPELINE=1, PIPELINE_CHUNK_ROWS=5) == expected
+    assert final_sheet(tmp_path, 'concurrent', base_url, CONCURRENCY=4) == expected
+
+    sheet_path = str(tmp_path / 'sharded.json')
+    seed(sheet_path)
+    shard_dir = str(tmp_path / 'shard-results')
+    for shard_index in range(SHARD_COUNT):
+        run(str(tmp_path / f'shard{shard_index}'), sheet_path, base_url,
+            SHARD_COUNT=SHARD_COUNT, SHARD_INDEX=shard_index, SHARD_DIR=shard_dir)
+    run(str(tmp_path / 'merge'), sheet_path, base_url, SHARD_COUNT=SHARD_COUNT, SHARD_MERGE=1, SHARD_DIR=shard_dir)
+    assert EmulatedSpreadsheet(sheet_path).sheets['新着物件'] == expected
+    # 広告情報の履歴はシャードではなくマージのときに1か所へ記録する
+    assert not os.path.exists(tmp_path / 'shard0' / '.cache' / 'ad_history.sqlite3')
+    assert os.path.exists(tmp_path / 'merge' / '.cache' / 'ad_history.sqlite3')
+
+    # シャードごとのキャッシュをまとめると、1ジョブで実行したときと同じ物件が引ける
+    merged_cache = str(tmp_path / 'merged-cache')
+    merge_cache_dirs([str(tmp_path / f'shard{i}' / '.cache') for i in range(SHARD_COUNT)], merged_cache)
+    query = 'SELECT name_key, building_id FROM buildings ORDER BY name_key'
+    with sqlite3.connect(os.path.join(merged_cache, 'building_index.sqlite3')) as merged, \
+            sqlite3.connect(str(tmp_path / 'default' / '.cache' / 'building_index.sqlite3')) as single:
+        assert merged.execute(query).fetchall() == single.execute(query).fetchall()
@@ -0,0 +1,94 @@
+import pytest
+
+import freshness
+from emansion import client
+from freshness import FreshnessStore, STATUS_ON_SALE, STATUS_SOLD_OUT
+
+DAY = 86400
+SOLD_OUT = {'p_dtlurl': 'https://p/1', 'p_sold_flag': '1', 'l_url': '', 'l_sold_flag': '', 'y_dtlurl': '', 'y_sold_flag': ''}
+ON_SALE = dict(SOLD_OUT, p_sold_flag='0')
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(freshness.time, 'time', clock.time)
+    return clock
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = FreshnessStore(str(tmp_path / 'freshness.sqlite3'), enabled=True, base_interval_days=1, max_interval_days=14)
+    yield store
+    store.close()
+
+
+def interval_days(store, clock, building_id='1'):
+    return round((store.get_state(building_id)['next_refresh_at'] - clock.now) / (DAY * 0.9), 6)
+
+
+def test_unchanged_sold_out_backs_off_up_to_max_interval(store, clock):
+    intervals = []
+    for _ in range(6):
+        store.record('1', SOLD_OUT)
+        intervals.append(interval_days(store, clock))
+        clock.now += DAY
+    assert intervals == [1, 2, 4, 8, 14, 14]
+    assert store.get_state('1')['status'] == STATUS_SOLD_OUT
+
+
+def test_change_resets_back_off(store, clock):
+    for _ in range(3):
+        store.record('1', SOLD_OUT)
+    store.record('1', dict(SOLD_OUT, p_dtlurl='https://p/2'))
+    state = store.get_state('1')
+    assert state['unchanged_count'] == 0
+    assert state['last_changed_at'] == clock.now
+    assert interval_days(store, clock) == 1
+
+
+def test_on_sale_is_always_due(store, clock):
+    store.record('1', ON_SALE)
+    assert store.get_state('1')['status'] == STATUS_ON_SALE
+    assert store.reusable_ad_info('1') is None
+
+
+def test_very_old_unchanged_count_does_not_overflow(tmp_path, clock):
+    # fetch_mansion_links.py は環境変数を float() で渡すので、間隔は float になる
+    store = FreshnessStore(str(tmp_path / 'freshness.sqlite3'), base_interval_days=1.0, max_interval_days=14.0)
+    store.record('1', SOLD_OUT)
+    store._conn.execute('UPDATE freshness SET unchanged_count = 1100')
+    store.record('1', SOLD_OUT)
+    assert interval_days(store, clock) == 14
+    store.close()
+
+
+def test_fetch_ad_info_incremental_skips_until_due(store, clock, monkeypatch):
+    fetched = []
+    monkeypatch.setattr(client, 'fetch_ad_info', lambda building_id, http_cache=None: fetched.append(building_id) or SOLD_OUT)
+    assert client.fetch_ad_info_incremental('1', store, None) == SOLD_OUT
+    clock.now += DAY * 0.5
+    assert client.fetch_ad_info_incremental('1', store, None) == SOLD_OUT
+    assert fetched == ['1']
+    assert store.reused == 1
+    clock.now += DAY
+    client.fetch_ad_info_incremental('1', store, None)
+    assert fetched == ['1', '1']
+
+
+def test_disabled_store_always_fetches(tmp_path, clock, monkeypatch):
+    store = FreshnessStore(str(tmp_path / 'freshness.sqlite3'), enabled=False)
+    fetched = []
+    monkeypatch.setattr(client, 'fetch_ad_info', lambda building_id, http_cache=None: fetched.append(building_id) or SOLD_OUT)
+    client.fetch_ad_info_incremental('1', store, None)
+    client.fetch_ad_info_incremental('1', store, None)
+    assert fetched == ['1', '1']
+    store.close()
@@ -0,0 +1,65 @@
+import pytest
+
+from history_store import HistoryStore, pack_flags, unpack_flags
+
+ON_SALE = {'entry_id': '1', 'p_dtlurl': 'https://p/1', 'p_sold_flag': '0',
+           'l_url': '', 'l_sold_flag': '', 'y_dtlurl': '', 'y_sold_flag': ''}
+SOLD_OUT = dict(ON_SALE, p_sold_flag='1')
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.sqlite3'))
+    yield store
+    store.close()
+
+
+def reopen(store):
+    store.close()
+    return HistoryStore(store.path)
+
+
+@pytest.mark.parametrize('flags', [('', '0', '1'), ('1', '', ''), ('2', '0', 'x')])
+def test_pack_flags_round_trip(flags):
+    ad_info = dict(zip(('p_sold_flag', 'l_sold_flag', 'y_sold_flag'), flags))
+    assert unpack_flags(*pack_flags(ad_info)) == ad_info
+
+
+def test_only_changes_add_rows(store):
+    store.record('1', ON_SALE, '2026/10/01')
+    store.record('1', ON_SALE, '2026/10/02')
+    store.record('1', SOLD_OUT, '2026/10/03')
+    assert store.history('1') == [('2026/10/01', ON_SALE), ('2026/10/03', SOLD_OUT)]
+    assert store.status_on('1', '2026/10/02') == ON_SALE
+    assert store.status_on('1', '2026/09/30') is None
+    assert store.observed_range('1') == ('2026/10/01', '2026/10/03')
+    assert store.changes_since('2026/10/02') == [('2026/10/03', '1', ON_SALE, SOLD_OUT)]
+    assert store.changed == 1
+
+
+def test_same_day_revert_within_run_is_not_a_change(store):
+    store.record('1', ON_SALE, '2026/10/01')
+    store = reopen(store)
+    store.record('1', SOLD_OUT, '2026/10/02')
+    assert store.changed == 1
+    store.record('1', ON_SALE, '2026/10/02')
+    assert store.changed == 0
+    assert store.history('1') == [('2026/10/01', ON_SALE)]
+    store.close()
+
+
+def test_same_day_revert_of_earlier_run_is_a_change(store):
+    store.record('1', ON_SALE, '2026/10/01')
+    store.record('1', SOLD_OUT, '2026/10/02')
+    store = reopen(store)
+    store.record('1', ON_SALE, '2026/10/02')
+    assert store.changed == 1
+    assert store.history('1') == [('2026/10/01', ON_SALE)]
+    store.close()
+
+
+def test_same_day_update_counts_once(store):
+    store.record('1', ON_SALE, '2026/10/01')
+    store.record('1', SOLD_OUT, '2026/10/01')
+    assert store.changed == 1
+    assert store.history('1') == [('2026/10/01', SOLD_OUT)]
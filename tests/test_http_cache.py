@@ -0,0 +1,99 @@
+import pytest
+
+from http_cache import HttpCache
+
+URL = 'https://example.test/bbs/yre/building/1/ajaxJson/'
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f'HTTP {self.status_code}')
+
+
+class FakeServer:
+    """get(url, timeout, headers) として渡し、受け取った条件付きヘッダーを記録する"""
+
+    def __init__(self):
+        self.responses = []
+        self.requests = []
+
+    def get(self, url, timeout=10, headers=None):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+class CountingParser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, response):
+        self.calls += 1
+        return {'body': response.content.decode(), 'parsed': self.calls}
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+def open_cache(tmp_path, parser_version=1):
+    return HttpCache(str(tmp_path / 'http_cache.sqlite3'), parser_version=parser_version)
+
+
+def test_validators_are_sent_and_304_reuses_parsed_result(tmp_path, server):
+    cache = open_cache(tmp_path)
+    parse = CountingParser()
+    server.responses = [
+        FakeResponse(200, b'{"a": 1}', {'ETag': '"v1"', 'Last-Modified': 'Fri, 16 Oct 2026 00:00:00 GMT'}),
+        FakeResponse(304),
+    ]
+    first = cache.fetch(server.get, URL, parse)
+    second = cache.fetch(server.get, URL, parse)
+    assert server.requests == [{}, {'If-None-Match': '"v1"', 'If-Modified-Since': 'Fri, 16 Oct 2026 00:00:00 GMT'}]
+    assert first == second == {'body': '{"a": 1}', 'parsed': 1}
+    assert parse.calls == 1
+    assert (cache.misses, cache.revalidated, cache.hits) == (1, 1, 0)
+    cache.close()
+
+
+def test_unchanged_body_skips_parsing_and_changed_body_is_parsed(tmp_path, server):
+    cache = open_cache(tmp_path)
+    parse = CountingParser()
+    server.responses = [FakeResponse(200, b'same'), FakeResponse(200, b'same'), FakeResponse(200, b'new')]
+    cache.fetch(server.get, URL, parse)
+    assert cache.fetch(server.get, URL, parse) == {'body': 'same', 'parsed': 1}
+    assert cache.fetch(server.get, URL, parse) == {'body': 'new', 'parsed': 2}
+    assert (cache.misses, cache.hits) == (2, 1)
+    cache.close()
+
+
+def test_parser_version_change_invalidates_stored_results(tmp_path, server):
+    cache = open_cache(tmp_path, parser_version=1)
+    server.responses = [FakeResponse(200, b'same', {'ETag': '"v1"'})]
+    cache.fetch(server.get, URL, CountingParser())
+    cache.close()
+
+    cache = open_cache(tmp_path, parser_version=2)
+    parse = CountingParser()
+    server.responses = [FakeResponse(200, b'same', {'ETag': '"v1"'})]
+    assert cache.fetch(server.get, URL, parse) == {'body': 'same', 'parsed': 1}
+    # 古い解析結果は使えないので、条件付きヘッダーも送らない
+    assert server.requests[-1] == {}
+    assert (parse.calls, cache.hits, cache.misses) == (1, 0, 1)
+    cache.close()
+
+
+def test_http_error_is_raised_and_not_stored(tmp_path, server):
+    cache = open_cache(tmp_path)
+    server.responses = [FakeResponse(500), FakeResponse(200, b'ok')]
+    with pytest.raises(RuntimeError):
+        cache.fetch(server.get, URL, CountingParser())
+    assert cache.fetch(server.get, URL, CountingParser()) == {'body': 'ok', 'parsed': 1}
+    assert server.requests == [{}, {}]
+    cache.close()
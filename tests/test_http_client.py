@@ -0,0 +1,56 @@
+import threading
+
+import pytest
+
+import http_client
+import rate_limiter
+from emansion_stub_server import StubState, start_in_thread
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """共有セッションなどのモジュール状態を空にし、テスト後に閉じる"""
+    monkeypatch.setenv('HTTP_POOL_SIZE', '3')
+    monkeypatch.delenv('HTTP_RECORD_PATH', raising=False)
+    for name in ('_session', '_retry_policy', '_circuit_breaker', '_recorder'):
+        monkeypatch.setattr(http_client, name, None)
+    monkeypatch.setattr(rate_limiter, '_limiter', rate_limiter.AdaptiveRateLimiter(rate=1000, max_rate=1000, burst=1000))
+    yield http_client
+    http_client.close()
+
+
+@pytest.fixture
+def base_url():
+    server, url = start_in_thread(StubState({}, synthetic=True))
+    yield url
+    server.shutdown()
+
+
+def test_session_is_shared_across_threads(client):
+    sessions = []
+    threads = [threading.Thread(target=lambda: sessions.append(client.get_session())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(session) for session in sessions}) == 1
+
+    session = sessions[0]
+    adapter = session.get_adapter('https://www.e-mansion.co.jp/')
+    assert session.get_adapter('http://127.0.0.1/') is adapter
+    assert adapter._pool_maxsize == 3
+    assert adapter._pool_block
+    assert session.headers['Connection'] == 'keep-alive'
+
+
+def test_sequential_requests_reuse_one_connection(client, base_url):
+    for building_id in (1, 2, 3):
+        response = client.get(f'{base_url}/bbs/yre/building/{building_id}/ajaxJson/')
+        assert response.status_code == 200
+    assert client.connection_stats() == {'requests': 3, 'connections_opened': 1, 'connections_reused': 2}
+
+
+def test_close_drops_the_shared_session(client):
+    session = client.get_session()
+    client.close()
+    assert client.get_session() is not session
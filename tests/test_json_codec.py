@@ -0,0 +1,50 @@
+import math
+
+import pytest
+
+import json_codec
+
+DOCUMENTS = [
+    '{"building": [{"buildingid": 12345, "name": "テストマンション"}]}'.encode('utf-8'),
+    # 64bit を超える整数は orjson では float になるので、ここでは 64bit に収まる範囲だけを比べる
+    b'{"big": 18446744073709551615, "negative": -9223372036854775808, "float": 1.5, "null": null, "list": [true, false]}',
+    b'{"nan": NaN}',
+    '{"escaped": "\\u30c6\\u30b9\\u30c8"}'.encode('utf-8'),
+]
+
+
+def decoders():
+    yield 'stdlib'
+    if json_codec.orjson is not None:
+        yield 'orjson'
+
+
+def normalized(value):
+    # NaN 同士は == で比べられないので文字列にする
+    return repr(value) if isinstance(value, float) and math.isnan(value) else value
+
+
+@pytest.mark.parametrize('document', DOCUMENTS)
+@pytest.mark.parametrize('name', list(decoders()))
+def test_decoders_agree_with_json_loads(name, document):
+    expected = json_codec.json.loads(document)
+    decoded = json_codec.get_decoder(name)(document)
+    assert {k: normalized(v) for k, v in decoded.items()} == {k: normalized(v) for k, v in expected.items()}
+
+
+def test_stdlib_can_be_forced_and_is_the_fallback(monkeypatch):
+    assert json_codec.get_decoder('stdlib') is json_codec._stdlib_loads
+    monkeypatch.setattr(json_codec, 'orjson', None)
+    assert json_codec.get_decoder('orjson') is json_codec._stdlib_loads
+
+
+def test_orjson_is_used_when_installed():
+    pytest.importorskip('orjson')
+    assert json_codec.get_decoder() is json_codec._orjson_loads
+
+
+def test_response_json_decodes_body_bytes():
+    class Response:
+        content = '{"name": "テスト"}'.encode('utf-8')
+
+    assert json_codec.response_json(Response()) == {'name': 'テスト'}
@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+import freshness as freshness_module
+import metrics as metrics_module
+from building_index import BuildingIndex
+from checkpoint import RunJournal
+from emansion import orchestrator
+from freshness import FreshnessStore
+from metrics import RunMetrics
+
+SOLD_OUT = {'p_dtlurl': 'https://p/1', 'p_sold_flag': '1', 'l_url': '', 'l_sold_flag': '', 'y_dtlurl': '', 'y_sold_flag': ''}
+
+
+class FakeEmansion:
+    """orchestrator が呼ぶ検索・広告情報取得を置き換え、呼ばれた引数を記録する"""
+
+    def __init__(self, ids_by_name):
+        self.ids_by_name = ids_by_name
+        self.searched = []
+        self.fetched = []
+        self._lock = threading.Lock()
+
+    def search(self, property_name, index=None):
+        with self._lock:
+            self.searched.append(property_name)
+        return self.ids_by_name.get(property_name)
+
+    def fetch(self, building_id, freshness=None, http_cache=None):
+        with self._lock:
+            self.fetched.append(building_id)
+        return dict(SOLD_OUT, p_dtlurl=f'https://p/{building_id}')
+
+
+@pytest.fixture
+def stores(tmp_path):
+    index = BuildingIndex(str(tmp_path / 'index.sqlite3'))
+    freshness = FreshnessStore(str(tmp_path / 'freshness.sqlite3'))
+    journal = RunJournal(str(tmp_path / 'checkpoint.jsonl'))
+    yield index, freshness, None, journal
+    index.close()
+    freshness.close()
+    journal.close()
+
+
+def fake_emansion(monkeypatch, ids_by_name):
+    emansion = FakeEmansion(ids_by_name)
+    monkeypatch.setattr(orchestrator, 'search_building_id', emansion.search)
+    monkeypatch.setattr(orchestrator, 'fetch_ad_info_incremental', emansion.fetch)
+    return emansion
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_duplicates_are_fetched_once_and_fanned_out(stores, monkeypatch, concurrency):
+    emansion = fake_emansion(monkeypatch, {'テストマンション': '100', '別館': '300'})
+    names = ['テストマンション', 'ﾃｽﾄ ﾏﾝｼｮﾝ', '既知の物件', '既知の物件', '同じIDの物件', '別館', '', '見つからない物件']
+    known_ids = {'既知の物件': '200', '同じIDの物件': '100'}
+
+    lookups = orchestrator.fetch_lookups(names, known_ids, *stores, concurrency)
+
+    assert sorted(emansion.searched) == sorted(['テストマンション', '別館', '見つからない物件'])
+    assert sorted(emansion.fetched) == ['100', '200', '300']
+    assert [lookup[0] for lookup in lookups] == ['100', '100', '200', '200', '100', '300', None, None]
+    assert lookups[1][1] == lookups[4][1] == dict(SOLD_OUT, p_dtlurl='https://p/100')
+    assert lookups[6] == lookups[7] == (None, None)
+
+
+def test_chunked_fetch_reports_progress(stores, monkeypatch):
+    fake_emansion(monkeypatch, {})
+    names = ['a', 'b', 'c']
+    progress = []
+    lookups = orchestrator.fetch_lookups(names, {'a': '1', 'b': '2', 'c': '3'}, *stores, 1,
+                                         chunk_size=2, on_progress=progress.append)
+    assert [[lookup and lookup[0] for lookup in snapshot] for snapshot in progress] == [['1', '2', None]]
+    assert [lookup[0] for lookup in lookups] == ['1', '2', '3']
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def test_budget_fetches_most_valuable_rows_first_and_counts_skipped(stores, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(orchestrator.time, 'time', clock.time)
+    monkeypatch.setattr(freshness_module.time, 'time', clock.time)
+    metrics = RunMetrics()
+    monkeypatch.setattr(metrics_module, '_metrics', metrics)
+    emansion = fake_emansion(monkeypatch, {'新しい物件': '2', '新しい物件2': '5'})
+    fetch = emansion.fetch
+
+    def slow_fetch(building_id, freshness=None, http_cache=None):
+        clock.now += 1
+        return fetch(building_id, freshness, http_cache)
+
+    monkeypatch.setattr(orchestrator, 'fetch_ad_info_incremental', slow_fetch)
+    index, freshness, http_cache, journal = stores
+    # 完売の2件は前回の取得が古い '7' を先にする
+    freshness.record('6', SOLD_OUT)
+    clock.now -= 100
+    freshness.record('7', SOLD_OUT)
+    clock.now += 100
+
+    names = ['完売', '新しい物件', '掲載中', '状態不明', '新しい物件2', '完売2']
+    sheet_ids = {'完売': '6', '掲載中': '3', '状態不明': '4', '完売2': '7'}
+    url_map = {'3': {'p_dtlurl': 'https://p/3', 'l_url': '', 'y_dtlurl': ''}}
+    status_map = {'3': {'thread_url': '', 'p_sold_flag': '0', 'l_sold_flag': '', 'y_sold_flag': ''}}
+
+    order, _ = orchestrator.prioritized_rows(names, sheet_ids, dict(sheet_ids), url_map, status_map, freshness)
+    assert order == [1, 4, 2, 3, 5, 0]
+
+    lookups, complete = orchestrator.fetch_lookups_within_budget(
+        names, sheet_ids, dict(sheet_ids), url_map, status_map, *stores, 1, clock.now + 3)
+
+    assert not complete
+    assert emansion.fetched == ['2', '5', '3']
+    assert [lookup and lookup[0] for lookup in lookups] == [None, '2', '3', None, '5', None]
+    assert metrics.report()['counters']['time_budget.rows_skipped'] == 3
+
+
+def test_budget_large_enough_processes_every_row(stores, monkeypatch):
+    emansion = fake_emansion(monkeypatch, {'新しい物件': '2'})
+    names = ['新しい物件', '', '見つからない物件']
+    lookups, complete = orchestrator.fetch_lookups_within_budget(
+        names, {}, {}, {}, {}, *stores, 2, orchestrator.time.time() + 3600)
+    assert complete
+    assert lookups == [('2', dict(SOLD_OUT, p_dtlurl='https://p/2')), (None, None), (None, None)]
+    assert sorted(emansion.searched) == ['新しい物件', '見つからない物件']
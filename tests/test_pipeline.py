@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import run_pipeline
+
+
+def test_stages_run_in_order_and_sink_sees_every_chunk():
+    written = []
+    run_pipeline(range(5), [lambda n: n * 10, lambda n: n + 1], written.append, queue_size=1)
+    assert written == [1, 11, 21, 31, 41]
+
+
+def test_later_stage_overlaps_with_earlier_stage():
+    second_stage_started = threading.Event()
+    overlapped = []
+
+    def first(n):
+        if n == 1:
+            # 2段目が chunk 0 を処理している間に、1段目が chunk 1 を処理できる
+            overlapped.append(second_stage_started.wait(2))
+        return n
+
+    def second(n):
+        second_stage_started.set()
+        time.sleep(0.05)
+        return n
+
+    written = []
+    run_pipeline(range(3), [first, second], written.append)
+    assert overlapped == [True]
+    assert written == [0, 1, 2]
+
+
+def test_error_in_middle_stage_stops_pipeline():
+    processed = []
+
+    def first(n):
+        processed.append(n)
+        return n
+
+    def second(n):
+        if n == 1:
+            raise ValueError('fetch failed')
+        return n
+
+    with pytest.raises(ValueError):
+        run_pipeline(range(100), [first, second], lambda n: None, queue_size=1)
+    assert len(processed) < 100
+
+
+def test_error_in_sink_is_raised():
+    def sink(n):
+        raise RuntimeError('write failed')
+
+    with pytest.raises(RuntimeError):
+        run_pipeline(range(3), [lambda n: n], sink)
@@ -0,0 +1,103 @@
+import pytest
+
+import rate_limiter
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+class FakeClock:
+    """time.monotonic と time.sleep を置き換え、sleep した分だけ時計を進める
+
+    実際の sleep と同じく少なくとも 1µs は進める（丸め誤差で残ったわずかな待ち時間で止まらないように）。
+    """
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 1e-6)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    # time モジュールそのものは pytest も使うので、rate_limiter から見える time だけを差し替える
+    monkeypatch.setattr(rate_limiter, 'time', clock)
+    return clock
+
+
+def test_acquire_spaces_requests_at_rate(clock):
+    limiter = AdaptiveRateLimiter(rate=2.0)
+    start = clock.now
+    for _ in range(5):
+        limiter.acquire()
+    # 最初の1件はバーストで即時、残り4件は 0.5 秒間隔
+    assert clock.now - start == pytest.approx(2.0)
+    assert limiter.waited_seconds == pytest.approx(2.0)
+
+
+def test_success_increases_rate_additively_up_to_max(clock):
+    limiter = AdaptiveRateLimiter(rate=1.0, max_rate=1.2, increase=0.05)
+    for _ in range(3):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(1.15)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(1.2)
+
+
+def test_throttle_halves_rate_once_per_interval_down_to_min(clock):
+    limiter = AdaptiveRateLimiter(rate=2.0, min_rate=0.3)
+    limiter.on_throttle()
+    # 同じ送信間隔の中でまとめて失敗しても1回しか下げない
+    limiter.on_throttle()
+    assert limiter.rate == pytest.approx(1.0)
+    assert limiter.throttles == 2
+    for _ in range(5):
+        clock.now += 1.0 / limiter.rate
+        limiter.on_throttle()
+    assert limiter.rate == pytest.approx(0.3)
+
+
+def test_recovers_after_throttle(clock):
+    limiter = AdaptiveRateLimiter(rate=1.0, increase=0.1)
+    limiter.on_throttle()
+    assert limiter.rate == pytest.approx(0.5)
+    for _ in range(5):
+        limiter.acquire()
+        limiter.on_success()
+    assert limiter.rate == pytest.approx(1.0)
+
+
+def test_retry_after_pauses_all_requests(clock):
+    limiter = AdaptiveRateLimiter(rate=100.0, max_rate=100.0, burst=5.0)
+    limiter.on_throttle(retry_after=30)
+    start = clock.now
+    limiter.acquire()
+    assert clock.now - start >= 30
+
+
+@pytest.mark.parametrize('value, expected', [('12', 12.0), ('-3', 0.0), (None, None),
+                                             ('Fri, 16 Oct 2026 00:00:00 GMT', None)])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_shared_limiter_divides_rates_by_shard_count(monkeypatch):
+    monkeypatch.setattr(rate_limiter, '_limiter', None)
+    monkeypatch.setenv('SHARD_COUNT', '4')
+    monkeypatch.setenv('REQUESTS_PER_SECOND', '2')
+    monkeypatch.setenv('RATE_LIMIT_MIN_RPS', '0.4')
+    monkeypatch.setenv('RATE_LIMIT_MAX_RPS', '8')
+    limiter = rate_limiter.get_rate_limiter()
+    assert (limiter.rate, limiter.min_rate, limiter.max_rate) == (0.5, 0.1, 2.0)
+    assert rate_limiter.get_rate_limiter() is limiter
+
+
+def test_shared_limiter_without_shards(monkeypatch):
+    monkeypatch.setattr(rate_limiter, '_limiter', None)
+    monkeypatch.delenv('SHARD_COUNT', raising=False)
+    monkeypatch.setenv('REQUESTS_PER_SECOND', '2')
+    assert rate_limiter.get_rate_limiter().rate == 2.0
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+import requests
+
+import http_client
+import rate_limiter
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.min_requests):
+        breaker.record_failure()
+
+
+def test_breaker_opens_when_failure_rate_reaches_threshold():
+    breaker = CircuitBreaker(window=4, min_requests=4, threshold=0.5, cooldown=60)
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.opened_count == 1
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    assert breaker.rejected == 1
+
+
+def test_breaker_stays_closed_below_min_requests():
+    breaker = CircuitBreaker(window=10, min_requests=5, threshold=0.5, cooldown=60)
+    for _ in range(4):
+        breaker.record_failure()
+    breaker.before_request()
+    assert breaker.opened_count == 0
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker(window=2, min_requests=2, threshold=0.5, cooldown=0)
+    open_breaker(breaker)
+    breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_half_open_success_closes_breaker():
+    breaker = CircuitBreaker(window=2, min_requests=2, threshold=0.5, cooldown=0)
+    open_breaker(breaker)
+    breaker.before_request()
+    breaker.record_success()
+    breaker.before_request()
+    breaker.before_request()
+    assert breaker.rejected == 0
+
+
+def test_half_open_failure_reopens_breaker():
+    breaker = CircuitBreaker(window=2, min_requests=2, threshold=0.5, cooldown=60)
+    open_breaker(breaker)
+    breaker._opened_at = time.monotonic() - 60
+    breaker.before_request()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+
+    def get(self, url, timeout=None, headers=None):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.headers = {}
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = CircuitBreaker(window=2, min_requests=2, threshold=0.5, cooldown=0)
+    monkeypatch.setattr(http_client, '_circuit_breaker', breaker)
+    monkeypatch.setattr(http_client, '_retry_policy', RetryPolicy(max_attempts=1))
+    monkeypatch.setattr(rate_limiter, '_limiter', rate_limiter.AdaptiveRateLimiter(rate=1000, max_rate=1000, burst=1000))
+    return breaker
+
+
+def test_non_timeout_error_during_trial_does_not_jam_breaker(breaker):
+    open_breaker(breaker)
+    session = FakeSession([requests.exceptions.ChunkedEncodingError('truncated'), FakeResponse(200)])
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        http_client._get_with_retries(session, 'http://example.invalid/', 10, None)
+    # 試行が失敗として記録され、cooldown 後に次の試行を送れる
+    response = http_client._get_with_retries(session, 'http://example.invalid/', 10, None)
+    assert response.status_code == 200
+    breaker.before_request()
+    breaker.before_request()
+
@@ -0,0 +1,105 @@
+import pytest
+
+from scheduler import (
+    RefreshScheduler, RequestBudget, row_priority,
+    PRIORITY_NEW_ROW, PRIORITY_ON_SALE, PRIORITY_UNKNOWN, PRIORITY_SOLD_OUT
+)
+from freshness import STATUS_ON_SALE, STATUS_SOLD_OUT
+
+
+def drain(scheduler, now):
+    keys = []
+    while True:
+        key = scheduler.pop_due(now)
+        if key is None:
+            return keys
+        keys.append(key)
+
+
+def test_pop_due_returns_none_before_due():
+    scheduler = RefreshScheduler()
+    scheduler.schedule('a', 100, PRIORITY_ON_SALE)
+    assert scheduler.pop_due(99) is None
+    assert scheduler.next_due(99) == 100
+    assert scheduler.pop_due(100) == 'a'
+    assert len(scheduler) == 0
+    assert scheduler.next_due(100) is None
+
+
+def test_due_entries_are_ordered_by_priority_then_last_fetched():
+    scheduler = RefreshScheduler()
+    scheduler.schedule('sold', 10, PRIORITY_SOLD_OUT, last_fetched_at=1)
+    scheduler.schedule('on_sale_recent', 20, PRIORITY_ON_SALE, last_fetched_at=50)
+    scheduler.schedule('on_sale_old', 30, PRIORITY_ON_SALE, last_fetched_at=5)
+    scheduler.schedule('new', 40, PRIORITY_NEW_ROW)
+    scheduler.schedule('later', 1000, PRIORITY_NEW_ROW)
+    assert drain(scheduler, 100) == ['new', 'on_sale_old', 'on_sale_recent', 'sold']
+    assert 'later' in scheduler
+
+
+def test_newly_due_entry_overtakes_lower_priority_ready_entries():
+    scheduler = RefreshScheduler()
+    scheduler.schedule('sold1', 10, PRIORITY_SOLD_OUT)
+    scheduler.schedule('sold2', 10, PRIORITY_SOLD_OUT)
+    scheduler.schedule('new', 50, PRIORITY_NEW_ROW)
+    assert scheduler.pop_due(20) == 'sold1'
+    assert scheduler.pop_due(60) == 'new'
+    assert scheduler.pop_due(60) == 'sold2'
+
+
+def test_reschedule_replaces_previous_entry():
+    scheduler = RefreshScheduler()
+    scheduler.schedule('a', 10, PRIORITY_SOLD_OUT)
+    scheduler.schedule('b', 10, PRIORITY_ON_SALE)
+    assert scheduler.pop_due(5) is None
+    # 期限切れで ready に移ったあとに登録し直しても、古い予定は返らない
+    assert scheduler.next_due(20) == 10
+    scheduler.schedule('a', 100, PRIORITY_NEW_ROW)
+    assert drain(scheduler, 20) == ['b']
+    assert drain(scheduler, 100) == ['a']
+
+
+def test_discard_removes_entry():
+    scheduler = RefreshScheduler()
+    scheduler.schedule('a', 10, PRIORITY_ON_SALE)
+    scheduler.schedule('b', 20, PRIORITY_ON_SALE)
+    scheduler.discard('a')
+    assert 'a' not in scheduler
+    assert scheduler.next_due(0) == 20
+    assert drain(scheduler, 100) == ['b']
+
+
+def test_count_by_priority():
+    scheduler = RefreshScheduler()
+    scheduler.schedule('a', 10, PRIORITY_ON_SALE)
+    scheduler.schedule('b', 10, PRIORITY_ON_SALE)
+    scheduler.schedule('c', 10, PRIORITY_SOLD_OUT)
+    scheduler.schedule('c', 10, PRIORITY_NEW_ROW)
+    assert scheduler.count_by_priority() == {PRIORITY_ON_SALE: 2, PRIORITY_NEW_ROW: 1}
+
+
+@pytest.mark.parametrize('building_id, sheet_status, state, expected', [
+    ('', None, None, PRIORITY_NEW_ROW),
+    ('1', None, None, PRIORITY_UNKNOWN),
+    ('1', None, {'status': STATUS_ON_SALE}, PRIORITY_ON_SALE),
+    ('1', None, {'status': STATUS_SOLD_OUT}, PRIORITY_SOLD_OUT),
+    ('1', {'p_dtlurl': 'u', 'p_sold_flag': '0', 'l_url': '', 'l_sold_flag': '', 'y_dtlurl': '', 'y_sold_flag': ''},
+     None, PRIORITY_ON_SALE),
+])
+def test_row_priority(building_id, sheet_status, state, expected):
+    assert row_priority(building_id, sheet_status, state) == expected
+
+
+def test_request_budget_limits_requests_per_hour():
+    budget = RequestBudget(2)
+    assert budget.wait_seconds(0) == 0
+    budget.spend(now=0)
+    budget.spend(now=10)
+    assert budget.wait_seconds(20) == 3580
+    assert budget.wait_seconds(3600) == 0
+
+
+def test_request_budget_unlimited():
+    budget = RequestBudget(0)
+    budget.spend(5, now=0)
+    assert budget.wait_seconds(0) == 0
@@ -0,0 +1,56 @@
+import pytest
+
+from sheets_emulator import EmulatedSheetsService, EmulatedSpreadsheet, SheetsEmulatorError, parse_range
+
+
+@pytest.mark.parametrize('a1, expected', [
+    ('新着物件!C1:C', ('新着物件', 0, 2, None, 2)),
+    ('新着物件!M2:S10', ('新着物件', 1, 12, 9, 18)),
+    ("'新着物件'!AA3", ('新着物件', 2, 26, 2, 26)),
+    ('新着物件!B2:B', ('新着物件', 1, 1, None, 1)),
+])
+def test_parse_range(a1, expected):
+    assert parse_range(a1) == expected
+
+
+def values(service):
+    return service.spreadsheets().values()
+
+
+def test_write_then_read_trims_trailing_empties():
+    service = EmulatedSheetsService(EmulatedSpreadsheet())
+    response = values(service).update(spreadsheetId='x', range='S!B2:C3', valueInputOption='RAW',
+                                      body={'values': [['a', ''], ['b', 'c']]}).execute()
+    assert response['updatedRange'] == 'S!B2:C3'
+    read = values(service).get(spreadsheetId='x', range='S!A1:C').execute()
+    assert read['values'] == [[], ['', 'a'], ['', 'b', 'c']]
+
+
+def test_write_outside_range_is_rejected():
+    service = EmulatedSheetsService(EmulatedSpreadsheet())
+    with pytest.raises(SheetsEmulatorError):
+        values(service).update(spreadsheetId='x', range='S!A1:A1', valueInputOption='RAW',
+                               body={'values': [['a', 'b']]}).execute()
+
+
+def test_batch_update_is_all_or_nothing():
+    spreadsheet = EmulatedSpreadsheet()
+    service = EmulatedSheetsService(spreadsheet)
+    body = {'valueInputOption': 'RAW', 'data': [
+        {'range': 'S!A1:A1', 'values': [['ok']]},
+        {'range': 'S!B1:B1', 'values': [['too', 'wide']]},
+    ]}
+    with pytest.raises(SheetsEmulatorError):
+        values(service).batchUpdate(spreadsheetId='x', body=body).execute()
+    assert spreadsheet.sheets.get('S', []) == []
+    assert spreadsheet.stats['write_requests'] == 0
+
+
+def test_writes_are_saved_on_demand_not_per_request(tmp_path):
+    path = str(tmp_path / 'sheet.json')
+    spreadsheet = EmulatedSpreadsheet(path)
+    values(EmulatedSheetsService(spreadsheet)).update(spreadsheetId='x', range='S!A1', valueInputOption='RAW',
+                                                      body={'values': [['a']]}).execute()
+    assert EmulatedSpreadsheet(path).sheets == {}
+    spreadsheet.save()
+    assert EmulatedSpreadsheet(path).sheets == {'S': [['a']]}
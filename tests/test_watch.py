@@ -0,0 +1,64 @@
+import pytest
+
+from building_index import BuildingIndex
+from emansion import orchestrator
+from emansion.sheets import load_sheet_state
+from freshness import FreshnessStore
+from scheduler import RequestBudget
+from sheets_emulator import EmulatedSheetsService, EmulatedSpreadsheet
+
+AD_INFO = {'entry_id': '1', 'p_dtlurl': 'https://p/111', 'p_sold_flag': '0',
+           'l_url': '', 'l_sold_flag': '', 'y_dtlurl': '', 'y_sold_flag': ''}
+
+
+class CountingBudget(RequestBudget):
+    spent = 0
+
+    def spend(self, n=1, now=None):
+        CountingBudget.spent += n
+        super().spend(n, now)
+
+
+@pytest.fixture
+def watch_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('WATCH_MAX_HOURS', '0.0004')
+    monkeypatch.setenv('WATCH_RETRY_MINUTES', '0.002')
+    monkeypatch.setenv('WATCH_FLUSH_SECONDS', '3600')
+    monkeypatch.setenv('WATCH_REQUESTS_PER_HOUR', '1000')
+    monkeypatch.setattr(orchestrator.signal, 'signal', lambda *args: None)
+    CountingBudget.spent = 0
+    monkeypatch.setattr(orchestrator, 'RequestBudget', CountingBudget)
+    index = BuildingIndex(str(tmp_path / 'index.sqlite3'))
+    freshness = FreshnessStore(str(tmp_path / 'freshness.sqlite3'))
+    yield index, freshness
+    index.close()
+    freshness.close()
+
+
+def test_search_error_is_retried_and_negative_cache_is_not_charged(watch_env, monkeypatch):
+    index, freshness = watch_env
+    index.record_miss('見つからない物件')
+    spreadsheet = EmulatedSpreadsheet()
+    spreadsheet.sheets['新着物件'] = [['', '物件名'], ['', '新しい物件'], ['', '見つからない物件']]
+    service = EmulatedSheetsService(spreadsheet)
+
+    searched = []
+
+    def search(name):
+        searched.append(name)
+        # 1回目は通信エラー（None）、2回目で見つかる
+        return None if len(searched) == 1 else [{'buildingid': '111'}]
+
+    monkeypatch.setattr(orchestrator, 'search_building_candidates', search)
+    monkeypatch.setattr(orchestrator, 'fetch_ad_info', lambda building_id, http_cache=None: AD_INFO)
+
+    state = load_sheet_state(service, 'test', '新着物件!B2:B')
+    orchestrator.run_watch(service, 'test', '新着物件!B2:B', state, index, freshness, None)
+
+    assert searched == ['新しい物件', '新しい物件']
+    grid = spreadsheet.sheets['新着物件']
+    assert grid[1][11] == '111'
+    assert grid[1][12] == 'https://p/111'
+    # 検索2回（エラー・成功）と取得1回だけが予算に数えられる
+    assert CountingBudget.spent == 3
+    assert index.get('新しい物件') == '111'
@@ -0,0 +1,43 @@
+import pytest
+
+from write_planner import column_index, column_letter, plan_writes
+
+
+@pytest.mark.parametrize('letters, index', [('A', 0), ('Z', 25), ('AA', 26), ('AZ', 51), ('BA', 52)])
+def test_column_round_trip(letters, index):
+    assert column_index(letters) == index
+    assert column_letter(index) == letters
+
+
+def test_no_changes_writes_nothing():
+    rows = [['a', 'b'], ['c', 'd']]
+    assert plan_writes('S', 'M', 2, rows, rows, 2) == ([], 0, 4)
+
+
+def test_missing_and_short_rows_are_padded():
+    # 既存の行が短い・ないときは空セルとして比べる
+    writes, written, unchanged = plan_writes('S', 'M', 2, [['a', ''], ['', '']], [['a']], 2)
+    assert writes == []
+    assert (written, unchanged) == (0, 4)
+
+
+def test_consecutive_changed_rows_are_coalesced_into_one_range():
+    old = [['a', 'b', 'c'], ['d', 'e', 'f'], ['g', 'h', 'i']]
+    new = [['a', 'B', 'c'], ['d', 'e', 'F'], ['g', 'h', 'i']]
+    writes, written, unchanged = plan_writes('S', 'M', 2, new, old, 3)
+    # 2行をまとめ、変更のあった列（N～O）だけを覆う
+    assert writes == [('S!N2:O3', [['B', 'c'], ['e', 'F']])]
+    assert (written, unchanged) == (4, 5)
+
+
+def test_gaps_split_ranges():
+    old = [['x'], ['x'], ['x'], ['x']]
+    new = [['y'], ['x'], ['y'], ['y']]
+    writes, written, unchanged = plan_writes('S', 'L', 1, new, old, 1)
+    assert writes == [('S!L1:L1', [['y']]), ('S!L3:L4', [['y'], ['y']])]
+    assert (written, unchanged) == (3, 1)
+
+
+def test_cleared_cells_are_written_as_empty():
+    writes, _, _ = plan_writes('S', 'M', 5, [['', 'b']], [['a', 'b', 'extra']], 2)
+    assert writes == [('S!M5:M5', [['']])]